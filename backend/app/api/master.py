@@ -10,6 +10,8 @@ from app.models.master import (
     Operation, Equipment, Tooling, Personnel, Shift, Routing, RoutingItem
 )
 from app.models.material_type import MaterialType
+from app.services.work_calendar import invalidate_shift_calendars
+from app.services.schedule_cache import bump_data_version
 from app.schemas.master import (
     UOMCreate, UOMUpdate, UOMResponse,
     MaterialTypeCreate, MaterialTypeUpdate, MaterialTypeResponse,
@@ -380,6 +382,7 @@ def create_operation(operation: OperationCreate, db: Session = Depends(get_db)):
     db.add(db_operation)
     db.commit()
     db.refresh(db_operation)
+    bump_data_version()
     return db_operation
 
 
@@ -410,6 +413,7 @@ def update_operation(operation_id: int, operation: OperationUpdate, db: Session
     
     db.commit()
     db.refresh(db_operation)
+    bump_data_version()
     return db_operation
 
 
@@ -422,6 +426,7 @@ def delete_operation(operation_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_operation)
     db.commit()
+    bump_data_version()
     return {"message": "Operation deleted successfully"}
 
 
@@ -433,6 +438,7 @@ def create_equipment(equipment: EquipmentCreate, db: Session = Depends(get_db)):
     db.add(db_equipment)
     db.commit()
     db.refresh(db_equipment)
+    bump_data_version()
     return db_equipment
 
 
@@ -463,6 +469,7 @@ def update_equipment(equipment_id: int, equipment: EquipmentUpdate, db: Session
     
     db.commit()
     db.refresh(db_equipment)
+    bump_data_version()
     return db_equipment
 
 
@@ -475,6 +482,7 @@ def delete_equipment(equipment_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_equipment)
     db.commit()
+    bump_data_version()
     return {"message": "Equipment deleted successfully"}
 
 
@@ -486,6 +494,7 @@ def create_tooling(tooling: ToolingCreate, db: Session = Depends(get_db)):
     db.add(db_tooling)
     db.commit()
     db.refresh(db_tooling)
+    bump_data_version()
     return db_tooling
 
 
@@ -516,6 +525,7 @@ def update_tooling(tooling_id: int, tooling: ToolingUpdate, db: Session = Depend
     
     db.commit()
     db.refresh(db_tooling)
+    bump_data_version()
     return db_tooling
 
 
@@ -528,6 +538,7 @@ def delete_tooling(tooling_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_tooling)
     db.commit()
+    bump_data_version()
     return {"message": "Tooling deleted successfully"}
 
 
@@ -546,6 +557,7 @@ def create_personnel(personnel: PersonnelCreate, db: Session = Depends(get_db)):
     db.add(db_personnel)
     db.commit()
     db.refresh(db_personnel)
+    bump_data_version()
     return db_personnel
 
 
@@ -583,6 +595,7 @@ def update_personnel(personnel_id: int, personnel: PersonnelUpdate, db: Session
     
     db.commit()
     db.refresh(db_personnel)
+    bump_data_version()
     return db_personnel
 
 
@@ -595,6 +608,7 @@ def delete_personnel(personnel_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_personnel)
     db.commit()
+    bump_data_version()
     return {"message": "Personnel deleted successfully"}
 
 
@@ -606,6 +620,8 @@ def create_shift(shift: ShiftCreate, db: Session = Depends(get_db)):
     db.add(db_shift)
     db.commit()
     db.refresh(db_shift)
+    invalidate_shift_calendars()
+    bump_data_version()
     return db_shift
 
 
@@ -636,6 +652,8 @@ def update_shift(shift_id: int, shift: ShiftUpdate, db: Session = Depends(get_db
     
     db.commit()
     db.refresh(db_shift)
+    invalidate_shift_calendars()
+    bump_data_version()
     return db_shift
 
 
@@ -648,6 +666,8 @@ def delete_shift(shift_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_shift)
     db.commit()
+    invalidate_shift_calendars()
+    bump_data_version()
     return {"message": "Shift deleted successfully"}
 
 
@@ -0,0 +1,117 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.services.oee import oee_report
+from app.services.production_rollups import (
+    GROUP_COLUMNS, bucket_hour, output_series, production_day, production_day_start,
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _check_group_by(group_by: Optional[str]) -> None:
+    if group_by is not None and group_by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_COLUMNS)}")
+
+
+@router.get("/production/output/hourly", tags=["Production"])
+def get_hourly_output(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: Optional[str] = None,
+    equipment_id: Optional[int] = None,
+    shift_id: Optional[int] = None,
+    operation_id: Optional[int] = None,
+    work_order_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    按小时统计完工数、报废数与报废率（读产量汇总表）；默认最近 24 小时。
+    group_by 可选 equipment / shift / operation / work_order，其余参数为过滤条件。
+    """
+    _check_group_by(group_by)
+    end = bucket_hour(end) if end else bucket_hour(datetime.now()) + timedelta(hours=1)
+    start = bucket_hour(start) if start else end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be earlier than end")
+    return output_series(db, start, end, "hour", group_by, {
+        "equipment_id": equipment_id, "shift_id": shift_id,
+        "operation_id": operation_id, "work_order_id": work_order_id,
+    })
+
+
+@router.get("/production/output/daily", tags=["Production"])
+def get_daily_output(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Optional[str] = None,
+    equipment_id: Optional[int] = None,
+    shift_id: Optional[int] = None,
+    operation_id: Optional[int] = None,
+    work_order_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    按生产日（每日开工时间起算）统计完工数、报废数与报废率；start / end 为生产日（含），默认最近 7 天。
+    """
+    _check_group_by(group_by)
+    end = end or production_day(datetime.now())
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be later than end")
+    return output_series(db, production_day_start(start), production_day_start(end + timedelta(days=1)), "day",
+                         group_by, {
+                             "equipment_id": equipment_id, "shift_id": shift_id,
+                             "operation_id": operation_id, "work_order_id": work_order_id,
+                         })
+
+
+def _oee(db: Session, granularity: str, start: Optional[date], end: Optional[date],
+         equipment_id: Optional[int], refresh: bool):
+    end = end or production_day(datetime.now())
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be later than end")
+    result = oee_report(db, granularity, start, end, equipment_id, refresh)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 并发请求已写入同一时段的缓存，本次结果不受影响
+        db.rollback()
+    return result
+
+
+@router.get("/production/oee/shift", tags=["Production"])
+def get_shift_oee(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    equipment_id: Optional[int] = None,
+    refresh: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    各设备按班次的 OEE（时间开动率 × 性能开动率 × 合格品率）；start / end 为班次开始日期（含），默认最近 7 天。
+    已关闭的班次读缓存，refresh=true 时重算范围内的缓存。
+    """
+    return _oee(db, "shift", start, end, equipment_id, refresh)
+
+
+@router.get("/production/oee/daily", tags=["Production"])
+def get_daily_oee(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    equipment_id: Optional[int] = None,
+    refresh: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    各设备按生产日的 OEE；start / end 为生产日（含），默认最近 7 天。计划时间为生产日内的班次时段。
+    """
+    return _oee(db, "day", start, end, equipment_id, refresh)
@@ -1,140 +1,397 @@
-from fastapi import APIRouter, Depends
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from app.database import get_db
-from app.models.workorder import WorkOrder, WorkOrderOperation
-from app.models.master import Operation, Equipment
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import settings
+from app.database import SessionLocal, get_db
+from app.schemas.schedule import IncrementalScheduleRequest, ScenarioRequest
+from app.models.master import Equipment, Routing
+from app.services.scheduler import (
+    PlanState, ScheduledTask, load_snapshot, load_setup_times, build_calendars, compute_schedule,
+    compute_setup_schedule, build_state, build_response, write_planned_dates,
+)
+from app.services.incremental import reschedule
+from app.services.parallel_scheduler import compute_schedule_parallel
+from app.services.scenarios import run_scenarios
+from app.services.work_calendar import get_shift_calendars
+from app.services import schedule_cache, schedule_jobs
+from app.services.schedule_view import select_tasks, build_page, iter_ndjson
+from app.services.schedule_analytics import schedule_analytics
+from app.services.promise import active_routing, load_routing_steps, quote
+from app.services.resource_scheduler import load_resources, compute_resource_schedule
+from app.services.optimizer import optimize_schedule
+from app.services.dispatch_list import dispatch_index, dispatch_row
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-def working_slots(start: datetime, hours: float, day_hours: float = 8.0) -> (datetime, datetime):
-    """有限能力：每日可用工时 day_hours，跨日顺延。"""
-    end = start
-    remaining = hours
-    while remaining > 0:
-        take = min(day_hours, remaining)
-        end = end + timedelta(hours=take)
-        remaining -= take
-        if remaining > 0:
-            # 跳到下一天早上8点
-            end = (end.replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1))
-    return start, end
+def _schedule_now() -> datetime:
+    """排程基准时刻：当前整点。"""
+    return datetime.now().replace(minute=0, second=0, microsecond=0)
+
+
+def _compute(db: Session, now: datetime, version: int) -> Tuple[Dict[str, Any], PlanState]:
+    """全量排程；version 须在加载数据之前取得。"""
+    snapshot = load_snapshot(db)
+    calendars = build_calendars(snapshot, get_shift_calendars(db))
+    if settings.schedule_workers > 1:
+        tasks, stats = compute_schedule_parallel(snapshot, now, calendars, settings.schedule_workers, version=version)
+        logger.info(f"按车间并行排程: {stats}")
+    else:
+        tasks = compute_schedule(snapshot, now, calendars)
+    state = build_state(version, now, snapshot, calendars, tasks)
+    return build_response(snapshot, tasks, state.rows), state
+
+
+def _compute_setup(db: Session, now: datetime, window: int) -> Tuple[Dict[str, Any], List[ScheduledTask]]:
+    """换型感知排程，结果另附 setup 统计；不写入排程缓存。"""
+    snapshot = load_snapshot(db)
+    load_setup_times(db, snapshot)
+    calendars = build_calendars(snapshot, get_shift_calendars(db))
+    tasks, summary = compute_setup_schedule(snapshot, now, calendars, window)
+    return {**build_response(snapshot, tasks), "setup": summary}, tasks
+
+
+def _compute_resources(db: Session, now: datetime) -> Tuple[Dict[str, Any], List[ScheduledTask]]:
+    """多资源排程（设备 + 工装 + 操作人员），任务另附资源分配，结果另附 resources 统计；不写入排程缓存。"""
+    snapshot = load_snapshot(db)
+    resources = load_resources(db, snapshot)
+    calendars = build_calendars(snapshot, get_shift_calendars(db))
+    tasks, assignments, summary = compute_resource_schedule(snapshot, now, resources, calendars)
+    result = build_response(snapshot, tasks)
+    for row, assignment in zip(result["tasks"], assignments):
+        row.update(
+            tooling_id=assignment.tooling_id,
+            tooling_units=assignment.tooling_units,
+            personnel_id=assignment.personnel_id,
+            personnel_code=assignment.personnel_code,
+        )
+    return {**result, "resources": summary}, tasks
+
+
+def _compute_optimized(db: Session, now: datetime, time_budget: float,
+                       objective: str) -> Tuple[Dict[str, Any], List[ScheduledTask]]:
+    """贪心排程 + 限时局部搜索，结果另附 optimization 统计；不写入排程缓存。"""
+    snapshot = load_snapshot(db)
+    calendars = build_calendars(snapshot, get_shift_calendars(db))
+    tasks, summary = optimize_schedule(
+        snapshot, now, calendars, time_budget, objective, settings.schedule_optimize_workers,
+    )
+    return {**build_response(snapshot, tasks), "optimization": summary}, tasks
+
+
+def _run(db: Session, mode: str, setup_window: Optional[int], commit: bool = False,
+         time_budget: Optional[float] = None, objective: str = "tardiness") -> Dict[str, Any]:
+    now = _schedule_now()
+    if mode == "setup":
+        window = settings.schedule_setup_window if setup_window is None else setup_window
+        result, tasks = _compute_setup(db, now, window)
+    elif mode == "resources":
+        result, tasks = _compute_resources(db, now)
+    elif mode == "optimize":
+        budget = settings.schedule_optimize_seconds if time_budget is None else time_budget
+        result, tasks = _compute_optimized(db, now, budget, objective)
+    else:
+        with schedule_cache.computing():
+            version = schedule_cache.current_version()
+            result, state = _compute(db, now, version)
+            schedule_cache.store(schedule_cache.schedule_key(now, version), result, state)
+        tasks = state.tasks
+    if commit:
+        rows, work_order_ids = write_planned_dates(db, tasks)
+        if rows:
+            schedule_cache.bump_data_version(work_order_ids)
+        result = {**result, "committed_rows": rows}
+    return result
 
 
 @router.post("/schedule/run", tags=["Scheduling"])
-def run_scheduling(db: Session = Depends(get_db)) -> Dict[str, Any]:
+def run_scheduling(
+    mode: str = Query("priority", pattern="^(priority|setup|resources|optimize)$"),
+    setup_window: Optional[int] = Query(None, ge=0),
+    time_budget: Optional[float] = Query(None, gt=0, le=600),
+    objective: str = Query("tardiness", pattern="^(tardiness|makespan)$"),
+    commit: bool = False,
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
     """
     生成简易排程：
-    - 按设备维度为工单工序排时间
-    - 假设产能速率 1 单位/小时；每日8小时
+    - 事件堆派工：每台设备同一时刻只加工一道工序，空闲时按 优先级 / 工单 / 工序顺序 取已就绪的工序
+    - 同一工单的工序按 sequence 先后加工，后道工序在前道工序完工后才能开工
+    - 工时按工序标准时间计算，未设置时假设 1 单位/小时
+    - 设备所在车间配置了启用班次时按班次日历排产，否则按设备日产能（默认每日8小时）
     - 仅对 `released` 与 `in_progress` 的工单进行排程
+    - 排程数据一次联表查询批量加载，排程计算全部在内存中完成
+    - 配置 schedule_workers > 1 时按车间分区在进程池中并行排程，结果与串行一致
+    - 总是重新计算，并刷新 GET /schedule 的缓存
+
+    mode=setup 为换型感知排程（不刷新缓存）：
+    - 设备上工序切换时，开工前计入工艺路线明细中该工序的准备时间（setup_time）
+    - 队首工序需要换型时，优先做就绪队列中与设备当前工序相同、优先级差不超过 setup_window 档的工序
+      （默认取配置 schedule_setup_window）
+    - 返回另附 setup 统计：换型次数、准备工时，以及相对按原优先级顺序排程节省的准备工时
+
+    mode=resources 为多资源排程（不刷新缓存）：
+    - 工序（Operation）设置了 tooling_id / tooling_quantity 时同时占用相应数量的工装，
+      设置了 skill_level 时需要一名技能等级不低于该等级、开工时在班的操作人员
+    - 设备、每件工装、每名人员各有一条占用时间轴，工序按队列顺序插入所有资源都空闲的最早时刻（允许插空）
+    - 任务另附 tooling_id / tooling_units / personnel_id / personnel_code，
+      返回另附 resources 统计（占用工装 / 人员的任务数、因辅助资源推迟的工时、资源不足而未约束的工序）
+
+    mode=optimize 为限时局部搜索优化（不刷新缓存）：
+    - 以默认排程为起点调整工单派工顺序（延误工单前移、交换、插入），每个候选解仍由事件堆排程求出
+    - objective=tardiness 先比总延误工时再比完工时间，makespan 反之
+    - 在 time_budget 秒（默认取配置 schedule_optimize_seconds）内由 schedule_optimize_workers 个进程
+      以不同随机种子搜索，取最优解；找不到更优的解时返回默认排程
+    - 返回另附 optimization 统计：默认排程与优化结果的 KPI、改进量、评价次数
+
+    commit=true 时把任务的开工 / 完工时间写回工单工序的计划开始 / 完成时间：
+    - 只更新有变化的行，一次批量 UPDATE、一次提交，返回另附 committed_rows（更新行数）
+    - 计划开始时间是排程的最早开工约束，回写后再次排程时这些工序不会早于回写时间开工
     """
-    now = datetime.now().replace(minute=0, second=0, microsecond=0)
-    equipment_cursor: Dict[int, datetime] = {}
-    tasks: List[Dict[str, Any]] = []
-
-    ops = db.query(WorkOrderOperation).join(WorkOrder).filter(
-        WorkOrder.status.in_(["released", "in_progress"])
-    ).order_by(WorkOrder.priority.asc(), WorkOrder.id.asc(), WorkOrderOperation.sequence.asc()).all()
-
-    for op in ops:
-        equip_id = op.equipment_id or -1  # 未分配设备归到 -1
-        cursor = equipment_cursor.get(equip_id, op.planned_start_date or now)
-        # 基于工序标准时间（分钟）计算总工时 = 剩余数量 * 标准时间/60
-        qty = max(op.planned_quantity - op.completed_quantity, 0)
-        std_min = 0.0
-        day_hours = 8.0
-        try:
-            std = db.query(Operation).filter(Operation.id == op.operation_id).first()
-            if std and std.standard_time:
-                std_min = float(std.standard_time)
-        except Exception:
-            std_min = 0.0
-        try:
-            if equip_id != -1:
-                eq = db.query(Equipment).filter(Equipment.id == equip_id).first()
-                # 如果设备设置了每日产能（capacity，单位可近似为小时），用它作为每日可用工时
-                if eq and eq.capacity and eq.capacity > 0:
-                    day_hours = float(eq.capacity)
-        except Exception:
-            day_hours = 8.0
-
-        hours = qty * (std_min / 60.0) if std_min > 0 else qty  # 回退到 1件/小时
-        start, end = working_slots(cursor, hours, day_hours)
-        equipment_cursor[equip_id] = end
-
-        # 可读性增强：附带编码与名称
-        wo_code = None
-        op_code = None
-        op_name = None
-        eq_code = None
-        try:
-            if op.work_order and getattr(op.work_order, 'code', None):
-                wo_code = op.work_order.code
-        except Exception:
-            pass
-        try:
-            op_obj = db.query(Operation).filter(Operation.id == op.operation_id).first()
-            if op_obj:
-                op_code = op_obj.code
-                op_name = op_obj.name
-        except Exception:
-            pass
+    return _run(db, mode, setup_window, commit, time_budget, objective)
+
+
+@router.post("/schedule/jobs", status_code=202, tags=["Scheduling"])
+def submit_schedule_job(
+    mode: str = Query("priority", pattern="^(priority|setup|resources|optimize)$"),
+    setup_window: Optional[int] = Query(None, ge=0),
+    time_budget: Optional[float] = Query(None, gt=0, le=600),
+    objective: str = Query("tardiness", pattern="^(tardiness|makespan)$"),
+    commit: bool = False,
+) -> Dict[str, Any]:
+    """
+    提交后台排程任务（参数同 run），立即返回任务 id：
+    - 通过 GET /schedule/jobs/{job_id} 轮询状态，完成后由 /result 取结果（结构同 run）
+    - 排程输入与参数相同的任务未失败时直接返回已有任务，不重复计算
+    """
+    window = settings.schedule_setup_window if mode == "setup" and setup_window is None else setup_window
+    options = f"{window}"
+    if mode == "optimize":
+        time_budget = settings.schedule_optimize_seconds if time_budget is None else time_budget
+        options = f"{time_budget}-{objective}"
+    key = f"{mode}-{options}-{int(commit)}-{schedule_cache.schedule_key(_schedule_now())}"
+
+    def compute() -> Dict[str, Any]:
+        db = SessionLocal()
         try:
-            if equip_id != -1:
-                eq_obj = db.query(Equipment).filter(Equipment.id == equip_id).first()
-                if eq_obj:
-                    eq_code = eq_obj.code
-        except Exception:
-            pass
-
-        tasks.append({
-            "work_order_id": op.work_order_id,
-            "work_order_code": wo_code,
-            "operation_id": op.operation_id,
-            "operation_code": op_code,
-            "operation_name": op_name,
-            "work_order_operation_id": op.id,
-            "equipment_id": equip_id,
-            "equipment_code": eq_code,
-            "sequence": op.sequence,
-            "start": start.isoformat(),
-            "end": end.isoformat(),
-            "duration_hours": hours,
-            "planned_quantity": op.planned_quantity,
-            "remaining_quantity": qty,
-        })
-
-    # 简单的负荷统计（每设备累计工时）
-    loads: Dict[int, float] = {}
-    for t in tasks:
-        equip = t["equipment_id"]
-        s = datetime.fromisoformat(t["start"]) 
-        e = datetime.fromisoformat(t["end"]) 
-        hours = (e - s).total_seconds() / 3600
-        loads[equip] = loads.get(equip, 0.0) + hours
-
-    # 交期预警：若任务结束时间晚于工单计划完工时间
-    warnings: List[Dict[str, Any]] = []
-    for t in tasks:
-        wo = db.query(WorkOrder).filter(WorkOrder.id == t["work_order_id"]).first()
-        if wo and wo.planned_end_date:
-            end = datetime.fromisoformat(t["end"]) 
-            if end > wo.planned_end_date:
-                warnings.append({
-                    "work_order_id": wo.id,
-                    "code": wo.code,
-                    "planned_end_date": wo.planned_end_date.isoformat(),
-                    "task_end": end.isoformat(),
-                    "delay_hours": (end - wo.planned_end_date).total_seconds() / 3600
-                })
-
-    return {"tasks": tasks, "loads": loads, "warnings": warnings}
+            return _run(db, mode, window, commit, time_budget, objective)
+        finally:
+            db.close()
+
+    job, created = schedule_jobs.submit(key, compute)
+    return {**job.summary(), "deduplicated": not created}
+
+
+@router.get("/schedule/jobs/{job_id}", tags=["Scheduling"])
+def get_schedule_job(job_id: str) -> Dict[str, Any]:
+    """排程任务状态：queued / running / succeeded / failed。"""
+    job = schedule_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Schedule job not found")
+    return job.summary()
+
+
+@router.get("/schedule/jobs/{job_id}/result", tags=["Scheduling"])
+def get_schedule_job_result(job_id: str):
+    """排程任务结果；任务未完成时返回 202 与任务状态，失败时返回 500。"""
+    job = schedule_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Schedule job not found")
+    if job.status == schedule_jobs.FAILED:
+        raise HTTPException(status_code=500, detail=f"排程任务失败: {job.error}")
+    if job.status != schedule_jobs.SUCCEEDED:
+        return JSONResponse(status_code=202, content=job.summary())
+    return job.result
+
+
+@router.post("/schedule/incremental", tags=["Scheduling"])
+def run_incremental_scheduling(payload: Optional[IncrementalScheduleRequest] = None,
+                               db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    增量排程（结构同 run，另附 incremental 统计）：
+    - 只重新加载变更工单的工序；派工时刻早于变更影响时刻的任务沿用上次结果，其后的部分重新排程
+    - 变更范围 = 自上次排程以来工单接口记录的变更 + 请求中传入的工单 / 工单工序
+    - 没有可复用的排程、排程基准时刻已变化或期间有主数据（工序 / 设备 / 班次）变更时自动全量排程
+    - 结果与全量排程一致，并刷新 GET /schedule 的缓存
+    """
+    payload = payload or IncrementalScheduleRequest()
+    now = _schedule_now()
+    with schedule_cache.computing():
+        version = schedule_cache.current_version()
+        state = schedule_cache.last_state()
+        changed = None
+        if state is not None and state.now == now:
+            changed = schedule_cache.changed_work_orders(state.version, version)
+        if changed is None:
+            result, state = _compute(db, now, version)
+            stats = {"mode": "full"}
+        else:
+            state, stats = reschedule(
+                db, state, version,
+                changed | set(payload.work_order_ids), payload.work_order_operation_ids,
+                get_shift_calendars(db),
+            )
+            result = build_response(state.snapshot, state.tasks, state.rows)
+        schedule_cache.store(schedule_cache.schedule_key(now, version), result, state)
+    return {**result, "incremental": stats}
+
+
+@router.post("/schedule/scenarios", tags=["Scheduling"])
+def run_schedule_scenarios(payload: ScenarioRequest, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    What-if 场景排程（不修改数据库）：
+    - 每个场景可覆盖工单优先级、工单计划数量，以及设备停机时段（任务不跨停机时段，顺延到停机结束后开工）
+    - 排程数据只加载一次，基准与各场景在进程池中并行排程（配置 schedule_scenario_workers）；
+      数据版本不变时进程池中的子进程复用已加载的快照
+    - 返回基准与各场景的 KPI：makespan、总延误工时、延误工单数、各设备加工工时
+    """
+    version = schedule_cache.current_version()  # 须在加载数据之前取得
+    snapshot = load_snapshot(db)
+    for scenario in payload.scenarios:
+        for o in [*scenario.priorities, *scenario.quantities]:
+            if o.work_order_id not in snapshot.work_orders:
+                raise HTTPException(status_code=400, detail=f"场景 {scenario.name}: 工单 {o.work_order_id} 不在排程范围内")
+        for d in scenario.downtimes:
+            if d.equipment_id not in snapshot.equipment:
+                raise HTTPException(status_code=400, detail=f"场景 {scenario.name}: 设备 {d.equipment_id} 没有待排程的工序")
+            # 停机时段与排程时间比较，带时区的先换算为本地时间
+            d.start, d.end = _local(d.start), _local(d.end)
+    calendars = build_calendars(snapshot, get_shift_calendars(db))
+    results = run_scenarios(
+        snapshot, _schedule_now(), calendars,
+        [s.model_dump() for s in payload.scenarios], settings.schedule_scenario_workers, version,
+    )
+    return {"baseline": results[0], "scenarios": results[1:]}
+
+
+def _local(t: Optional[datetime]) -> Optional[datetime]:
+    """排程时间均为本地无时区时间；带时区的查询参数先换算为本地时间。"""
+    if t is not None and t.tzinfo is not None:
+        return t.astimezone().replace(tzinfo=None)
+    return t
 
 
 @router.get("/schedule", tags=["Scheduling"])
-def get_schedule(db: Session = Depends(get_db)) -> Dict[str, Any]:
-    """根据当前 released/in_progress 工单返回简易排程（同 run）。"""
-    return run_scheduling(db)
\ No newline at end of file
+def get_schedule(
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    equipment_id: Optional[List[int]] = Query(None),
+    workshop_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    返回当前排程（结构同 run）。
+    排程输入未变化时直接返回缓存结果；响应带 ETag，If-None-Match 命中时返回 304。
+
+    筛选与分页（在缓存的排程上查询，不重新排程）：
+    - start / end：只返回与时间窗口 [start, end) 有重叠的任务
+    - equipment_id（可重复）/ workshop_id：按设备 / 设备所在车间过滤
+    - skip / limit：分页，任务按开工时间、设备排序；结果另附 total（命中总数）
+    - 有筛选时 loads / warnings 只统计本页任务
+    - format=ndjson：逐行流式输出命中的任务（不分页），用于导出完整计划
+    """
+    now = _schedule_now()
+    version = schedule_cache.current_version()
+    key = schedule_cache.schedule_key(now, version)
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    entry = schedule_cache.get_or_compute(key, lambda: _compute(db, now, version))
+    filtered = any(v is not None for v in (start, end, equipment_id, workshop_id, limit)) or skip > 0
+    if format == "json" and not filtered:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    state = entry.state
+    tasks = select_tasks(state, _local(start), _local(end), equipment_id, workshop_id)
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(state, tasks), media_type="application/x-ndjson", headers=headers)
+    return JSONResponse(content=build_page(state, tasks, skip, limit), headers=headers)
+
+
+@router.get("/schedule/analytics", tags=["Scheduling"])
+def get_schedule_analytics(
+    start: Optional[datetime] = None,
+    days: int = Query(14, ge=1, le=366),
+    top: int = Query(10, ge=0, le=1000),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    当前排程的负荷与延误分析（在缓存的排程上计算，不重新排程）：
+    - equipment：各设备加工工时 / 占用时长 / 排程周期内利用率 / 延误任务数，按利用率降序（瓶颈排序）
+    - daily_utilisation：从 start（默认排程基准日）起 days 天，各设备每日利用率
+    - late_work_orders：延误工时最多的 top 个工单
+    """
+    now = _schedule_now()
+    version = schedule_cache.current_version()
+    entry = schedule_cache.get_or_compute(schedule_cache.schedule_key(now, version), lambda: _compute(db, now, version))
+    return schedule_analytics(entry.state, _local(start), days, top)
+
+
+@router.get("/schedule/promise", tags=["Scheduling"])
+def get_delivery_promise(
+    product_id: int,
+    quantity: float = Query(..., gt=0),
+    routing_id: Optional[int] = None,
+    earliest_start: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    交期承诺试算：产品 product_id 再生产 quantity 件时的最早完工时间。
+    按产品启用的工艺路线（或指定 routing_id）展开工序，试插入当前排程各设备的空闲区间，
+    已有任务不动；不创建工单、不写数据库。earliest_start 为最早可开工时间（如物料到货），默认排程基准时刻。
+    """
+    if routing_id is None:
+        routing = active_routing(db, product_id)
+        if routing is None:
+            raise HTTPException(status_code=404, detail="Active routing not found for product")
+    else:
+        routing = db.query(Routing).filter(Routing.id == routing_id).first()
+        if routing is None:
+            raise HTTPException(status_code=404, detail="Routing not found")
+        if routing.product_id != product_id:
+            raise HTTPException(status_code=400, detail="Routing does not belong to product")
+    steps = load_routing_steps(db, routing.id)
+    if not steps:
+        raise HTTPException(status_code=400, detail="Routing has no operations")
+    now = _schedule_now()
+    version = schedule_cache.current_version()
+    entry = schedule_cache.get_or_compute(schedule_cache.schedule_key(now, version), lambda: _compute(db, now, version))
+    result = quote(db, entry.state, steps, quantity, _local(earliest_start))
+    return {"product_id": product_id, "routing_id": routing.id, "routing_code": routing.code, **result}
+
+
+@router.get("/schedule/dispatch-list/{equipment_id}", tags=["Scheduling"])
+def get_dispatch_list(
+    equipment_id: int,
+    rule: Optional[str] = Query(None, pattern="^(priority|cr|edd|spt)$"),
+    limit: int = Query(20, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    设备派工队列：设备上当前可开工的工单工序（工单已下达 / 进行中、工序未完工、前道工序均已完工），按规则排序。
+    - rule：priority（工单优先级）/ cr（关键比，越小越紧急）/ edd（计划完工最早）/ spt（剩余工时最短），
+      默认取配置 dispatch_rule
+    - 在内存索引上查询，工单 / 报工变更后只重新加载涉及的工单，不重新排程
+    """
+    equipment = db.query(Equipment).filter(Equipment.id == equipment_id).first()
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipment not found")
+    rule = rule or settings.dispatch_rule
+    now = datetime.now()
+    total, entries = dispatch_index.top(db, equipment_id, rule, limit, now)
+    return {
+        "equipment_id": equipment_id,
+        "equipment_code": equipment.code,
+        "rule": rule,
+        "generated_at": now.isoformat(),
+        "total": total,
+        "items": [dispatch_row(entry, rank, now) for rank, entry in enumerate(entries, 1)],
+    }
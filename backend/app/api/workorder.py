@@ -1,17 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 from datetime import datetime
 from app.database import get_db
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 from app.models.workorder import WorkOrder, WorkOrderOperation, WorkReport, WIPTracking
 from app.models.master import Material, BOM, Routing, RoutingItem
+from app.services.schedule_cache import bump_data_version
+from app.services.work_reports import (
+    apply_work_report, apply_work_reports, find_reports_by_key, invalidate_wip_barcodes, remember_keys,
+)
+from app.services.report_spool import get_spool
 from app.schemas.workorder import (
     WorkOrderCreate, WorkOrderUpdate, WorkOrderResponse,
-    WorkReportCreate, WorkReportResponse,
+    WorkReportCreate, WorkReportResponse, WorkReportBatchResponse,
     WIPTrackingCreate, WIPTrackingUpdate, WIPTrackingResponse
 )
 
@@ -100,6 +108,7 @@ def create_work_order(work_order: WorkOrderCreate, db: Session = Depends(get_db)
                     db.add(db_op)
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     logger.info(f"✓ 工单创建成功: ID={db_wo.id}, 编号={db_wo.code}")
     return db_wo
 
@@ -140,6 +149,7 @@ def update_work_order(work_order_id: int, work_order: WorkOrderUpdate, db: Sessi
     
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     return db_wo
 
 
@@ -161,6 +171,7 @@ def generate_operations(work_order_id: int, force: bool = False, db: Session = D
     if existing and force:
         db.query(WorkOrderOperation).filter(WorkOrderOperation.work_order_id == work_order_id).delete()
         db.commit()
+        bump_data_version([work_order_id])
 
     routing = db.query(Routing).filter(Routing.id == db_wo.routing_id).first()
     if not routing:
@@ -177,6 +188,7 @@ def generate_operations(work_order_id: int, force: bool = False, db: Session = D
             planned_start_date=db_wo.planned_start_date,
         ))
     db.commit()
+    bump_data_version([work_order_id])
     count = db.query(WorkOrderOperation).filter(WorkOrderOperation.work_order_id == work_order_id).count()
     return {"message": "Operations generated", "count": count}
 
@@ -190,6 +202,7 @@ def delete_work_order(work_order_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_wo)
     db.commit()
+    bump_data_version([work_order_id])
     return {"message": "Work Order deleted successfully"}
 
 @router.post("/work-orders/{work_order_id}/release", response_model=WorkOrderResponse, tags=["Work Order"])
@@ -206,6 +219,7 @@ def release_work_order(work_order_id: int, db: Session = Depends(get_db)):
     db_wo.status = "released"
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     logger.info(f"✓ 工单已下达: {db_wo.code}")
     return db_wo
 
@@ -224,6 +238,7 @@ def start_work_order(work_order_id: int, db: Session = Depends(get_db)):
     db_wo.actual_start_date = datetime.now()
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     return db_wo
 
 
@@ -241,6 +256,7 @@ def complete_work_order(work_order_id: int, db: Session = Depends(get_db)):
     db_wo.actual_end_date = datetime.now()
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     return db_wo
 
 
@@ -254,117 +270,95 @@ def cancel_work_order(work_order_id: int, db: Session = Depends(get_db)):
     db_wo.status = "cancelled"
     db.commit()
     db.refresh(db_wo)
+    bump_data_version([db_wo.id])
     return db_wo
 
 @router.post("/work-reports", response_model=WorkReportResponse, tags=["Work Order"])
-def create_work_report(report: WorkReportCreate, db: Session = Depends(get_db)):
-    """创建报工记录（扫码报工）"""
-    # 验证工单存在
-    db_wo = db.query(WorkOrder).filter(WorkOrder.id == report.work_order_id).first()
-    if not db_wo:
-        raise HTTPException(status_code=404, detail="Work Order not found")
-    
+def create_work_report(report: WorkReportCreate, response: Response, db: Session = Depends(get_db)):
+    """
+    创建报工记录（扫码报工）；开启报工 spool 时写入追加日志后立即返回 202。
+    幂等键已提交过时返回原报工（响应头 Idempotent-Replayed: true），不再累加数量。
+    """
     logger.info(f"报工: 工单ID={report.work_order_id}, 类型={report.report_type}, 数量={report.quantity}")
-    
-    # 创建报工记录
-    report_data = report.dict()
-    if not report_data.get('report_time'):
-        report_data['report_time'] = datetime.now()
-    
-    db_report = WorkReport(**report_data)
-    db.add(db_report)
-    
-    # 更新工单数量
-    if report.report_type == "complete":
-        db_wo.completed_quantity += report.quantity
-    elif report.report_type == "scrap":
-        db_wo.scrapped_quantity += report.quantity
-    
-    # 更新工单工序数量 / 状态
-    db_op = None
-    if report.work_order_operation_id:
-        db_op = db.query(WorkOrderOperation).filter(
-            WorkOrderOperation.id == report.work_order_operation_id
-        ).first()
-        if db_op:
-            if report.report_type == "start":
-                db_op.status = "in_progress"
-                if not db_op.actual_start_date:
-                    db_op.actual_start_date = datetime.now()
-            elif report.report_type == "complete":
-                db_op.completed_quantity += report.quantity
-                if db_op.completed_quantity >= db_op.planned_quantity:
-                    db_op.status = "completed"
-                    db_op.actual_end_date = datetime.now()
-            elif report.report_type == "scrap":
-                db_op.scrapped_quantity += report.quantity
-            elif report.report_type == "pause":
-                # 暂停当前工序
-                if db_op.status == "in_progress":
-                    db_op.status = "paused"
-            elif report.report_type == "resume":
-                # 恢复已暂停工序
-                if db_op.status == "paused":
-                    db_op.status = "in_progress"
-
-    # 同步 WIP 跟踪（按条码），仅在有工单工序且有条码时生效
-    if report.barcode and db_op:
-        qty = report.quantity or 0
-        if qty > 0:
-            wip_item = (
-                db.query(WIPTracking)
-                .filter(
-                    WIPTracking.work_order_id == db_wo.id,
-                    WIPTracking.operation_id == db_op.operation_id,
-                    WIPTracking.batch_number == report.barcode,
-                )
-                .first()
-            )
-
-            if report.report_type == "start":
-                # 开工：将条码视为一批在制品，累加数量
-                if wip_item:
-                    wip_item.quantity = (wip_item.quantity or 0) + qty
-                    wip_item.status = "wip"
-                else:
-                    wip_item = WIPTracking(
-                        work_order_id=db_wo.id,
-                        operation_id=db_op.operation_id,
-                        material_id=db_wo.product_id,
-                        batch_number=report.barcode,
-                        # 为了演示方便，序列号也填同一个条码，便于两种方式追溯
-                        serial_number=report.barcode,
-                        quantity=qty,
-                        status="wip",
-                        operator_id=report.operator_id,
-                        equipment_id=report.equipment_id,
-                    )
-                    db.add(wip_item)
-            elif report.report_type in ("complete", "scrap") and wip_item:
-                # 完工 / 报废：从在制数量中扣减，没有剩余则删掉 WIP 记录
-                remaining = (wip_item.quantity or 0) - qty
-                if remaining > 0:
-                    wip_item.quantity = remaining
-                    wip_item.status = "wip"
-                else:
-                    db.delete(wip_item)
-    
-    # 更新工单状态
-    if report.report_type == "start" and db_wo.status == "released":
-        db_wo.status = "in_progress"
-        if not db_wo.actual_start_date:
-            db_wo.actual_start_date = datetime.now()
-    elif report.report_type == "pause" and db_wo.status == "in_progress":
-        db_wo.status = "paused"
-    elif report.report_type == "resume" and db_wo.status == "paused":
-        db_wo.status = "in_progress"
-    
-    db.commit()
+
+    key = report.idempotency_key
+    existing = find_reports_by_key(db, [key]).get(key) if key else None
+    if existing is not None:
+        logger.info(f"报工重放: 幂等键={key}, 报工ID={existing.id}")
+        response.headers["Idempotent-Replayed"] = "true"
+        return existing
+
+    if settings.work_report_spool:
+        if not db.query(WorkOrder.id).filter(WorkOrder.id == report.work_order_id).first():
+            raise HTTPException(status_code=404, detail="Work Order not found")
+        if report.report_time is None:
+            report.report_time = datetime.now()  # 报工时间取扫码时刻，而不是入库时刻
+        seq = get_spool().append(report)
+        return JSONResponse(status_code=202, content={
+            "status": "queued", "spool_seq": seq, "work_order_id": report.work_order_id,
+            "report_type": report.report_type,
+        })
+
+    # 数量与状态在数据库中原子累加 / 流转，并发报工同一工单不会丢失数量
+    db_report = apply_work_report(db, report)
+    if db_report is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Work Order not found")
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同一幂等键的并发请求已先提交：本次写入回滚，返回先提交的报工
+        db.rollback()
+        existing = find_reports_by_key(db, [key]).get(key) if key else None
+        if existing is None:
+            raise
+        response.headers["Idempotent-Replayed"] = "true"
+        return existing
     db.refresh(db_report)
+    remember_keys([db_report])
+    bump_data_version([report.work_order_id])
     logger.info(f"✓ 报工成功: 报工ID={db_report.id}, 类型={report.report_type}")
     return db_report
 
 
+@router.post("/work-reports/batch", response_model=WorkReportBatchResponse, tags=["Work Order"])
+def create_work_reports_batch(reports: List[WorkReportCreate], db: Session = Depends(get_db)):
+    """批量报工：一个事务内按数组顺序写入，结果与逐条报工相同，逐条返回结果（幂等键重复的条目为 replayed）"""
+    if len(reports) > settings.work_report_batch_max:
+        raise HTTPException(status_code=400, detail=f"At most {settings.work_report_batch_max} reports per batch")
+    logger.info(f"批量报工: {len(reports)} 条")
+
+    for attempt in range(2):
+        db_reports, replayed = apply_work_reports(db, reports)
+        ids = [r.id for r in db_reports if r is not None]
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # 同一幂等键的并发请求已先提交：回滚后重做一次，这些条目按重放处理
+            db.rollback()
+            if attempt:
+                raise
+    # 提交后报工对象已过期，一次查询重新加载，避免序列化时逐条刷新
+    db.query(WorkReport).filter(WorkReport.id.in_(ids)).all()
+    remember_keys(db_reports)
+    results = []
+    for index, db_report in enumerate(db_reports):
+        if db_report is None:
+            results.append({"index": index, "status": "error", "detail": "Work Order not found"})
+        else:
+            status = "replayed" if index in replayed else "created"
+            results.append({"index": index, "status": status, "report": db_report})
+    failed = sum(1 for r in db_reports if r is None)
+    created = len(reports) - failed - len(replayed)
+    if created:
+        bump_data_version([r.work_order_id for i, r in enumerate(db_reports) if r is not None and i not in replayed])
+    logger.info(f"✓ 批量报工完成: 成功 {created} 条, 重放 {len(replayed)} 条, 失败 {failed} 条")
+    return {"total": len(reports), "created": created, "replayed": len(replayed), "failed": failed,
+            "results": results}
+
+
 @router.get("/work-reports", response_model=List[WorkReportResponse], tags=["Work Order"])
 def get_work_reports(
     skip: int = 0, 
@@ -379,6 +373,14 @@ def get_work_reports(
     return query.order_by(WorkReport.report_time.desc()).offset(skip).limit(limit).all()
 
 
+@router.get("/work-reports/spool", tags=["Work Order"])
+def get_work_report_spool():
+    """报工 spool 状态：积压条数、最早未入库报工的等待时长等"""
+    if not settings.work_report_spool:
+        return {"enabled": False}
+    return get_spool().status()
+
+
 @router.get("/work-reports/{report_id}", response_model=WorkReportResponse, tags=["Work Order"])
 def get_work_report(report_id: int, db: Session = Depends(get_db)):
     """获取报工记录详情"""
@@ -395,6 +397,7 @@ def create_wip_tracking(wip: WIPTrackingCreate, db: Session = Depends(get_db)):
     db_wip = WIPTracking(**wip.dict())
     db.add(db_wip)
     db.commit()
+    invalidate_wip_barcodes([wip.batch_number])
     db.refresh(db_wip)
     return db_wip
 
@@ -446,10 +449,13 @@ def update_wip_tracking(wip_id: int, wip: WIPTrackingUpdate, db: Session = Depen
     if not db_wip:
         raise HTTPException(status_code=404, detail="WIP Tracking not found")
     
+    barcodes = [db_wip.batch_number]
     for key, value in wip.dict(exclude_unset=True).items():
         setattr(db_wip, key, value)
+    barcodes.append(db_wip.batch_number)
     
     db.commit()
+    invalidate_wip_barcodes(barcodes)
     db.refresh(db_wip)
     return db_wip
 
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from datetime import date, time
 from typing import List
 
 
@@ -19,10 +20,44 @@ class Settings(BaseSettings):
     secret_key: str = "your-secret-key-here-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+
+    # Scheduling
+    schedule_day_start: str = "08:00"  # 每日开工时间 HH:MM
+    schedule_workdays: str = "0,1,2,3,4,5,6"  # 工作日（0=周一 ... 6=周日）
+    schedule_holidays: str = ""  # 节假日 YYYY-MM-DD，逗号分隔
+    schedule_setup_window: int = 2  # 换型感知排程：为合并同工序任务可越过的优先级档数
+    schedule_job_workers: int = 2  # 后台排程任务的并发数
+    schedule_job_history: int = 100  # 保留的排程任务数
+    schedule_workers: int = 1  # 按车间并行排程的进程数，1 表示在当前进程内串行排程
+    schedule_scenario_workers: int = 4  # What-if 场景并行排程的进程数
+    schedule_optimize_workers: int = 4  # 排程局部搜索优化的进程数（各用不同随机种子）
+    schedule_optimize_seconds: float = 10.0  # 排程局部搜索优化的默认时间预算（秒）
+    dispatch_rule: str = "priority"  # 设备派工队列的默认规则：priority / cr / edd / spt
+    work_report_batch_max: int = 1000  # 批量报工单次请求的最大条数
+    work_report_idempotency_cache: int = 10000  # 最近幂等键（-> 报工 id）的内存 LRU 条数
+    work_report_spool: bool = False  # 报工先写入本地追加日志并立即确认，后台批量入库
+    work_report_spool_dir: str = "spool"  # 报工追加日志目录
+    work_report_spool_batch: int = 500  # 追加日志每批入库的最大条数
+    work_report_spool_segment_mb: int = 64  # 追加日志分段文件大小（MB）
+    wip_barcode_cache: int = 4096  # 活跃条码 -> 在制品行的内存 LRU 条数，0 关闭
+    oee_close_delay_minutes: int = 60  # 时段结束多久后视为关闭（留给班末集中上传），关闭后 OEE 结果缓存
+    oee_lookback_hours: int = 72  # 重建设备运行区间时向前多加载的报工时长（之前开工、仍在运行的工序）
     
     @property
     def origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.allowed_origins.split(",")]
+
+    @property
+    def schedule_day_start_time(self) -> time:
+        return time.fromisoformat(self.schedule_day_start.strip())
+
+    @property
+    def schedule_workday_list(self) -> List[int]:
+        return [int(d) for d in self.schedule_workdays.split(",") if d.strip()]
+
+    @property
+    def schedule_holiday_list(self) -> List[date]:
+        return [date.fromisoformat(d.strip()) for d in self.schedule_holidays.split(",") if d.strip()]
     
     class Config:
         env_file = ".env"
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api import master, workorder, inventory, department, workshop
 from app.api.schedule import router as schedule_router
+from app.api.production import router as production_router
+from app.services.report_spool import get_spool, close_spool
 import logging
 import time
 import os
@@ -65,6 +67,19 @@ app.include_router(inventory, prefix=settings.api_prefix, tags=["Inventory"])
 app.include_router(department, prefix=settings.api_prefix, tags=["Master Data"])
 app.include_router(workshop, prefix=settings.api_prefix, tags=["Master Data"])
 app.include_router(schedule_router, prefix=settings.api_prefix, tags=["Scheduling"])
+app.include_router(production_router, prefix=settings.api_prefix, tags=["Production"])
+
+
+@app.on_event("startup")
+def open_report_spool():
+    """开启报工 spool 时在启动阶段恢复日志，并继续入库上次未入库的报工"""
+    if settings.work_report_spool:
+        get_spool()
+
+
+@app.on_event("shutdown")
+def shutdown_report_spool():
+    close_spool()
 
 
 @app.get("/")
@@ -111,6 +111,9 @@ class Operation(Base):
     operation_type = Column(String(50))  # 加工、装配、检验等
     standard_time = Column(Float, default=0)  # 标准工时(分钟)
     workshop_id = Column(Integer, ForeignKey("workshops.id"), nullable=True)  # 工作地点（车间）
+    tooling_id = Column(Integer, ForeignKey("tooling.id"), nullable=True)  # 加工时占用的工装
+    tooling_quantity = Column(Integer, default=1)  # 占用工装数量
+    skill_level = Column(String(50), nullable=True)  # 操作人员最低技能等级
     description = Column(Text)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
@@ -118,6 +121,7 @@ class Operation(Base):
     # 关系
     routing_items = relationship("RoutingItem", back_populates="operation")
     workshop = relationship("Workshop")
+    tooling = relationship("Tooling")
 
 
 # 设备表
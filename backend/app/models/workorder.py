@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -99,7 +99,8 @@ class WorkReport(Base):
     shift_id = Column(Integer, ForeignKey("shifts.id"), nullable=True)
     barcode = Column(String(200))  # 扫码内容
     notes = Column(Text)
-    report_time = Column(DateTime, default=datetime.now)
+    report_time = Column(DateTime, default=datetime.now, index=True)  # OEE 按时间范围加载报工事件
+    idempotency_key = Column(String(100), unique=True, index=True, nullable=True)  # 客户端幂等键，重试不重复报工
     created_at = Column(DateTime, default=datetime.now)
     
     # 关系
@@ -110,16 +111,72 @@ class WorkReport(Base):
     shift = relationship("Shift")
 
 
+# 报工追加日志（spool）入库进度表：与报工记录在同一事务中更新，重启后据此跳过已入库的记录
+class WorkReportSpoolCheckpoint(Base):
+    __tablename__ = "work_report_spool_checkpoints"
+
+    name = Column(String(50), primary_key=True)
+    applied_seq = Column(Integer, nullable=False, default=0)  # 已入库的最大序号
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+# 产量汇总表：完工 / 报废报工按 (小时, 设备, 班次, 工序, 工单) 累计，与报工在同一事务中更新
+class ProductionRollup(Base):
+    __tablename__ = "production_rollups"
+    __table_args__ = (
+        UniqueConstraint("hour", "equipment_id", "shift_id", "operation_id", "work_order_id",
+                         name="uq_production_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    hour = Column(DateTime, nullable=False)  # 报工时间所在整点
+    equipment_id = Column(Integer, nullable=False, default=0)  # 以下维度 0 表示未指定
+    shift_id = Column(Integer, nullable=False, default=0)
+    operation_id = Column(Integer, nullable=False, default=0)  # 工序（operations.id）
+    work_order_id = Column(Integer, nullable=False, default=0)
+    completed_quantity = Column(Float, nullable=False, default=0)
+    scrapped_quantity = Column(Float, nullable=False, default=0)
+    report_count = Column(Integer, nullable=False, default=0)  # 完工 / 报废报工条数
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+# 设备 OEE 缓存：已关闭的时段（班次 / 生产日）算过一次后保存各项累计值，历史不再重算
+class OEEPeriod(Base):
+    __tablename__ = "oee_periods"
+    __table_args__ = (
+        UniqueConstraint("granularity", "equipment_id", "shift_id", "period_start", name="uq_oee_period"),
+        # 迟到的报工按 (设备, 时段结束) 删除受影响的缓存
+        Index("ix_oee_periods_equipment_end", "equipment_id", "period_end"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # shift / day
+    equipment_id = Column(Integer, nullable=False)
+    shift_id = Column(Integer, nullable=False, default=0)  # 按生产日时为 0
+    period_start = Column(DateTime, nullable=False)
+    period_end = Column(DateTime, nullable=False)
+    planned_seconds = Column(Float, nullable=False, default=0)  # 计划生产时间（班次内）
+    run_seconds = Column(Float, nullable=False, default=0)  # 运行时间
+    ideal_seconds = Column(Float, nullable=False, default=0)  # 理想节拍 × 产出数（含报废）
+    good_quantity = Column(Float, nullable=False, default=0)
+    total_quantity = Column(Float, nullable=False, default=0)
+    computed_at = Column(DateTime, default=datetime.now)
+
+
 # 在制品追溯表
 class WIPTracking(Base):
     __tablename__ = "wip_tracking"
+    __table_args__ = (
+        # 扫码报工按 (工单, 工序, 条码) 定位在制品；也覆盖按工单筛选的列表查询
+        Index("ix_wip_tracking_wo_op_batch", "work_order_id", "operation_id", "batch_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     work_order_id = Column(Integer, ForeignKey("work_orders.id"))
     operation_id = Column(Integer, ForeignKey("operations.id"))
     material_id = Column(Integer, ForeignKey("materials.id"))
-    batch_number = Column(String(100))
-    serial_number = Column(String(100))
+    batch_number = Column(String(100), index=True)  # 按批次号追溯
+    serial_number = Column(String(100), index=True)  # 按序列号追溯
     quantity = Column(Float, nullable=False)
     status = Column(String(20), default="wip")  # wip, completed, scrapped
     location = Column(String(200))
@@ -18,3 +18,7 @@ from .department import (
 from .workshop import (
 	WorkshopCreate, WorkshopUpdate, WorkshopResponse
 )
+from .schedule import (
+	IncrementalScheduleRequest, PriorityOverride, QuantityOverride, EquipmentDowntime,
+	ScheduleScenario, ScenarioRequest
+)
@@ -202,6 +202,9 @@ class OperationBase(BaseModel):
     operation_type: Optional[str] = None
     standard_time: Optional[float] = 0
     workshop_id: Optional[int] = None
+    tooling_id: Optional[int] = None
+    tooling_quantity: Optional[int] = Field(1, ge=1)
+    skill_level: Optional[str] = Field(None, max_length=50)
     description: Optional[str] = None
 
 
@@ -215,6 +218,9 @@ class OperationUpdate(BaseModel):
     operation_type: Optional[str] = None
     standard_time: Optional[float] = None
     workshop_id: Optional[int] = None
+    tooling_id: Optional[int] = None
+    tooling_quantity: Optional[int] = Field(None, ge=1)
+    skill_level: Optional[str] = Field(None, max_length=50)
     description: Optional[str] = None
 
 
@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field, validator
+from typing import List
+from datetime import datetime
+
+
+class IncrementalScheduleRequest(BaseModel):
+    # 本次变更的工单 / 工单工序；工单状态接口产生的变更会自动记录，无需重复传入
+    work_order_ids: List[int] = Field(default_factory=list)
+    work_order_operation_ids: List[int] = Field(default_factory=list)
+
+
+# What-if 场景覆盖项（只作用于本次场景计算，不修改数据库）
+class PriorityOverride(BaseModel):
+    work_order_id: int
+    priority: int
+
+
+class QuantityOverride(BaseModel):
+    work_order_id: int
+    planned_quantity: float = Field(..., ge=0)  # 覆盖该工单全部工序的计划数量
+
+
+class EquipmentDowntime(BaseModel):
+    equipment_id: int
+    start: datetime
+    end: datetime
+
+    @validator('end')
+    def end_after_start(cls, v, values):
+        if 'start' in values and (v.tzinfo is None) != (values['start'].tzinfo is None):
+            raise ValueError('start and end must both include or both omit a time zone')
+        if 'start' in values and v <= values['start']:
+            raise ValueError('end must be later than start')
+        return v
+
+
+class ScheduleScenario(BaseModel):
+    name: str
+    priorities: List[PriorityOverride] = Field(default_factory=list)
+    quantities: List[QuantityOverride] = Field(default_factory=list)
+    downtimes: List[EquipmentDowntime] = Field(default_factory=list)
+
+
+class ScenarioRequest(BaseModel):
+    scenarios: List[ScheduleScenario] = Field(..., min_length=1, max_length=20)
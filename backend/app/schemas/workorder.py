@@ -120,6 +120,7 @@ class WorkReportBase(BaseModel):
     barcode: Optional[str] = None
     notes: Optional[str] = None
     report_time: Optional[datetime] = None
+    idempotency_key: Optional[str] = Field(None, max_length=100)  # 客户端生成，重试时沿用
 
 
 class WorkReportCreate(WorkReportBase):
@@ -134,6 +135,23 @@ class WorkReportResponse(WorkReportBase):
         from_attributes = True
 
 
+class WorkReportBatchItem(BaseModel):
+    """批量报工中单条报工的结果"""
+    index: int  # 在请求数组中的位置
+    status: str  # created / replayed（幂等键已提交过，返回原报工）/ error
+    report: Optional[WorkReportResponse] = None
+    detail: Optional[str] = None
+
+
+class WorkReportBatchResponse(BaseModel):
+    """批量报工结果"""
+    total: int
+    created: int
+    replayed: int
+    failed: int
+    results: List[WorkReportBatchItem]
+
+
 # Nested schemas for WIP Tracking
 class WorkOrderSimple(BaseModel):
     """工单简化信息"""
@@ -0,0 +1,287 @@
+"""
+设备派工队列（Dispatch List）
+
+回答 “这台设备接下来做什么”：列出设备上可开工的工单工序，按派工规则排序。
+- 可开工：工单为 released / in_progress，工序未完工，且同工单 sequence 更小的工序全部完工
+- 规则：priority（工单优先级 / 工单 / 工序顺序，同排程队列）、edd（计划完工最早）、
+  spt（剩余工时最短）、cr（关键比 = 距计划完工的小时数 / 剩余工时，越小越紧急）
+- 内存索引：进程内保存全部可开工工序，每台设备每种规则一个小顶堆（首次按该规则查询时建立），
+  变更后压入新条目、旧条目出堆时惰性丢弃；取前 limit 项只需弹出再压回 limit 项
+- 更新：工单 / 报工等接口调用 schedule_cache.bump_data_version 时，索引只在单独的短锁下记下涉及的工单，
+  下次查询时一次查询重新加载这些工单的工序；主数据变更时整体重建
+- 并发：查询数据库时不持有任何锁；各次查询按开始顺序取号，加载结果按号依次写入索引，
+  后开始的查询等待先开始的写入完成，因此看得到查询开始前的全部变更
+cr 随当前时刻变化，不能保持在堆中，按设备当前的 k 道可开工工序逐一计算。
+"""
+import heapq
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.master import Operation
+from app.models.workorder import WorkOrder, WorkOrderOperation
+from app.services import schedule_cache
+from app.services.scheduler import SCHEDULABLE_STATUSES
+
+RULES = ("priority", "cr", "edd", "spt")
+# 堆中失效条目超过有效条目的倍数后重建该堆
+COMPACT_RATIO = 2
+# 待刷新工单超过该数量时整体重建（避免超长 IN 列表）
+MAX_DIRTY = 2000
+
+
+@dataclass
+class DispatchEntry:
+    """一道可开工的工单工序"""
+    id: int
+    work_order_id: int
+    work_order_code: Optional[str]
+    priority: Optional[int]
+    due: Optional[datetime]  # 工单计划完工时间
+    operation_id: int
+    operation_code: Optional[str]
+    operation_name: Optional[str]
+    sequence: int
+    equipment_id: int
+    status: Optional[str]
+    remaining_quantity: float
+    hours: float  # 剩余工时
+    planned_start_date: Optional[datetime]
+    stamp: int = field(default=0, compare=False)  # 条目版本，堆中版本不一致的条目已失效
+
+
+def rule_key(entry: DispatchEntry, rule: str) -> Tuple:
+    """静态规则的排序键；同值时按 priority 规则（与排程队列顺序一致，优先级为空的排在最前）。"""
+    base = (entry.priority is not None, entry.priority or 0, entry.work_order_id, entry.sequence, entry.id)
+    if rule == "edd":
+        return (entry.due is None, entry.due or datetime.max, *base)
+    if rule == "spt":
+        return (entry.hours, *base)
+    return base
+
+
+def critical_ratio(entry: DispatchEntry, now: datetime) -> Optional[float]:
+    """关键比：距计划完工的小时数 / 剩余工时（剩余工时不足 1 分钟按 1 分钟计）；未设置计划完工时为 None。"""
+    if entry.due is None:
+        return None
+    return (entry.due - now).total_seconds() / 3600 / max(entry.hours, 1 / 60)
+
+
+def _query(db: Session):
+    return (
+        db.query(
+            WorkOrderOperation.id,
+            WorkOrderOperation.work_order_id,
+            WorkOrderOperation.operation_id,
+            WorkOrderOperation.sequence,
+            WorkOrderOperation.equipment_id,
+            WorkOrderOperation.status,
+            WorkOrderOperation.planned_quantity,
+            WorkOrderOperation.completed_quantity,
+            WorkOrderOperation.planned_start_date,
+            WorkOrder.code,
+            WorkOrder.priority,
+            WorkOrder.planned_end_date,
+            Operation.code,
+            Operation.name,
+            Operation.standard_time,
+        )
+        .join(WorkOrder, WorkOrderOperation.work_order_id == WorkOrder.id)
+        .outerjoin(Operation, WorkOrderOperation.operation_id == Operation.id)
+        .filter(WorkOrder.status.in_(SCHEDULABLE_STATUSES))
+        .order_by(WorkOrderOperation.work_order_id.asc(), WorkOrderOperation.sequence.asc())
+    )
+
+
+def eligible_entries(rows) -> List[DispatchEntry]:
+    """按工单、sequence 排序的工序行中可开工的工序：未完工，且同工单前面各段全部完工。"""
+    entries: List[DispatchEntry] = []
+    work_order_id = None
+    blocked_after = None  # 本工单第一道未完工工序的 sequence，其后各段尚不能开工
+    for (
+        woo_id, wo_id, op_id, sequence, equipment_id, status, planned_qty, completed_qty, planned_start,
+        wo_code, priority, due, op_code, op_name, std_min,
+    ) in rows:
+        if wo_id != work_order_id:
+            work_order_id, blocked_after = wo_id, None
+        if status == "completed":
+            continue
+        if blocked_after is None:
+            blocked_after = sequence
+        elif sequence > blocked_after:
+            continue
+        if equipment_id is None:
+            continue
+        remaining = max((planned_qty or 0.0) - (completed_qty or 0.0), 0)
+        std_min = float(std_min or 0)
+        # 同 scheduler.operation_hours：未设置标准时间时按 1 件/小时
+        hours = remaining * std_min / 60 if std_min > 0 else remaining
+        entries.append(DispatchEntry(
+            woo_id, wo_id, wo_code, priority, due, op_id, op_code, op_name, sequence, equipment_id,
+            status, remaining, hours, planned_start,
+        ))
+    return entries
+
+
+class DispatchIndex:
+    """各设备可开工工序的内存索引（进程内单例 dispatch_index）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # 保护索引；不跨数据库查询持有
+        self._applied = threading.Condition(self._lock)
+        self._pending_lock = threading.Lock()  # 只保护待刷新标记
+        self._pending: Set[int] = set()
+        self._pending_full = True  # 尚未加载或需要整体重建
+        self._next_ticket = 0
+        self._inflight: Set[int] = set()  # 已取号、尚未写入索引的查询
+        self._entries: Dict[int, DispatchEntry] = {}
+        self._by_work_order: Dict[int, List[int]] = {}
+        self._queues: Dict[int, Set[int]] = {}  # 设备 -> 可开工工序 id
+        self._heaps: Dict[Tuple[int, str], List[Tuple[Tuple, int, int]]] = {}  # (设备, 规则) -> [(键, 版本, 工序 id)]
+        self._stamp = 0
+
+    def invalidate(self, work_order_ids: Optional[FrozenSet[int]]) -> None:
+        """schedule_cache 变更监听：只在 _pending_lock 下做标记，下次查询时刷新。"""
+        with self._pending_lock:
+            if work_order_ids is None:
+                self._pending_full = True
+            elif not self._pending_full:
+                self._pending |= work_order_ids
+                if len(self._pending) > MAX_DIRTY:
+                    self._pending_full = True
+
+    def _take_pending(self) -> Tuple[bool, Set[int]]:
+        with self._pending_lock:
+            full, dirty = self._pending_full, self._pending
+            self._pending_full, self._pending = False, set()
+        return full, (set() if full else dirty)
+
+    def _add(self, entry: DispatchEntry) -> None:
+        old = self._entries.get(entry.id)
+        if old is not None and old == entry:
+            return  # 未变化：沿用堆中的条目
+        self._stamp += 1
+        entry.stamp = self._stamp
+        self._entries[entry.id] = entry
+        if old is not None and old.equipment_id != entry.equipment_id:
+            self._queues[old.equipment_id].discard(entry.id)
+        self._queues.setdefault(entry.equipment_id, set()).add(entry.id)
+        for rule in RULES:
+            heap = self._heaps.get((entry.equipment_id, rule))
+            if heap is not None:
+                heapq.heappush(heap, (rule_key(entry, rule), entry.stamp, entry.id))
+
+    def _remove(self, woo_id: int) -> None:
+        entry = self._entries.pop(woo_id, None)
+        if entry is not None:
+            self._queues[entry.equipment_id].discard(woo_id)
+
+    def _refresh(self, db: Session) -> None:
+        """
+        取号并取走待刷新标记，在锁外查询数据库，再按号依次写入索引；返回时持有 _lock，
+        且查询开始前的全部变更都已写入。调用方已持有 _lock。
+        """
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._inflight.add(ticket)
+        full, dirty = self._take_pending()
+        entries: Optional[List[DispatchEntry]] = None
+        self._lock.release()
+        try:
+            if full:
+                entries = eligible_entries(_query(db).all())
+            elif dirty:
+                entries = eligible_entries(_query(db).filter(WorkOrderOperation.work_order_id.in_(dirty)).all())
+        except BaseException:
+            self.invalidate(None)  # 标记已取走，查询失败时下次整体重建
+            raise
+        finally:
+            self._lock.acquire()
+            try:
+                while min(self._inflight) < ticket:
+                    self._applied.wait()
+                if entries is not None:
+                    self._apply(full, dirty, entries)
+            finally:
+                self._inflight.discard(ticket)
+                self._applied.notify_all()
+
+    def _apply(self, full: bool, dirty: Set[int], entries: List[DispatchEntry]) -> None:
+        if full:
+            self._entries, self._by_work_order, self._queues, self._heaps = {}, {}, {}, {}
+            for entry in entries:
+                self._add(entry)
+                self._by_work_order.setdefault(entry.work_order_id, []).append(entry.id)
+            return
+        current = {entry.id for entry in entries}
+        for wo_id in dirty:
+            for woo_id in self._by_work_order.pop(wo_id, ()):
+                if woo_id not in current:
+                    self._remove(woo_id)
+        for entry in entries:
+            self._add(entry)
+            self._by_work_order.setdefault(entry.work_order_id, []).append(entry.id)
+
+    def _heap(self, equipment_id: int, rule: str) -> List[Tuple[Tuple, int, int]]:
+        queue = self._queues.get(equipment_id, ())
+        heap = self._heaps.get((equipment_id, rule))
+        if heap is None or len(heap) > (COMPACT_RATIO + 1) * len(queue) + 64:
+            entries = [self._entries[woo_id] for woo_id in queue]
+            heap = [(rule_key(e, rule), e.stamp, e.id) for e in entries]
+            heapq.heapify(heap)
+            self._heaps[(equipment_id, rule)] = heap
+        return heap
+
+    def _live(self, item: Tuple[Tuple, int, int], equipment_id: int) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry.stamp == item[1] and entry.equipment_id == equipment_id
+
+    def top(self, db: Session, equipment_id: int, rule: str, limit: int,
+            now: datetime) -> Tuple[int, List[DispatchEntry]]:
+        """设备的可开工工序总数与按规则排序的前 limit 项。"""
+        with self._lock:
+            self._refresh(db)
+            queue = self._queues.get(equipment_id, set())
+            if rule == "cr":
+                def cr_key(e: DispatchEntry) -> Tuple:
+                    ratio = critical_ratio(e, now)
+                    return (ratio is None, ratio if ratio is not None else 0.0, *rule_key(e, "priority"))
+                return len(queue), heapq.nsmallest(limit, (self._entries[i] for i in queue), key=cr_key)
+            heap = self._heap(equipment_id, rule)
+            taken = []
+            while heap and len(taken) < limit:
+                item = heapq.heappop(heap)
+                if self._live(item, equipment_id):
+                    taken.append(item)
+            for item in taken:
+                heapq.heappush(heap, item)
+            return len(queue), [self._entries[item[2]] for item in taken]
+
+
+dispatch_index = DispatchIndex()
+schedule_cache.add_listener(dispatch_index.invalidate)
+
+
+def dispatch_row(entry: DispatchEntry, rank: int, now: datetime) -> Dict[str, Any]:
+    """派工队列接口中的一行。"""
+    ratio = critical_ratio(entry, now)
+    return {
+        "rank": rank,
+        "work_order_operation_id": entry.id,
+        "work_order_id": entry.work_order_id,
+        "work_order_code": entry.work_order_code,
+        "priority": entry.priority,
+        "planned_end_date": entry.due.isoformat() if entry.due else None,
+        "operation_id": entry.operation_id,
+        "operation_code": entry.operation_code,
+        "operation_name": entry.operation_name,
+        "sequence": entry.sequence,
+        "status": entry.status,
+        "remaining_quantity": entry.remaining_quantity,
+        "remaining_hours": round(entry.hours, 4),
+        "critical_ratio": round(ratio, 4) if ratio is not None else None,
+        "planned_start_date": entry.planned_start_date.isoformat() if entry.planned_start_date else None,
+    }
@@ -0,0 +1,167 @@
+"""
+增量排程
+
+保留上次排程的结果（PlanState）。工单 / 工序变更时只重新加载变更工单的全部工序
+（被变更工序所在工单的后续工序一并包含），替换快照中的对应工序后，
+从 “变更最早可能影响派工的时刻” t0 起继续事件堆排程：
+派工时刻早于 t0 的任务与全量排程完全相同，直接复用，只重排 t0 之后的部分。
+- 工单结构不变、只有工时变化（如报工）：t0 = 工时变化工序原来的派工时刻
+- 其他变化（优先级、设备、计划开工、工序增删、工单下达 / 完工等）：
+  t0 = min(旧工序原派工时刻, 新工序计划开工时刻)
+"""
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.workorder import WorkOrder, WorkOrderOperation
+from app.services.scheduler import (
+    OpRecord, PlanSnapshot, PlanState, ScheduledTask, DispatchSimulation,
+    snapshot_query, add_snapshot_rows, queue_key, operation_hours, calendar_for_equipment, build_state,
+)
+from app.services.work_calendar import BaseCalendar, ShiftCalendar
+
+
+def _same_structure(old_snapshot: PlanSnapshot, old_tasks: List[ScheduledTask],
+                    new_snapshot: PlanSnapshot, new_ops: List[OpRecord]) -> bool:
+    """工单的工序、顺序、设备、计划开工与队列位置均未变化（只可能有工时变化）。"""
+    if len(old_tasks) != len(new_ops):
+        return False
+    for task, op in zip(old_tasks, new_ops):
+        old = task.op
+        if (old.id != op.id or old.sequence != op.sequence or old.equipment_id != op.equipment_id
+                or old.planned_start_date != op.planned_start_date
+                or queue_key(old_snapshot, old) != queue_key(new_snapshot, op)):
+            return False
+    return True
+
+
+def _resume_time(state: PlanState, snapshot: PlanSnapshot, changed: Iterable[int],
+                 new_by_work_order: Dict[int, List[OpRecord]]) -> Optional[datetime]:
+    """变更最早可能影响派工的时刻；没有任何影响时返回 None。"""
+    t0 = None
+
+    def earlier(t: Optional[datetime]) -> None:
+        nonlocal t0
+        if t is not None and (t0 is None or t < t0):
+            t0 = t
+
+    for wo_id in changed:
+        old_tasks = state.by_work_order.get(wo_id, [])
+        new_ops = new_by_work_order.get(wo_id, [])
+        if _same_structure(state.snapshot, old_tasks, snapshot, new_ops):
+            for task, op in zip(old_tasks, new_ops):
+                if task.hours != operation_hours(snapshot, op):
+                    earlier(task.dispatch)
+        else:
+            for task in old_tasks:
+                earlier(task.dispatch)
+            for op in new_ops:
+                earlier(op.planned_start_date or state.now)
+    return t0
+
+
+def reschedule(db: Session, state: PlanState, version: int,
+               work_order_ids: Iterable[int], operation_ids: Iterable[int],
+               shift_calendars: Optional[Dict[Optional[int], ShiftCalendar]] = None) -> Tuple[PlanState, Dict[str, Any]]:
+    """
+    基于上次排程状态增量重排，返回新的状态与统计信息。
+    只处理工单 / 工单工序层面的变更；工序、设备、班次等主数据变化需全量排程。
+    """
+    wo_ids = set(work_order_ids)
+    op_ids = set(operation_ids)
+    filters = []
+    if wo_ids:
+        filters.append(WorkOrderOperation.work_order_id.in_(wo_ids))
+    if op_ids:
+        # 变更工序所在工单的全部工序（含后续工序）
+        filters.append(WorkOrderOperation.work_order_id.in_(
+            select(WorkOrderOperation.work_order_id).where(WorkOrderOperation.id.in_(op_ids))
+        ))
+    rows = []
+    if filters:
+        rows = (
+            snapshot_query(db)
+            .filter(or_(*filters))
+            .order_by(WorkOrder.id.asc(), WorkOrderOperation.sequence.asc(), WorkOrderOperation.id.asc())
+            .all()
+        )
+
+    old = state.snapshot
+    # 本次需要替换的工单：请求的工单 + 变更工序在新旧数据中所属的工单
+    changed = set(wo_ids)
+    changed.update(row[1] for row in rows)
+    if op_ids:
+        for wo_id, tasks in state.by_work_order.items():
+            if any(t.op.id in op_ids for t in tasks):
+                changed.add(wo_id)
+
+    snapshot = PlanSnapshot(
+        ops=[],
+        operations=dict(old.operations),
+        equipment=dict(old.equipment),
+        work_orders={k: v for k, v in old.work_orders.items() if k not in changed},
+        setup_times=old.setup_times,
+    )
+    new_ops = add_snapshot_rows(snapshot, rows)
+    new_by_work_order: Dict[int, List[OpRecord]] = {}
+    for op in new_ops:
+        new_by_work_order.setdefault(op.work_order_id, []).append(op)
+
+    # 1. 在上次的队列顺序上删除变更工单的工序，再按 queue_key 插入新工序
+    ops: List[OpRecord] = []
+    old_tasks: List[Optional[ScheduledTask]] = []
+    for op, task in zip(old.ops, state.tasks):
+        if op.work_order_id not in changed:
+            ops.append(op)
+            old_tasks.append(task)
+    # 变更工单中的旧任务，按工单工序 id 索引
+    previous = {t.op.id: t for wo_id in changed for t in state.by_work_order.get(wo_id, ())}
+    for op in sorted(new_ops, key=lambda o: queue_key(snapshot, o)):
+        position = bisect_left(ops, queue_key(snapshot, op), key=lambda o: queue_key(snapshot, o))
+        ops.insert(position, op)
+        old_tasks.insert(position, previous.get(op.id))
+    snapshot.ops = ops
+
+    calendars = dict(state.calendars)
+    by_hours: Dict[float, BaseCalendar] = {}
+    for op in new_ops:
+        if op.equipment_id not in calendars:
+            calendars[op.equipment_id] = calendar_for_equipment(snapshot, op.equipment_id, shift_calendars or {}, by_hours)
+
+    # 2. 派工时刻早于 t0 的任务保持不变，其余从 t0 起重新排程
+    t0 = _resume_time(state, snapshot, changed, new_by_work_order)
+    fixed: Dict[int, ScheduledTask] = {}
+    for i, (op, task) in enumerate(zip(ops, old_tasks)):
+        if task is not None and (t0 is None or task.dispatch < t0):
+            # 变更工单的工序换成新的 OpRecord，接口行随之重新生成
+            fixed[i] = task if task.op is op else ScheduledTask(op, task.start, task.end, task.hours, task.dispatch)
+    simulation = DispatchSimulation(snapshot, state.now, calendars)
+    simulation.resume(fixed, t0 or state.now)
+    tasks = simulation.run()
+
+    # 重排后结果不变的任务沿用旧对象，接口行缓存可直接命中
+    rescheduled = 0
+    for i, task in enumerate(tasks):
+        if i in fixed:
+            continue
+        rescheduled += 1
+        before = old_tasks[i]
+        if (before is not None and before.op is task.op and before.start == task.start
+                and before.end == task.end and before.dispatch == task.dispatch):
+            tasks[i] = before
+
+    rows_cache = dict(state.rows)
+    for task in previous.values():
+        rows_cache.pop(task.op.id, None)
+    new_state = build_state(version, state.now, snapshot, calendars, tasks)
+    new_state.rows = rows_cache
+    stats = {
+        "mode": "incremental",
+        "work_orders": len(changed),
+        "resumed_from": t0.isoformat() if t0 else None,
+        "tasks_rescheduled": rescheduled,
+    }
+    return new_state, stats
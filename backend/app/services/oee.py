@@ -0,0 +1,450 @@
+"""
+设备 OEE（设备综合效率，NumPy 向量化）
+
+OEE = 时间开动率 × 性能开动率 × 合格品率，全部由报工事件流算出：
+- 计划时间：设备所在车间的启用班次（车间没有班次时用全厂班次）在工作日内的时段；都没有班次时按整个生产日
+- 运行时间：按 (设备, 工单工序) 重放开工 / 暂停 / 恢复 / 完工事件得到运行状态，完工数累计达到计划数的那条完工报工结束运行；
+  设备上至少一道工序在运行即为运行，运行区间与计划时段的交集计入运行时间
+- 性能开动率：Σ 产出数（完工 + 报废）× 工序标准工时（理想节拍） / 运行时间
+- 合格品率：完工数 / (完工数 + 报废数)
+报工的设备取报工上的设备，未填时取工单工序的设备（与产量汇总相同）。
+
+一次计算加载时间范围内（向前多加载 OEE_LOOKBACK_HOURS）的全部事件，按 (工单工序, 时间)、(设备, 工单工序, 时间)、
+(设备, 时间) 各排序一次，用分段累加与前向填充代替逐条状态机；各设备的时间轴按设备错开拼成一条，
+任意窗口内的运行时长由累计运行时长二分查找得到，产出事件二分查找所属窗口后 np.bincount 累计。
+
+结束超过 OEE_CLOSE_DELAY_MINUTES 的时段视为关闭，算过一次后写入 oee_periods，之后直接读取；
+未关闭的时段每次按截至当前的数据计算。报工时间早于关闭界限的迟到报工在报工的同一事务中
+删除该设备此后的缓存（invalidate_periods），下次查询时重算。
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.master import Equipment, Operation, Shift
+from app.models.workorder import OEEPeriod, WorkOrderOperation, WorkReport
+from app.services.work_calendar import default_workdays, parse_hhmm
+
+logger = logging.getLogger(__name__)
+
+# 参与 OEE 的报工类型 -> 事件编码
+KIND_CODES = {"start": 0, "pause": 1, "resume": 2, "complete": 3, "scrap": 4}
+START, PAUSE, RESUME, COMPLETE, SCRAP = range(5)
+DAY_SECONDS = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+CHUNK = 5000
+
+
+@dataclass
+class Period:
+    """一台设备的一个统计时段；windows 为时段内的计划生产时间（已合并、互不重叠）。"""
+    equipment_id: int
+    shift_id: int  # 按生产日时为 0
+    day: date  # 班次开始日 / 生产日
+    start: datetime
+    end: datetime
+    windows: List[Tuple[datetime, datetime]]
+
+
+def _epoch_seconds(values: Iterable[datetime], count: int) -> np.ndarray:
+    """本地时间 -> 1970-01-01 起的秒数（int64）。"""
+    return np.fromiter(
+        ((t.toordinal() - EPOCH_ORDINAL) * DAY_SECONDS + t.hour * 3600 + t.minute * 60 + t.second for t in values),
+        np.int64, count,
+    )
+
+
+def close_cutoff(now: Optional[datetime] = None) -> datetime:
+    """结束时间早于该时刻的时段已关闭。"""
+    return (now or datetime.now()) - timedelta(minutes=settings.oee_close_delay_minutes)
+
+
+def invalidate_periods(db: Session, late: Dict[int, datetime]) -> None:
+    """迟到的报工 {设备: 最早报工时间}：删除这些设备结束晚于报工时间的 OEE 缓存（当前事务，不提交）。"""
+    for equipment_id, report_time in late.items():
+        if equipment_id:
+            db.query(OEEPeriod).filter(OEEPeriod.equipment_id == equipment_id,
+                                       OEEPeriod.period_end > report_time).delete(synchronize_session=False)
+
+
+# ==================== 计划时段 ====================
+
+def load_shift_patterns(db: Session) -> Dict[Optional[int], List[Tuple[int, float, float]]]:
+    """车间 -> 启用班次 [(班次 id, 开始小时, 结束小时)]，跨夜班的结束小时加 24；workshop_id 为空的为全厂班次。"""
+    patterns: Dict[Optional[int], List[Tuple[int, float, float]]] = {}
+    for shift_id, code, start_time, end_time, workshop_id in (
+        db.query(Shift.id, Shift.code, Shift.start_time, Shift.end_time, Shift.workshop_id).filter(Shift.active == 1)
+    ):
+        try:
+            start, end = parse_hhmm(start_time), parse_hhmm(end_time)
+        except (AttributeError, ValueError):
+            logger.warning(f"班次时间格式无效，已忽略: {code} {start_time}-{end_time}")
+            continue
+        s = start.hour + start.minute / 60.0
+        e = end.hour + end.minute / 60.0
+        patterns.setdefault(workshop_id, []).append((shift_id, s, e + 24 if e <= s else e))
+    return patterns
+
+
+def _merge(windows: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    merged: List[Tuple[datetime, datetime]] = []
+    for s, e in sorted(windows):
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1] = (merged[-1][0], e)
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def _templates(granularity: str, shifts: List[Tuple[int, float, float]], first_day: date, last_day: date,
+               now: datetime) -> List[Tuple[int, date, datetime, datetime, List[Tuple[datetime, datetime]]]]:
+    """一组班次下的时段 [(班次 id, 日期, 开始, 结束, 计划窗口)]，只含已开始的时段。"""
+    workdays = default_workdays()
+
+    def instances(day: date):
+        if not workdays.is_workday(day):
+            return []
+        midnight = datetime.combine(day, time(0, 0))
+        return [(shift_id, midnight + timedelta(hours=s), midnight + timedelta(hours=e)) for shift_id, s, e in shifts]
+
+    result = []
+    day = first_day
+    while day <= last_day:
+        if granularity == "shift":
+            for shift_id, start, end in instances(day):
+                if start < now:
+                    result.append((shift_id, day, start, end, [(start, end)]))
+        else:
+            start = datetime.combine(day, settings.schedule_day_start_time)
+            end = start + timedelta(days=1)
+            if start < now:
+                if shifts:
+                    windows = _merge([
+                        (max(s, start), min(e, end))
+                        for d in (day - timedelta(days=1), day, day + timedelta(days=1))
+                        for _, s, e in instances(d) if s < end and e > start
+                    ])
+                else:
+                    windows = [(start, end)] if workdays.is_workday(day) else []
+                if windows:
+                    result.append((0, day, start, end, windows))
+        day += timedelta(days=1)
+    return result
+
+
+def build_periods(granularity: str, equipment: Iterable[Tuple[int, Optional[int]]],
+                  patterns: Dict[Optional[int], List[Tuple[int, float, float]]],
+                  first_day: date, last_day: date, now: datetime) -> List[Period]:
+    """各设备（id, 车间）在 [first_day, last_day] 内已开始的时段；同一组班次的时段模板只展开一次。"""
+    templates: Dict[Optional[int], list] = {}
+    periods = []
+    for equipment_id, workshop_id in equipment:
+        key = workshop_id if workshop_id in patterns else None
+        if key not in templates:
+            templates[key] = _templates(granularity, patterns.get(key, []), first_day, last_day, now)
+        for shift_id, day, start, end, windows in templates[key]:
+            periods.append(Period(equipment_id, shift_id, day, start, end, windows))
+    return periods
+
+
+# ==================== 向量化计算 ====================
+
+def _group_first(keys: List[np.ndarray]) -> np.ndarray:
+    """已排序数组中每组的第一行。"""
+    n = len(keys[0])
+    first = np.zeros(n, dtype=bool)
+    if n:
+        first[0] = True
+        for key in keys:
+            first[1:] |= key[1:] != key[:-1]
+    return first
+
+
+def _segment_cumsum(values: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """按组（first 标记组首）分段累加。"""
+    cum = np.cumsum(values)
+    head = np.maximum.accumulate(np.where(first, np.arange(len(values)), 0))
+    return cum - cum[head] + values[head]
+
+
+def _load_events(db: Session, load_start: datetime, load_end: datetime) -> Dict[str, np.ndarray]:
+    """
+    加载 [load_start, load_end) 内的事件；报工表只取自身的列（不逐行关联），
+    工单工序的设备 / 计划数 / 完工数与工序标准工时按去重后的工单工序分块查询一次再按下标展开。
+    报工行数可达百万，在会话的连接上直接执行（不经过 ORM 结果处理）。
+    """
+    rows = db.connection().execute(
+        select(WorkReport.id, WorkReport.report_time, WorkReport.report_type, WorkReport.quantity,
+               WorkReport.equipment_id, WorkReport.work_order_operation_id)
+        .where(WorkReport.report_time >= load_start, WorkReport.report_time < load_end,
+               WorkReport.report_type.in_(KIND_CODES))
+    ).all()
+    n = len(rows)
+    ids, times, kinds, quantities, equipment, operations = zip(*rows) if rows else ((),) * 6
+    woo = np.fromiter((w or 0 for w in operations), np.int64, n)
+    woo_ids, woo_index = np.unique(woo, return_inverse=True)
+    woo_index = woo_index.reshape(-1)
+
+    attrs = {}
+    wanted = [int(w) for w in woo_ids if w]
+    for i in range(0, len(wanted), CHUNK):
+        for row in (
+            db.query(WorkOrderOperation.id, WorkOrderOperation.equipment_id, WorkOrderOperation.planned_quantity,
+                     WorkOrderOperation.completed_quantity, Operation.standard_time)
+            .outerjoin(Operation, Operation.id == WorkOrderOperation.operation_id)
+            .filter(WorkOrderOperation.id.in_(wanted[i:i + CHUNK]))
+        ):
+            attrs[row.id] = row
+    found = [attrs.get(int(w)) for w in woo_ids]
+    count = len(found)
+    woo_equipment = np.fromiter((r.equipment_id or 0 if r else 0 for r in found), np.int64, count)
+    planned = np.fromiter((np.inf if r is None or r.planned_quantity is None else r.planned_quantity for r in found),
+                          np.float64, count)
+    completed = np.fromiter((r.completed_quantity or 0 if r else 0 for r in found), np.float64, count)
+    ideal = np.fromiter(((r.standard_time or 0) * 60.0 if r else 0.0 for r in found), np.float64, count)
+
+    report_equipment = np.fromiter((e or 0 for e in equipment), np.int64, n)
+    return {
+        "id": np.fromiter(ids, np.int64, n),
+        "t": _epoch_seconds(times, n),
+        "kind": np.fromiter((KIND_CODES[k] for k in kinds), np.int8, n),
+        "qty": np.fromiter((q or 0 for q in quantities), np.float64, n),
+        "eq": np.where(report_equipment > 0, report_equipment, woo_equipment[woo_index]),
+        "woo": woo,
+        "planned": planned[woo_index],
+        "completed": completed[woo_index],
+        "ideal": ideal[woo_index],  # 理想节拍（秒 / 件）
+    }
+
+
+def _completed_since(db: Session, since: datetime, until: datetime) -> Dict[int, float]:
+    """[since, until) 内各工单工序的完工数。"""
+    return {
+        woo_id: qty or 0
+        for woo_id, qty in db.query(WorkReport.work_order_operation_id, func.sum(WorkReport.quantity))
+        .filter(WorkReport.report_type == "complete", WorkReport.report_time >= since, WorkReport.report_time < until,
+                WorkReport.work_order_operation_id.isnot(None))
+        .group_by(WorkReport.work_order_operation_id)
+    }
+
+
+def _state_changes(ev: Dict[str, np.ndarray], base: np.ndarray) -> np.ndarray:
+    """
+    每条事件使所在设备的运行工序数变化多少（+1 / 0 / -1）。
+    先按工单工序累计完工数找出完工事件，再按 (设备, 工单工序) 前向填充运行状态，相邻状态之差即变化量。
+    """
+    n = len(ev["t"])
+    kind, woo, eq = ev["kind"], ev["woo"], ev["eq"]
+    state = np.full(n, np.nan)
+    state[(kind == START) | (kind == RESUME)] = 1.0
+    state[kind == PAUSE] = 0.0
+
+    # 完工：加载范围之前的完工数 + 范围内累计完工数达到计划数
+    order = np.lexsort((ev["id"], ev["t"], woo))
+    done = np.where((kind == COMPLETE) & (woo > 0), ev["qty"], 0.0)[order]
+    cumulative = base[order] + _segment_cumsum(done, _group_first([woo[order]]))
+    finished = (kind[order] == COMPLETE) & (woo[order] > 0) & (cumulative >= ev["planned"][order])
+    state[order[finished]] = 0.0
+
+    order = np.lexsort((ev["id"], ev["t"], woo, eq))
+    s = state[order]
+    first = _group_first([eq[order], woo[order]])
+    s[first & np.isnan(s)] = 0.0  # 加载范围之前的状态按未运行
+    filled = s[np.maximum.accumulate(np.where(np.isnan(s), 0, np.arange(n)))]
+    previous = np.concatenate(([0.0], filled[:-1]))
+    previous[first] = 0.0
+    delta = np.empty(n)
+    delta[order] = filled - previous
+    return delta
+
+
+def _run_intervals(ev: Dict[str, np.ndarray], delta: np.ndarray, horizon: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按设备时间轴累计运行工序数，返回运行区间 (设备, 开始秒, 结束秒)，按设备、时间排序，同一设备的区间互不重叠。"""
+    order = np.lexsort((ev["id"], ev["t"], ev["eq"]))
+    eq, t = ev["eq"][order], ev["t"][order]
+    first = _group_first([eq])
+    running = _segment_cumsum(delta[order], first) > 0.5
+    following = np.concatenate((t[1:], [horizon]))
+    following[np.concatenate((first[1:], [True]))] = horizon  # 每台设备最后一条事件之后运行到截止时刻
+    keep = running & (following > t) & (eq > 0)
+    return eq[keep], t[keep], following[keep]
+
+
+def _compute(db: Session, periods: List[Period], now: datetime) -> np.ndarray:
+    """各时段 [计划秒, 运行秒, 理想秒, 完工数, 产出数]。"""
+    values = np.zeros((len(periods), 5))
+    if not periods:
+        return values
+    range_start = min(p.start for p in periods)
+    range_end = min(max(p.end for p in periods), now)
+    load_start = range_start - timedelta(hours=settings.oee_lookback_hours)
+    ev = _load_events(db, load_start, range_end)
+
+    # 加载范围起点之前的完工数 = 工单工序当前完工数 − 起点之后的完工数
+    later = _completed_since(db, range_end, now) if range_end < now else {}
+    woo = ev["woo"]
+    woo_index = np.unique(woo, return_inverse=True)[1].reshape(-1)
+    in_range = np.bincount(woo_index, weights=np.where(ev["kind"] == COMPLETE, ev["qty"], 0.0))
+    base = ev["completed"] - in_range[woo_index] \
+        - np.fromiter((later.get(int(w), 0.0) for w in woo), np.float64, len(woo))
+
+    origin = int(_epoch_seconds([load_start], 1)[0])
+    horizon = int(_epoch_seconds([range_end], 1)[0])
+    span = horizon - origin + 1
+    interval_eq, interval_start, interval_end = _run_intervals(ev, _state_changes(ev, base), horizon)
+
+    # 各设备的时间轴错开拼接：x' = 设备序号 * span + (x - origin)
+    equipment_ids = np.unique(np.concatenate((ev["eq"], [p.equipment_id for p in periods])).astype(np.int64))
+
+    def shifted(eq: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        return np.searchsorted(equipment_ids, eq) * span + (np.clip(seconds, origin, horizon) - origin)
+
+    run_start = shifted(interval_eq, interval_start)
+    run_length = shifted(interval_eq, interval_end) - run_start
+    run_before = np.concatenate(([0], np.cumsum(run_length)))
+
+    def run_until(x: np.ndarray) -> np.ndarray:
+        """x' 之前的累计运行秒数。"""
+        k = np.searchsorted(run_start, x, side="right") - 1
+        kk = np.maximum(k, 0)
+        if not len(run_start):
+            return np.zeros(len(x))
+        return np.where(k >= 0, run_before[kk] + np.clip(x - run_start[kk], 0, run_length[kk]), 0)
+
+    # 计划窗口（未关闭时段截到当前时刻）
+    window_period = np.fromiter((i for i, p in enumerate(periods) for _ in p.windows), np.int64)
+    window_count = len(window_period)
+    window_eq = np.fromiter((p.equipment_id for p in periods for _ in p.windows), np.int64, window_count)
+    window_start = _epoch_seconds((min(s, now) for p in periods for s, _ in p.windows), window_count)
+    window_end = _epoch_seconds((min(e, now) for p in periods for _, e in p.windows), window_count)
+    ws, we = shifted(window_eq, window_start), shifted(window_eq, window_end)
+    values[:, 0] = np.bincount(window_period, weights=(we - ws).astype(np.float64), minlength=len(periods))
+    values[:, 1] = np.bincount(window_period, weights=(run_until(we) - run_until(ws)).astype(np.float64),
+                               minlength=len(periods))
+
+    # 产出事件归入所在窗口：同一班次（或生产日）的窗口互不重叠，逐组二分查找
+    output = np.flatnonzero(((ev["kind"] == COMPLETE) | (ev["kind"] == SCRAP)) & (ev["eq"] > 0))
+    x = shifted(ev["eq"][output], ev["t"][output])
+    qty = ev["qty"][output]
+    good = np.where(ev["kind"][output] == COMPLETE, qty, 0.0)
+    ideal = qty * ev["ideal"][output]
+    window_shift = np.fromiter((p.shift_id for p in periods for _ in p.windows), np.int64, window_count)
+    for shift_id in np.unique(window_shift):
+        group = np.flatnonzero(window_shift == shift_id)
+        group = group[np.argsort(ws[group], kind="stable")]
+        k = np.searchsorted(ws[group], x, side="right") - 1
+        kk = np.maximum(k, 0)
+        inside = (k >= 0) & (x < we[group][kk]) & (ev["t"][output] < horizon)
+        target = window_period[group][kk[inside]]
+        values[:, 2] += np.bincount(target, weights=ideal[inside], minlength=len(periods))
+        values[:, 3] += np.bincount(target, weights=good[inside], minlength=len(periods))
+        values[:, 4] += np.bincount(target, weights=qty[inside], minlength=len(periods))
+    return values
+
+
+# ==================== 查询与缓存 ====================
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator > 0 else None
+
+
+def _metrics(planned: float, run: float, ideal: float, good: float, total: float) -> Dict[str, Any]:
+    availability = _ratio(run, planned)
+    performance = _ratio(ideal, run)
+    quality = _ratio(good, total)
+    oee = None
+    if availability is not None and performance is not None and quality is not None:
+        oee = round(availability * performance * quality, 4)
+    return {
+        "planned_hours": round(planned / 3600, 4),
+        "run_hours": round(run / 3600, 4),
+        "ideal_hours": round(ideal / 3600, 4),
+        "good_quantity": good,
+        "total_quantity": total,
+        "availability": availability,
+        "performance": performance,
+        "quality": quality,
+        "oee": oee,
+    }
+
+
+def oee_report(db: Session, granularity: str, first_day: date, last_day: date,
+               equipment_id: Optional[int] = None, refresh: bool = False,
+               now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    [first_day, last_day] 内各设备按班次（granularity="shift"）或按生产日（"day"）的 OEE（写入缓存，不提交）。
+    已关闭且已缓存的时段直接读取，其余一次加载事件向量化计算，新算出的已关闭时段写入缓存；
+    refresh=True 时忽略并覆盖范围内的缓存。
+    """
+    now = now or datetime.now()
+    cutoff = close_cutoff(now)
+    query = db.query(Equipment.id, Equipment.code, Equipment.workshop_id)
+    if equipment_id is not None:
+        query = query.filter(Equipment.id == equipment_id)
+    equipment = query.order_by(Equipment.id).all()
+    codes = {e.id: e.code for e in equipment}
+    periods = build_periods(granularity, [(e.id, e.workshop_id) for e in equipment], load_shift_patterns(db),
+                            first_day, last_day, now)
+
+    cached: Dict[Tuple[int, int, datetime], OEEPeriod] = {}
+    if periods:
+        range_start = min(p.start for p in periods)
+        range_end = max(p.start for p in periods)
+        stored = db.query(OEEPeriod).filter(OEEPeriod.granularity == granularity,
+                                            OEEPeriod.period_start >= range_start,
+                                            OEEPeriod.period_start <= range_end)
+        if equipment_id is not None:
+            stored = stored.filter(OEEPeriod.equipment_id == equipment_id)
+        if refresh:
+            stored.delete(synchronize_session=False)
+        else:
+            cached = {(row.equipment_id, row.shift_id, row.period_start): row for row in stored}
+
+    missing = [p for p in periods if (p.equipment_id, p.shift_id, p.start) not in cached]
+    computed = _compute(db, missing, now)
+    rows = [
+        {"granularity": granularity, "equipment_id": p.equipment_id, "shift_id": p.shift_id,
+         "period_start": p.start, "period_end": p.end, "planned_seconds": float(v[0]), "run_seconds": float(v[1]),
+         "ideal_seconds": float(v[2]), "good_quantity": float(v[3]), "total_quantity": float(v[4]),
+         "computed_at": now}
+        for p, v in zip(missing, computed) if p.end <= cutoff
+    ]
+    if rows:
+        db.execute(insert(OEEPeriod), rows)
+
+    values = dict(zip((id(p) for p in missing), computed))
+    result, totals = [], {}
+    for p in periods:
+        row = cached.get((p.equipment_id, p.shift_id, p.start))
+        if row is not None:
+            v = (row.planned_seconds, row.run_seconds, row.ideal_seconds, row.good_quantity, row.total_quantity)
+        else:
+            v = tuple(float(x) for x in values[id(p)])
+        item = {"equipment_id": p.equipment_id, "equipment_code": codes.get(p.equipment_id)}
+        if granularity == "shift":
+            item["shift_id"] = p.shift_id
+        item.update({"date": p.day.isoformat(), "start": p.start.isoformat(), "end": p.end.isoformat(),
+                     "closed": p.end <= cutoff})
+        item.update(_metrics(*v))
+        result.append(item)
+        sums = totals.setdefault(p.equipment_id, [0.0] * 5)
+        for i in range(5):
+            sums[i] += v[i]
+    return {
+        "granularity": granularity,
+        "start": first_day.isoformat(),
+        "end": last_day.isoformat(),
+        "computed_periods": len(missing),
+        "cached_periods": len(periods) - len(missing),
+        "equipment": [
+            {"equipment_id": e, "equipment_code": codes.get(e), **_metrics(*sums)} for e, sums in totals.items()
+        ],
+        "periods": result,
+    }
@@ -0,0 +1,254 @@
+"""
+排程局部搜索优化
+
+以贪心排程（按 优先级 / 工单 / 工序顺序 派工）为起点，在给定时间预算内调整工单的派工顺序：
+- 解的表示：工单序列。序列中靠前的工单在设备就绪队列中优先，贪心排程即按优先级排序的初始序列；
+  每个解都由事件堆排程求出，设备能力、工序顺序、计划开工与工作日历约束始终满足
+- 邻域：把延误（或最晚完工）的工单前移、相邻窗口内交换两个工单、随机插入，
+  接受不劣于当前解的移动（允许在等值平台上移动）
+- 评价：只重排受影响的部分。被移动的工单最早就绪之前，各设备就绪队列中没有它们的工序，
+  派工决策与当前解完全相同，因此从该时刻 t0 起恢复事件堆排程（同增量排程）
+- 并行：多个进程以不同随机种子独立搜索，取最优解；使用常驻 spawn 进程池（worker_pool），
+  排程输入与贪心排程每次调用只序列化一次、经共享内存在各子进程中加载
+目标：tardiness（总延误工时优先，其次 makespan）或 makespan（完工时间优先，其次总延误工时）。
+"""
+import heapq
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.scheduler import OpRecord, PlanSnapshot, ScheduledTask, DispatchSimulation, compute_schedule
+from app.services.parallel_scheduler import ready_times
+from app.services.scenarios import completion_metrics, delivery_kpis
+from app.services.work_calendar import BaseCalendar
+from app.services.worker_pool import SharedInputs, WorkerPool, load_shared
+
+OBJECTIVES = ("tardiness", "makespan")
+
+# 评价值，越小越好
+Cost = Tuple[float, float]
+
+_pool = WorkerPool()
+
+
+def group_by_work_order(snapshot: PlanSnapshot) -> Tuple[List[int], Dict[int, List[OpRecord]]]:
+    """快照的工单序列与各工单的工序（snapshot.ops 中同一工单的工序连续且按 sequence 升序）。"""
+    order: List[int] = []
+    ops_by_order: Dict[int, List[OpRecord]] = {}
+    for op in snapshot.ops:
+        if op.work_order_id not in ops_by_order:
+            ops_by_order[op.work_order_id] = []
+            order.append(op.work_order_id)
+        ops_by_order[op.work_order_id].append(op)
+    return order, ops_by_order
+
+
+def ordered_snapshot(snapshot: PlanSnapshot, order: List[int], ops_by_order: Dict[int, List[OpRecord]]) -> PlanSnapshot:
+    """按工单序列重排工序的快照，主数据共用。"""
+    return PlanSnapshot(
+        [op for wo_id in order for op in ops_by_order[wo_id]],
+        snapshot.operations, snapshot.equipment, snapshot.work_orders, snapshot.setup_times,
+    )
+
+
+class Plan:
+    """一个解：工单序列、按序列排列的快照及其排程结果（任务与 snapshot.ops 对齐）"""
+
+    def __init__(self, order: List[int], snapshot: PlanSnapshot, tasks: List[ScheduledTask],
+                 now: datetime, objective: str):
+        self.order = order
+        self.snapshot = snapshot
+        self.tasks = tasks
+        makespan, self.completion, self.delays = completion_metrics(snapshot, now, tasks)
+        delay = sum(self.delays.values())
+        span = (makespan - now).total_seconds() / 3600
+        self.cost: Cost = (delay, span) if objective == "tardiness" else (span, delay)
+        self._windows: Optional[Dict[int, List[Tuple[int, datetime, datetime]]]] = None
+
+    def queue_windows(self, now: datetime) -> Dict[int, List[Tuple[int, datetime, datetime]]]:
+        """工单 -> 各工序 (设备, 就绪时刻, 派工时刻)：工序在这段时间内位于设备就绪队列中。"""
+        if self._windows is None:
+            self._windows = {}
+            for op, task, r in zip(self.snapshot.ops, self.tasks, ready_times(self.snapshot, now, self.tasks)):
+                self._windows.setdefault(op.work_order_id, []).append((op.equipment_id, r, task.dispatch))
+        return self._windows
+
+    def first_conflict(self, moved: List[int], others: List[int], now: datetime) -> Optional[datetime]:
+        """
+        调整 moved 与 others 中工单的相对顺序后，派工决策最早可能变化的时刻：
+        两者的工序同时位于同一设备就绪队列中的最早时刻；从未同时排队时返回 None（排程不变）。
+        """
+        windows = self.queue_windows(now)
+        by_equipment: Dict[int, List[Tuple[int, datetime, datetime]]] = {}
+        for wo_id in moved:
+            for e, r, d in windows[wo_id]:
+                by_equipment.setdefault(e, []).append((wo_id, r, d))
+        t0 = None
+        for wo_id in others:
+            for e, r, d in windows[wo_id]:
+                for other, mr, md in by_equipment.get(e, ()):
+                    if other == wo_id:
+                        continue
+                    start = r if r > mr else mr
+                    if start <= (d if d < md else md) and (t0 is None or start < t0):
+                        t0 = start
+        return t0
+
+
+class LocalSearch:
+    """单个进程内的局部搜索（一个随机种子）"""
+
+    def __init__(self, snapshot: PlanSnapshot, now: datetime, calendars: Dict[int, BaseCalendar],
+                 greedy: List[ScheduledTask], objective: str, seed: int):
+        self.now = now
+        self.calendars = calendars
+        self.objective = objective
+        self.rnd = random.Random(seed)
+        order, self.ops_by_order = group_by_work_order(snapshot)
+        self.base = snapshot
+        self.current = Plan(order, snapshot, greedy, now, objective)
+        # 交换 / 随机插入的位置窗口
+        self.window = max(2, len(order) // 20)
+        self.evaluations = 0
+        self.improvements = 0
+
+    def _evaluate(self, order: List[int], t0: datetime) -> Plan:
+        """按新序列排程：派工时刻早于 t0 的任务沿用当前解，从 t0 起恢复事件堆排程。"""
+        current = self.current
+        snapshot = ordered_snapshot(self.base, order, self.ops_by_order)
+        task_of = {t.op.id: t for t in current.tasks if t.dispatch < t0}
+        fixed = {i: task_of[op.id] for i, op in enumerate(snapshot.ops) if op.id in task_of}
+        simulation = DispatchSimulation(snapshot, self.now, self.calendars)
+        simulation.resume(fixed, t0)
+        self.evaluations += 1
+        return Plan(order, snapshot, simulation.run(), self.now, self.objective)
+
+    def _critical(self) -> Optional[int]:
+        """前移对象：tardiness 目标按延误工时加权随机取一个延误工单；makespan 目标取最晚完工的工单之一。"""
+        current = self.current
+        if self.objective == "tardiness":
+            if not current.delays:
+                return None
+            wo_ids = list(current.delays)
+            return self.rnd.choices(wo_ids, weights=[current.delays[w] for w in wo_ids])[0]
+        latest = heapq.nlargest(10, current.completion, key=current.completion.get)
+        return self.rnd.choice(latest) if latest else None
+
+    def _neighbour(self) -> Optional[Tuple[List[int], List[int], List[int]]]:
+        """随机生成一个邻域移动：(新序列, 被移动的工单, 与之相对顺序改变的工单)。"""
+        order = self.current.order
+        n = len(order)
+        if n < 2:
+            return None
+        move = self.rnd.random()
+        if move < 0.5:
+            wo_id = self._critical()
+            if wo_id is not None:
+                i = order.index(wo_id)
+                if i > 0:
+                    j = self.rnd.randrange(max(0, i - self.window), i)
+                    return order[:j] + [wo_id] + order[j:i] + order[i + 1:], [wo_id], order[j:i]
+        i = self.rnd.randrange(n)
+        j = min(n - 1, max(0, i + self.rnd.randint(-self.window, self.window)))
+        if i == j:
+            return None
+        if i > j:
+            i, j = j, i
+        new = list(order)
+        if move < 0.75:
+            new[i], new[j] = new[j], new[i]
+            # 交换改变两个工单之间、以及它们与中间各工单的相对顺序
+            return new, [order[i], order[j]], order[i + 1:j + 1]
+        # 插入只改变被移动工单与所越过工单的相对顺序
+        if self.rnd.random() < 0.5:
+            new.insert(j, new.pop(i))
+            return new, [order[i]], order[i + 1:j + 1]
+        new.insert(i, new.pop(j))
+        return new, [order[j]], order[i:j]
+
+    def run(self, deadline: float) -> Plan:
+        """搜索到截止时刻（time.monotonic）为止，返回找到的最优解。"""
+        last = 0.0
+        if len(self.current.order) < 2:
+            return self.current
+        while time.monotonic() + last < deadline:
+            candidate = self._neighbour()
+            if candidate is None:
+                continue
+            order, moved, others = candidate
+            t0 = self.current.first_conflict(moved, others, self.now)
+            if t0 is None:
+                continue  # 相关工序从未同时排队，排程不变
+            started = time.monotonic()
+            plan = self._evaluate(order, t0)
+            last = time.monotonic() - started
+            if plan.cost <= self.current.cost:
+                if plan.cost < self.current.cost:
+                    self.improvements += 1
+                self.current = plan
+        return self.current
+
+
+def _search(snapshot: PlanSnapshot, now: datetime, calendars: Dict[int, BaseCalendar],
+            greedy: List[ScheduledTask], objective: str, seed: int, deadline: float) -> Dict[str, Any]:
+    search = LocalSearch(snapshot, now, calendars, greedy, objective, seed)
+    best = search.run(deadline)
+    return {
+        "seed": seed, "cost": best.cost, "order": best.order,
+        "evaluations": search.evaluations, "improvements": search.improvements,
+    }
+
+
+def _search_shared(ref: SharedInputs, objective: str, seed: int, deadline: float) -> Dict[str, Any]:
+    """子进程中执行：排程输入与贪心排程取自共享内存。"""
+    snapshot, now, calendars, greedy = load_shared(ref)
+    return _search(snapshot, now, calendars, greedy, objective, seed, deadline)
+
+
+def optimize_schedule(snapshot: PlanSnapshot, now: datetime, calendars: Dict[int, BaseCalendar],
+                      time_budget: float, objective: str = "tardiness", workers: int = 4,
+                      seed: int = 0) -> Tuple[List[ScheduledTask], Dict[str, Any]]:
+    """
+    贪心排程后在 time_budget 秒内局部搜索，返回与 snapshot.ops 对齐的最优任务列表与优化统计。
+    workers 个进程分别以种子 seed, seed+1, ... 搜索；workers <= 1 时在当前进程内搜索。
+    找不到更优的解时返回贪心排程。
+    """
+    started = time.monotonic()
+    greedy = compute_schedule(snapshot, now, calendars)
+    deadline = started + time_budget
+    seeds = [seed + k for k in range(max(workers, 1))]
+    if workers <= 1:
+        results = [_search(snapshot, now, calendars, greedy, objective, seeds[0], deadline)]
+    else:
+        with _pool.shared(None, lambda: [(snapshot, now, calendars, greedy)]) as ref:
+            results = list(_pool.executor(workers).map(
+                _search_shared, [ref] * len(seeds), [objective] * len(seeds), seeds, [deadline] * len(seeds),
+            ))
+
+    order, ops_by_order = group_by_work_order(snapshot)
+    best = min(results, key=lambda r: r["cost"])
+    tasks = greedy
+    if best["cost"] < Plan(order, snapshot, greedy, now, objective).cost:
+        # 最优序列在当前进程内重排一次，任务按 snapshot.ops 的顺序返回
+        ordered = ordered_snapshot(snapshot, best["order"], ops_by_order)
+        by_id = {t.op.id: t for t in compute_schedule(ordered, now, calendars)}
+        tasks = [by_id[op.id] for op in snapshot.ops]
+    greedy_kpis = delivery_kpis(snapshot, now, greedy)
+    best_kpis = delivery_kpis(snapshot, now, tasks)
+    summary = {
+        "objective": objective,
+        "time_budget": time_budget,
+        "workers": len(seeds),
+        "seed": best["seed"] if tasks is not greedy else None,
+        "evaluations": sum(r["evaluations"] for r in results),
+        "improving_moves": sum(r["improvements"] for r in results),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+        "greedy": greedy_kpis,
+        "best": best_kpis,
+        "improvement": {
+            key: round(greedy_kpis[key] - best_kpis[key], 4)
+            for key in ("makespan_hours", "total_delay_hours", "late_work_orders")
+        },
+    }
+    return tasks, summary
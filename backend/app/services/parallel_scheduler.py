@@ -0,0 +1,201 @@
+"""
+按车间并行排程
+
+设备归属车间（Equipment.workshop_id），每台设备的全部工序落在同一个分区中：
+1. 按设备所在车间把快照拆成若干分区，各分区在进程池中独立执行事件堆排程；
+   跨车间工单只保留分区内的工序，前一段在其他车间的工序以 “就绪下限” 代替前道约束
+2. 合并：按全局工序顺序逐段计算真实就绪时刻（计划开工、前一段全部完工），
+   跨车间工序的就绪下限与真实就绪时刻不一致时，更新下限并只重排涉及的分区，直到不再变化
+3. 轮数用尽仍未收敛时，找出最早的不一致时刻 t0（跨车间工序过早 / 过晚释放、过早派工），
+   t0 之前派工的任务与全量排程相同，从 t0 起恢复全局事件堆排程（同增量排程）
+结果与 compute_schedule 完全一致；跨车间衔接越少，收敛越快。
+
+进程池为常驻 spawn 进程池（worker_pool）：各分区的快照与设备日历按数据版本只序列化一次，
+子进程只加载自己排到的分区且只加载一次；每轮提交的只有分区序号、分区内的就绪下限与排程基准时刻。
+"""
+import logging
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.services.scheduler import (
+    PlanSnapshot, ScheduledTask, DispatchSimulation, UNASSIGNED_EQUIPMENT, build_calendars, compute_schedule,
+)
+from app.services.work_calendar import BaseCalendar
+from app.services.worker_pool import SharedInputs, WorkerPool, load_shared
+
+logger = logging.getLogger(__name__)
+
+# 分区结果交换就绪下限的最大轮数
+MAX_ROUNDS = 2
+
+_pool = WorkerPool()
+
+# 分区排程结果：(开工, 完工, 工时, 派工时刻)，与分区工序对齐
+PartitionResult = List[Tuple[datetime, datetime, float, datetime]]
+
+
+def workshop_partitions(snapshot: PlanSnapshot) -> Dict[Optional[int], List[int]]:
+    """车间 -> 该车间设备上的工序下标（保持 snapshot.ops 的队列顺序）；未分配设备 / 车间的工序归入 None。"""
+    partitions: Dict[Optional[int], List[int]] = {}
+    for i, op in enumerate(snapshot.ops):
+        eq = snapshot.equipment.get(op.equipment_id) if op.equipment_id != UNASSIGNED_EQUIPMENT else None
+        partitions.setdefault(eq.workshop_id if eq else None, []).append(i)
+    return partitions
+
+
+def ready_times(snapshot: PlanSnapshot, now: datetime, tasks: List[ScheduledTask]) -> List[datetime]:
+    """按任务结果计算每道工序的真实就绪时刻：max(计划开工, 同工单前一段最晚完工)。"""
+    ready: List[datetime] = []
+    prev = None
+    done: Optional[datetime] = None  # 前一段最晚完工
+    stage_end: Optional[datetime] = None  # 当前段已出现任务的最晚完工
+    for op, task in zip(snapshot.ops, tasks):
+        if prev is None or prev.work_order_id != op.work_order_id:
+            done = stage_end = None
+        elif prev.sequence != op.sequence:
+            done, stage_end = stage_end, None
+        base = op.planned_start_date or now
+        ready.append(done if done is not None and done > base else base)
+        if stage_end is None or task.end > stage_end:
+            stage_end = task.end
+        prev = op
+    return ready
+
+
+def cross_links(snapshot: PlanSnapshot, partition_of: List[int]) -> List[int]:
+    """前一段含其他分区工序的工序下标。"""
+    linked: List[int] = []
+    prev = None
+    previous_stage: set = set()  # 前一段工序所在分区
+    current_stage: set = set()
+    for i, op in enumerate(snapshot.ops):
+        if prev is None or prev.work_order_id != op.work_order_id:
+            previous_stage, current_stage = set(), set()
+        elif prev.sequence != op.sequence:
+            previous_stage, current_stage = current_stage, set()
+        if previous_stage - {partition_of[i]}:
+            linked.append(i)
+        current_stage.add(partition_of[i])
+        prev = op
+    return linked
+
+
+def _partition_snapshot(snapshot: PlanSnapshot, indices: List[int],
+                        bounds: Dict[int, datetime]) -> PlanSnapshot:
+    """分区快照：只带分区内工序引用到的主数据；有就绪下限的工序以下限作为计划开工。"""
+    ops = [
+        replace(snapshot.ops[i], planned_start_date=bounds[i]) if i in bounds else snapshot.ops[i]
+        for i in indices
+    ]
+    return PlanSnapshot(
+        ops=ops,
+        operations={op.operation_id: snapshot.operations[op.operation_id]
+                    for op in ops if op.operation_id in snapshot.operations},
+        equipment={op.equipment_id: snapshot.equipment[op.equipment_id]
+                   for op in ops if op.equipment_id in snapshot.equipment},
+        work_orders={op.work_order_id: snapshot.work_orders[op.work_order_id]
+                     for op in ops if op.work_order_id in snapshot.work_orders},
+    )
+
+
+def _schedule_partition(ref: SharedInputs, p: int, bounds: Dict[int, datetime], now: datetime) -> PartitionResult:
+    """
+    子进程中执行：分区快照与日历取自共享内存，bounds 为分区内位置 -> 就绪下限；
+    分区内事件堆排程，只回传时间字段。
+    """
+    snapshot, calendars = load_shared(ref, p)
+    if bounds:
+        ops = list(snapshot.ops)
+        for k, bound in bounds.items():
+            ops[k] = replace(ops[k], planned_start_date=bound)
+        snapshot = replace(snapshot, ops=ops)
+    return [(t.start, t.end, t.hours, t.dispatch) for t in compute_schedule(snapshot, now, calendars)]
+
+
+def compute_schedule_parallel(snapshot: PlanSnapshot, now: datetime,
+                              calendars: Optional[Dict[int, BaseCalendar]] = None,
+                              workers: int = 2, max_rounds: int = MAX_ROUNDS,
+                              version: Optional[Hashable] = None) -> Tuple[List[ScheduledTask], Dict[str, Any]]:
+    """
+    按车间分区并行排程，返回与 snapshot.ops 对齐的任务列表（与 compute_schedule 一致）及统计信息。
+    version 为快照与日历的数据版本：版本不变时子进程直接复用已加载的输入；为 None 时每次重新发布。
+    """
+    calendars = calendars if calendars is not None else build_calendars(snapshot)
+    partitions = list(workshop_partitions(snapshot).values())
+    stats: Dict[str, Any] = {"partitions": len(partitions), "rounds": 0, "resumed_from": None}
+    if workers <= 1 or len(partitions) <= 1:
+        return compute_schedule(snapshot, now, calendars), stats
+
+    ops = snapshot.ops
+    partition_of = [0] * len(ops)
+    for p, indices in enumerate(partitions):
+        for i in indices:
+            partition_of[i] = p
+    linked = cross_links(snapshot, partition_of)
+    linked_set = set(linked)
+    position = [0] * len(ops)  # 工序在所在分区中的位置
+    for indices in partitions:
+        for k, i in enumerate(indices):
+            position[i] = k
+    linked_in: Dict[int, List[int]] = {}
+    for i in linked:
+        linked_in.setdefault(partition_of[i], []).append(i)
+
+    def partition_inputs() -> List[Tuple[PlanSnapshot, Dict[int, BaseCalendar]]]:
+        return [
+            (_partition_snapshot(snapshot, indices, {}),
+             {e: calendars[e] for e in {ops[i].equipment_id for i in indices}})
+            for indices in partitions
+        ]
+
+    executor = _pool.executor(workers)
+    tasks: List[Optional[ScheduledTask]] = [None] * len(ops)
+    bounds: Dict[int, datetime] = {}
+    dirty = set(range(len(partitions)))
+    with _pool.shared(version, partition_inputs) as ref:
+        while True:
+            stats["rounds"] += 1
+            futures = [
+                (partitions[p], executor.submit(
+                    _schedule_partition, ref, p, {position[i]: bounds[i] for i in linked_in.get(p, ()) if i in bounds}, now,
+                ))
+                for p in sorted(dirty)
+            ]
+            for indices, future in futures:
+                for i, (start, end, hours, dispatch) in zip(indices, future.result()):
+                    tasks[i] = ScheduledTask(ops[i], start, end, hours, dispatch)
+            ready = ready_times(snapshot, now, tasks)
+            dirty = {partition_of[i] for i in linked if bounds.get(i) != ready[i]}
+            if not dirty:
+                # 每道跨车间工序都恰好在真实就绪时刻释放，分区结果即全量排程结果
+                return tasks, stats
+            if stats["rounds"] >= max_rounds:
+                break
+            bounds = {i: ready[i] for i in linked}
+
+    # 未收敛：最早的不一致时刻之前的任务保持不变。分区中工序的释放时刻（就绪下限，没有下限时为计划开工）
+    # 与真实就绪时刻不同即可能改变派工：过早释放从释放时刻起、过晚释放从真实就绪时刻起不一致；
+    # 任何工序派工早于真实就绪时刻也从派工时刻起不一致
+    t0 = None
+    for i, task in enumerate(tasks):
+        candidates = [task.dispatch] if task.dispatch < ready[i] else []
+        if i in linked_set:
+            released = bounds.get(i, ops[i].planned_start_date or now)
+            if released != ready[i]:
+                candidates.append(min(released, ready[i]))
+        for t in candidates:
+            if t0 is None or t < t0:
+                t0 = t
+    if t0 is None:
+        if all(bounds.get(i, ops[i].planned_start_date or now) == ready[i] for i in linked):
+            return tasks, stats
+        # 找不到不一致时刻却未收敛（不应出现），退回全量排程
+        logger.warning("并行排程未能定位不一致时刻，退回全量排程")
+        stats["resumed_from"] = now.isoformat()
+        return compute_schedule(snapshot, now, calendars), stats
+    fixed = {i: t for i, t in enumerate(tasks) if t.dispatch < t0}
+    simulation = DispatchSimulation(snapshot, now, calendars)
+    simulation.resume(fixed, t0)
+    stats["resumed_from"] = t0.isoformat()
+    return simulation.run(), stats
@@ -0,0 +1,206 @@
+"""
+产量汇总（按小时预聚合）
+
+完工 / 报废报工在写入的同一事务中累加到 production_rollups 的 (小时, 设备, 班次, 工序, 工单) 桶，
+看板按小时 / 按天统计产量与报废率时只读汇总行，耗时与桶数相关，不再随 work_reports 增长。
+维度为空记为 0；设备取报工上的设备，未填时取工单工序的设备；工序为工单工序对应的工序。
+报工先更新工单（持有工单行锁），桶键含工单，同一个桶不会被两个事务同时插入。
+rebuild_rollups 按原始报工批量重算（已有数据回填，或汇总与报工不一致时修复），设备 / 工序取重算时工单工序的当前值。
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.workorder import ProductionRollup, WorkOrderOperation, WorkReport
+
+ROLLUP_REPORT_TYPES = ("complete", "scrap")
+# 分组维度（接口参数）-> 汇总表列
+GROUP_COLUMNS = {
+    "equipment": "equipment_id",
+    "shift": "shift_id",
+    "operation": "operation_id",
+    "work_order": "work_order_id",
+}
+CHUNK = 5000
+
+BucketKey = Tuple[datetime, int, int, int, int]  # (小时, 设备, 班次, 工序, 工单)
+
+
+def bucket_hour(t: datetime) -> datetime:
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_key(report_time: datetime, equipment_id: Optional[int], shift_id: Optional[int],
+               operation_id: Optional[int], work_order_id: Optional[int]) -> BucketKey:
+    return (bucket_hour(report_time), equipment_id or 0, shift_id or 0, operation_id or 0, work_order_id or 0)
+
+
+def add_to_bucket(deltas: Dict[BucketKey, List[float]], key: BucketKey, report_type: str,
+                  quantity: Optional[float]) -> None:
+    """把一条完工 / 报废报工计入桶增量 [完工数, 报废数, 报工条数]。"""
+    delta = deltas.setdefault(key, [0.0, 0.0, 0])
+    if report_type == "complete":
+        delta[0] += quantity or 0
+    else:
+        delta[1] += quantity or 0
+    delta[2] += 1
+
+
+def _key_values(key: BucketKey) -> Dict[str, Any]:
+    hour, equipment_id, shift_id, operation_id, work_order_id = key
+    return {"hour": hour, "equipment_id": equipment_id, "shift_id": shift_id,
+            "operation_id": operation_id, "work_order_id": work_order_id}
+
+
+def _new_rows(deltas: Iterable[Tuple[BucketKey, List[float]]], now: datetime) -> List[Dict[str, Any]]:
+    return [{**_key_values(key), "completed_quantity": completed, "scrapped_quantity": scrapped,
+             "report_count": count, "updated_at": now}
+            for key, (completed, scrapped, count) in deltas]
+
+
+def apply_rollups(db: Session, deltas: Dict[BucketKey, List[float]]) -> None:
+    """
+    把桶增量累加到汇总表（当前事务，不提交），数量以增量原子累加。
+    单个桶先更新，不存在再插入；多个桶一次查询已有的桶，再批量更新 / 插入。
+    """
+    if not deltas:
+        return
+    table = ProductionRollup.__table__
+    now = datetime.now()
+    if len(deltas) == 1:
+        (key, (completed, scrapped, count)), = deltas.items()
+        stmt = update(table).where(*(table.c[name] == value for name, value in _key_values(key).items())).values(
+            completed_quantity=table.c.completed_quantity + completed,
+            scrapped_quantity=table.c.scrapped_quantity + scrapped,
+            report_count=table.c.report_count + count,
+            updated_at=now,
+        )
+        if not db.execute(stmt).rowcount:
+            db.execute(insert(table), _new_rows(deltas.items(), now))
+        return
+
+    existing = {
+        (row.hour, row.equipment_id, row.shift_id, row.operation_id, row.work_order_id): row.id
+        for row in db.query(ProductionRollup.id, ProductionRollup.hour, ProductionRollup.equipment_id,
+                            ProductionRollup.shift_id, ProductionRollup.operation_id, ProductionRollup.work_order_id)
+        .filter(ProductionRollup.hour.in_({key[0] for key in deltas}),
+                ProductionRollup.work_order_id.in_({key[4] for key in deltas}))
+    }
+    updates = [
+        {"b_id": existing[key], "b_completed": completed, "b_scrapped": scrapped, "b_count": count}
+        for key, (completed, scrapped, count) in deltas.items() if key in existing
+    ]
+    if updates:
+        db.execute(update(table).where(table.c.id == bindparam("b_id")).values(
+            completed_quantity=table.c.completed_quantity + bindparam("b_completed"),
+            scrapped_quantity=table.c.scrapped_quantity + bindparam("b_scrapped"),
+            report_count=table.c.report_count + bindparam("b_count"),
+            updated_at=now,
+        ), updates)
+    created = _new_rows(((key, delta) for key, delta in deltas.items() if key not in existing), now)
+    if created:
+        db.execute(insert(table), created)
+
+
+def rebuild_rollups(db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None) -> int:
+    """
+    按原始报工重算 [since, until) 范围内（按整点）的汇总（当前事务，不提交），不指定则全部重算。
+    删除范围内的汇总行，流式读取报工在内存中按桶累计后批量插入；返回桶数。
+    """
+    since = bucket_hour(since) if since else None
+    until = bucket_hour(until) if until else None
+    stale = db.query(ProductionRollup)
+    reports = (
+        db.query(WorkReport.report_type, WorkReport.quantity, WorkReport.report_time, WorkReport.equipment_id,
+                 WorkReport.shift_id, WorkReport.work_order_id, WorkOrderOperation.operation_id,
+                 WorkOrderOperation.equipment_id.label("operation_equipment_id"))
+        .outerjoin(WorkOrderOperation, WorkOrderOperation.id == WorkReport.work_order_operation_id)
+        .filter(WorkReport.report_type.in_(ROLLUP_REPORT_TYPES), WorkReport.report_time.isnot(None))
+    )
+    if since:
+        stale = stale.filter(ProductionRollup.hour >= since)
+        reports = reports.filter(WorkReport.report_time >= since)
+    if until:
+        stale = stale.filter(ProductionRollup.hour < until)
+        reports = reports.filter(WorkReport.report_time < until)
+    stale.delete(synchronize_session=False)
+
+    deltas: Dict[BucketKey, List[float]] = {}
+    for row in reports.yield_per(CHUNK):
+        key = bucket_key(row.report_time, row.equipment_id or row.operation_equipment_id, row.shift_id,
+                         row.operation_id, row.work_order_id)
+        add_to_bucket(deltas, key, row.report_type, row.quantity)
+    rows = _new_rows(deltas.items(), datetime.now())
+    for i in range(0, len(rows), CHUNK):
+        db.execute(insert(ProductionRollup), rows[i:i + CHUNK])
+    return len(rows)
+
+
+def production_day_start(day: date) -> datetime:
+    """生产日的起点：当天的每日开工时间（SCHEDULE_DAY_START）。"""
+    return datetime.combine(day, settings.schedule_day_start_time)
+
+
+def production_day(hour: datetime) -> date:
+    start = settings.schedule_day_start_time
+    return (hour - timedelta(hours=start.hour, minutes=start.minute)).date()
+
+
+def _totals(completed: float, scrapped: float, count: int) -> Dict[str, Any]:
+    total = completed + scrapped
+    return {"completed_quantity": completed, "scrapped_quantity": scrapped, "report_count": count,
+            "scrap_rate": round(scrapped / total, 4) if total else 0.0}
+
+
+def output_series(db: Session, start: datetime, end: datetime, granularity: str = "hour",
+                  group_by: Optional[str] = None, filters: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, Any]:
+    """
+    [start, end) 内按小时（granularity="hour"）或按生产日（"day"）统计完工数、报废数与报废率；
+    group_by 为 GROUP_COLUMNS 中的维度时再按该维度分组，filters 为 {汇总表列: 值}（None 不过滤）。
+    数据库中按 (小时[, 维度]) 汇总，按天时再在内存中合并。
+    """
+    columns = [ProductionRollup.hour]
+    group_column = GROUP_COLUMNS[group_by] if group_by else None
+    if group_column:
+        columns.append(getattr(ProductionRollup, group_column))
+    query = db.query(
+        *columns,
+        func.sum(ProductionRollup.completed_quantity),
+        func.sum(ProductionRollup.scrapped_quantity),
+        func.sum(ProductionRollup.report_count),
+    ).filter(ProductionRollup.hour >= start, ProductionRollup.hour < end)
+    for column, value in (filters or {}).items():
+        if value is not None:
+            query = query.filter(getattr(ProductionRollup, column) == value)
+
+    buckets: Dict[Tuple[Any, Any], List[float]] = {}
+    for row in query.group_by(*columns):
+        hour = row[0]
+        period = hour if granularity == "hour" else production_day(hour)
+        dimension = row[1] if group_column else None
+        completed, scrapped, count = row[-3:]
+        bucket = buckets.setdefault((period, dimension), [0.0, 0.0, 0])
+        bucket[0] += completed or 0
+        bucket[1] += scrapped or 0
+        bucket[2] += count or 0
+
+    period_name = "hour" if granularity == "hour" else "date"
+    series = []
+    for (period, dimension), (completed, scrapped, count) in sorted(buckets.items(), key=lambda x: (x[0][0], x[0][1] or 0)):
+        item = {period_name: period.isoformat()}
+        if group_column:
+            item[group_column] = dimension or None
+        item.update(_totals(completed, scrapped, count))
+        series.append(item)
+    total = [sum((b[i] for b in buckets.values()), start) for i, start in enumerate((0.0, 0.0, 0))]
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "totals": _totals(*total),
+        "buckets": series,
+    }
@@ -0,0 +1,173 @@
+"""
+交期承诺（Capable-to-Promise）
+
+在当前排程的基础上试算 “某产品再做 N 件，最早什么时候完工”，不写数据库、不重新排程：
+- 空闲时间索引：由缓存排程的设备时间轴（schedule_view.equipment_timelines）得到每台设备
+  排程基准时刻之后的空闲区间（按时间排序），首次报价时构建并挂在 PlanState 上，随排程缓存一起失效
+- 报价：按产品启用的工艺路线（同新建工单的选择规则）展开工序，按 sequence 分段，
+  同一段工序可并行、后一段在前一段全部完工后开工；每道工序在其设备上二分定位到就绪时刻所在的空闲区间，
+  向后找第一个按设备日历放得下（不可中断）的区间，已有排程任务保持不动
+- 工时与排程一致：数量 * 工序标准时间；同一报价中多道工序落在同一设备时依次占用
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.master import Equipment, Operation, Routing, RoutingItem
+from app.services.scheduler import (
+    PlanSnapshot, PlanState, EquipmentInfo, OperationInfo, OpRecord,
+    UNASSIGNED_EQUIPMENT, calendar_for_equipment, operation_hours,
+)
+from app.services.schedule_view import equipment_timelines
+from app.services.work_calendar import BaseCalendar, get_shift_calendars
+
+# 设备 -> (空闲开始列表, 空闲结束列表)，按时间排序；最后一个区间结束于 datetime.max
+FreeIntervals = Dict[int, Tuple[List[datetime], List[datetime]]]
+
+OPEN_END = datetime.max
+
+
+@dataclass
+class RoutingStep:
+    """工艺路线明细（报价所需字段）"""
+    sequence: int
+    operation: OperationInfo
+    equipment: Optional[EquipmentInfo]
+
+
+def free_intervals(state: PlanState) -> FreeIntervals:
+    if state.free_time is None:
+        index: FreeIntervals = {}
+        for equipment_id, (_, _, tasks) in equipment_timelines(state).items():
+            starts: List[datetime] = []
+            ends: List[datetime] = []
+            cursor = state.now
+            for t in tasks:
+                if t.start > cursor:
+                    starts.append(cursor)
+                    ends.append(t.start)
+                if t.end > cursor:
+                    cursor = t.end
+            starts.append(cursor)
+            ends.append(OPEN_END)
+            index[equipment_id] = (starts, ends)
+        state.free_time = index
+    return state.free_time
+
+
+def active_routing(db: Session, product_id: int) -> Optional[Routing]:
+    """产品启用的工艺路线，选择规则同新建工单（版本号最大者）。"""
+    return (
+        db.query(Routing)
+        .filter(Routing.product_id == product_id, Routing.is_active == 1)
+        .order_by(Routing.version.desc())
+        .first()
+    )
+
+
+def load_routing_steps(db: Session, routing_id: int) -> List[RoutingStep]:
+    """一次联表查询取出工艺路线明细及其工序、设备主数据，按 sequence 排序。"""
+    rows = (
+        db.query(
+            RoutingItem.sequence,
+            Operation.id, Operation.code, Operation.name, Operation.standard_time,
+            Equipment.id, Equipment.code, Equipment.capacity, Equipment.workshop_id,
+        )
+        .join(Operation, RoutingItem.operation_id == Operation.id)
+        .outerjoin(Equipment, RoutingItem.equipment_id == Equipment.id)
+        .filter(RoutingItem.routing_id == routing_id)
+        .order_by(RoutingItem.sequence.asc(), RoutingItem.id.asc())
+        .all()
+    )
+    return [
+        RoutingStep(
+            sequence,
+            OperationInfo(op_id, op_code, op_name, float(op_std or 0)),
+            EquipmentInfo(eq_id, eq_code, float(eq_capacity or 0), eq_workshop) if eq_id is not None else None,
+        )
+        for sequence, op_id, op_code, op_name, op_std, eq_id, eq_code, eq_capacity, eq_workshop in rows
+    ]
+
+
+def _place(intervals: Tuple[List[datetime], List[datetime]], calendar: BaseCalendar,
+           ready: datetime, hours: float) -> Tuple[int, datetime, datetime]:
+    """就绪时刻之后第一个放得下任务的空闲区间：(区间下标, 开工, 完工)。"""
+    starts, ends = intervals
+    duration = timedelta(hours=hours)
+    i = bisect_right(ends, ready)
+    while True:
+        gap_start, gap_end = starts[i], ends[i]
+        earliest = gap_start if gap_start > ready else ready
+        # 日历时长不少于工作时长，区间自然时长不够的直接跳过
+        if gap_end - earliest >= duration:
+            start, end = calendar.slots(earliest, hours)
+            if end <= gap_end and (start < gap_end or gap_end == OPEN_END):
+                return i, start, end
+        i += 1
+
+
+def _reserve(intervals: Tuple[List[datetime], List[datetime]], i: int,
+             start: datetime, end: datetime) -> Tuple[List[datetime], List[datetime]]:
+    """在空闲区间 i 中占用 [start, end)，返回新的区间列表（不修改共享索引）。"""
+    starts, ends = list(intervals[0]), list(intervals[1])
+    gap_start, gap_end = starts[i], ends[i]
+    pieces = [(s, e) for s, e in ((gap_start, start), (end, gap_end)) if e > s]
+    starts[i:i + 1] = [s for s, _ in pieces]
+    ends[i:i + 1] = [e for _, e in pieces]
+    return starts, ends
+
+
+def quote(db: Session, state: PlanState, steps: List[RoutingStep], quantity: float,
+          earliest_start: Optional[datetime] = None) -> Dict[str, Any]:
+    """把工艺路线工序试插入当前排程的空闲区间，返回最早完工时间与各工序的试算时间。"""
+    index = free_intervals(state)
+    snapshot = PlanSnapshot(ops=[], operations={}, equipment={}, work_orders={})
+    shift_calendars = None
+    by_hours: Dict[float, BaseCalendar] = {}
+    reserved: FreeIntervals = {}
+
+    ready = max(earliest_start or state.now, state.now)
+    stage_ready = ready
+    stage_sequence = None
+    completion = ready
+    operations: List[Dict[str, Any]] = []
+    for n, step in enumerate(steps):
+        if step.sequence != stage_sequence:
+            stage_sequence, stage_ready = step.sequence, completion
+        equipment_id = step.equipment.id if step.equipment else UNASSIGNED_EQUIPMENT
+        snapshot.operations[step.operation.id] = step.operation
+        if step.equipment:
+            snapshot.equipment[equipment_id] = step.equipment
+        calendar = state.calendars.get(equipment_id)
+        if calendar is None:
+            if shift_calendars is None:
+                shift_calendars = get_shift_calendars(db)
+            calendar = calendar_for_equipment(snapshot, equipment_id, shift_calendars, by_hours)
+        hours = operation_hours(snapshot, OpRecord(
+            -(n + 1), 0, step.operation.id, step.sequence, equipment_id, quantity, 0.0, None,
+        ))
+        intervals = reserved.get(equipment_id) or index.get(equipment_id) or ([state.now], [OPEN_END])
+        i, start, end = _place(intervals, calendar, stage_ready, hours)
+        reserved[equipment_id] = _reserve(intervals, i, start, end)
+        completion = max(completion, end)
+        operations.append({
+            "sequence": step.sequence,
+            "operation_id": step.operation.id,
+            "operation_code": step.operation.code,
+            "operation_name": step.operation.name,
+            "equipment_id": step.equipment.id if step.equipment else None,
+            "equipment_code": step.equipment.code if step.equipment else None,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "hours": round(hours, 4),
+        })
+    return {
+        "quantity": quantity,
+        "earliest_start": ready.isoformat(),
+        "completion_date": completion.isoformat(),
+        "lead_time_hours": round((completion - ready).total_seconds() / 3600, 4),
+        "operations": operations,
+    }
@@ -0,0 +1,405 @@
+"""
+报工追加日志（write-behind spool）
+
+开启 work_report_spool 后，报工接口校验通过即把报工追加到本地日志文件并立即确认（HTTP 202），
+不等待数据库提交；后台线程按顺序批量写入数据库。
+- 日志：spool 目录下的分段文件 spool-<首条序号>.log，每行一条记录 "<crc32> <json>"，
+  超过 work_report_spool_segment_mb 后换新文件，已全部入库的分段删除
+- 持久化：写入后由刷盘线程 fsync，等待中的请求一起确认（组提交），确认的报工在断电后也不会丢失
+- 入库：每批最多 work_report_spool_batch 条，用 apply_work_reports 写入，
+  入库进度（WorkReportSpoolCheckpoint.applied_seq）与报工在同一事务中提交，崩溃重启后不会重复入库
+- 恢复：启动时扫描日志，截掉末尾写了一半的记录，从入库进度之后继续入库
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.workorder import WorkReportSpoolCheckpoint
+from app.schemas.workorder import WorkReportCreate
+from app.services.schedule_cache import bump_data_version
+from app.services.work_reports import apply_work_reports, remember_keys
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "work_reports"
+# 入库失败（数据库暂不可用等）后的重试间隔（秒）
+RETRY_SECONDS = 1.0
+
+
+def encode_record(seq: int, appended_at: datetime, report: Dict[str, Any]) -> bytes:
+    body = json.dumps({"seq": seq, "t": appended_at.isoformat(), "report": report},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def decode_record(line: bytes) -> Optional[Dict[str, Any]]:
+    """解析一行记录；不完整或校验失败时返回 None。"""
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    body = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _segment_path(directory: str, first_seq: int) -> str:
+    return os.path.join(directory, f"spool-{first_seq:012d}.log")
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ReportSpool:
+    """报工追加日志：append 由请求线程调用，刷盘与入库各一个后台线程。"""
+
+    def __init__(self, directory: str, session_factory: Callable[[], Session],
+                 batch_size: int = 500, segment_bytes: int = 64 * 2 ** 20):
+        self.directory = directory
+        self.session_factory = session_factory
+        self.batch_size = max(batch_size, 1)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._written_cond = threading.Condition(self._lock)  # 有新写入待刷盘
+        self._synced_cond = threading.Condition(self._lock)  # 刷盘进度前进（唤醒等待确认的请求与入库线程）
+        self._fsync_lock = threading.Lock()  # 换段与 fsync 互斥，刷盘线程不会 fsync 已关闭的文件
+        self._segments: List[Tuple[int, str]] = []  # (首条序号, 路径)，按序号排序
+        self._fd: Optional[int] = None
+        self._segment_size = 0
+        self._written = 0  # 已写入文件的最大序号
+        self._synced = 0  # 已 fsync 的最大序号
+        self._applied = 0  # 已入库的最大序号
+        self._pending_times: Deque[Tuple[int, datetime]] = deque()  # 未入库记录的 (序号, 追加时间)
+        self._reader = None
+        self._reader_segment = -1
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self.applied_count = 0
+        self.rejected_count = 0
+        self.replayed_count = 0  # 幂等键已入库、未重复写入的记录
+        self.last_applied_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    # ---------- 启动与恢复 ----------
+
+    def open(self) -> None:
+        """恢复日志与入库进度，启动刷盘与入库线程。"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._applied = self._load_checkpoint()
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("spool-") and n.endswith(".log"))
+        last_seq = self._applied
+        for index, name in enumerate(names):
+            path = os.path.join(self.directory, name)
+            first_seq = int(name[6:-4])
+            last_seq = max(last_seq, self._recover_segment(path, index == len(names) - 1))
+            self._segments.append((first_seq, path))
+        self._written = self._synced = last_seq
+        self._open_segment(last_seq + 1, reuse_last=True)
+        self._delete_applied_segments()
+        for target, name in ((self._flush_loop, "report-spool-flush"), (self._apply_loop, "report-spool-apply")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"报工 spool 已打开: {self.directory}, 已写入 {self._written}, 已入库 {self._applied}")
+
+    def _load_checkpoint(self) -> int:
+        db = self.session_factory()
+        try:
+            WorkReportSpoolCheckpoint.__table__.create(bind=db.get_bind(), checkfirst=True)
+            checkpoint = db.get(WorkReportSpoolCheckpoint, CHECKPOINT)
+            if checkpoint is None:
+                checkpoint = WorkReportSpoolCheckpoint(name=CHECKPOINT, applied_seq=0)
+                db.add(checkpoint)
+                db.commit()
+            return checkpoint.applied_seq
+        finally:
+            db.close()
+
+    def _recover_segment(self, path: str, last: bool) -> int:
+        """校验分段中的记录，返回最大序号；末段尾部不完整的记录截掉（未确认过的写入）。"""
+        last_seq, offset = 0, 0
+        with open(path, "rb") as f:
+            for line in f:
+                record = decode_record(line)
+                if record is None:
+                    if not last:
+                        raise RuntimeError(f"报工 spool 文件损坏: {path} 偏移 {offset}")
+                    logger.warning(f"截断报工 spool 末尾不完整的记录: {path} 偏移 {offset}")
+                    with open(path, "r+b") as w:
+                        w.truncate(offset)
+                        os.fsync(w.fileno())
+                    break
+                last_seq = record["seq"]
+                if last_seq > self._applied:
+                    self._pending_times.append((last_seq, datetime.fromisoformat(record["t"])))
+                offset += len(line)
+        return last_seq
+
+    def _open_segment(self, first_seq: int, reuse_last: bool = False) -> None:
+        """打开写入分段；调用方持有 _lock（open 时除外）。"""
+        if reuse_last and self._segments:
+            self._fd = os.open(self._segments[-1][1], os.O_WRONLY | os.O_APPEND)
+        else:
+            path = _segment_path(self.directory, first_seq)
+            self._segments.append((first_seq, path))
+            self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            _fsync_dir(self.directory)  # 新文件的目录项也要持久化
+        self._segment_size = os.fstat(self._fd).st_size
+
+    def close(self) -> None:
+        """停止后台线程（已确认的记录均已刷盘，未入库的记录下次启动时继续入库）。"""
+        with self._lock:
+            self._stopping = True
+            self._written_cond.notify_all()
+            self._synced_cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    # ---------- 追加与刷盘 ----------
+
+    def append(self, report: WorkReportCreate) -> int:
+        """追加一条报工，刷盘后返回序号。"""
+        data = jsonable_encoder(report)
+        with self._lock:
+            if self._stopping:
+                raise RuntimeError("报工 spool 已关闭")
+            seq = self._written + 1
+            now = datetime.now()
+            line = encode_record(seq, now, data)
+            if self._segment_size and self._segment_size + len(line) > self.segment_bytes:
+                with self._fsync_lock:
+                    os.fsync(self._fd)  # 换段前旧段必须已刷盘，刷盘线程只处理当前段
+                    os.close(self._fd)
+                    self._open_segment(seq)
+            os.write(self._fd, line)
+            self._segment_size += len(line)
+            self._written = seq
+            self._pending_times.append((seq, now))
+            self._written_cond.notify()
+            while self._synced < seq:
+                self._synced_cond.wait()
+        return seq
+
+    def _flush_loop(self) -> None:
+        """刷盘线程：每次 fsync 覆盖此前全部写入，fsync 期间到达的写入在下一次一起刷盘。"""
+        while True:
+            with self._lock:
+                while self._written == self._synced and not self._stopping:
+                    self._written_cond.wait()
+                if self._written == self._synced:
+                    return
+                target = self._written
+            with self._fsync_lock:
+                os.fsync(self._fd)
+            with self._lock:
+                self._synced = max(self._synced, target)
+                self._synced_cond.notify_all()
+
+    # ---------- 入库 ----------
+
+    def _read_batch(self, synced: int) -> List[Dict[str, Any]]:
+        """按序读取已刷盘、未入库的记录，最多 batch_size 条。"""
+        records: List[Dict[str, Any]] = []
+        next_seq = self._applied + 1
+        while len(records) < self.batch_size and next_seq <= synced:
+            if self._reader is None:
+                index = max(i for i, (first, _) in enumerate(self._segments) if first <= next_seq)
+                self._reader = open(self._segments[index][1], "rb")
+                self._reader_segment = index
+            line = self._reader.readline()
+            if not line:
+                # 当前分段已读完，转到下一分段
+                self._reader.close()
+                self._reader = None
+                if self._reader_segment + 1 >= len(self._segments):
+                    break
+                self._reader = open(self._segments[self._reader_segment + 1][1], "rb")
+                self._reader_segment += 1
+                continue
+            record = decode_record(line)
+            if record is None:
+                raise RuntimeError("报工 spool 记录校验失败")
+            if record["seq"] < next_seq:
+                continue  # 已入库（恢复时从分段开头读起）
+            records.append(record)
+            next_seq = record["seq"] + 1
+        return records
+
+    def _commit(self, records: List[Dict[str, Any]]) -> None:
+        """在一个事务中写入一批报工并推进入库进度。"""
+        reports = [WorkReportCreate(**r["report"]) for r in records]
+        db = self.session_factory()
+        try:
+            results, replayed = apply_work_reports(db, reports)
+            remember_keys(results)
+            db.query(WorkReportSpoolCheckpoint).filter(WorkReportSpoolCheckpoint.name == CHECKPOINT) \
+                .update({"applied_seq": records[-1]["seq"]}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        rejected = [r for r, result in zip(records, results) if result is None]
+        for record in rejected:
+            logger.warning(f"报工 spool 记录 {record['seq']} 入库失败: 工单 {record['report']['work_order_id']} 不存在")
+        work_order_ids = [r.work_order_id for i, r in enumerate(reports) if i not in replayed]
+        with self._lock:
+            self._applied = records[-1]["seq"]
+            while self._pending_times and self._pending_times[0][0] <= self._applied:
+                self._pending_times.popleft()
+            self.applied_count += len(records) - len(rejected) - len(replayed)
+            self.rejected_count += len(rejected)
+            self.replayed_count += len(replayed)
+            self.last_applied_at = datetime.now()
+            self.last_error = None
+        bump_data_version(work_order_ids)
+
+    def _apply(self, records: List[Dict[str, Any]]) -> None:
+        """
+        入库一批记录。数据库暂不可用（OperationalError）时原样抛出，稍后整批重试；
+        其他错误逐条入库，单条仍失败的记录视为无法入库，跳过并推进进度，避免阻塞后续报工。
+        """
+        try:
+            self._commit(records)
+            return
+        except OperationalError:
+            raise
+        except Exception as exc:
+            if len(records) == 1:
+                logger.exception(f"报工 spool 记录 {records[0]['seq']} 无法入库，已跳过")
+                self._skip(records[0], exc)
+                return
+        for record in records:
+            self._apply([record])
+
+    def _skip(self, record: Dict[str, Any], exc: Exception) -> None:
+        db = self.session_factory()
+        try:
+            db.query(WorkReportSpoolCheckpoint).filter(WorkReportSpoolCheckpoint.name == CHECKPOINT) \
+                .update({"applied_seq": record["seq"]}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._applied = record["seq"]
+            while self._pending_times and self._pending_times[0][0] <= self._applied:
+                self._pending_times.popleft()
+            self.rejected_count += 1
+            self.last_error = f"记录 {record['seq']}: {exc}"
+
+    def _delete_applied_segments(self) -> None:
+        """删除记录已全部入库的分段（不删当前写入的分段）。"""
+        with self._lock:
+            while len(self._segments) > 1 and self._segments[1][0] <= self._applied + 1:
+                _, path = self._segments.pop(0)
+                self._reader_segment -= 1
+                os.remove(path)
+
+    def _apply_loop(self) -> None:
+        records: List[Dict[str, Any]] = []
+        while True:
+            with self._lock:
+                while self._synced == self._applied and not self._stopping:
+                    self._synced_cond.wait()
+                if self._stopping:
+                    return
+                synced = self._synced
+            try:
+                # 逐条重试时中途失败，已入库的记录不能再入库
+                records = [r for r in records if r["seq"] > self._applied]
+                if not records:
+                    records = self._read_batch(synced)
+                if records:
+                    self._apply(records)
+                    records = []
+                    self._delete_applied_segments()
+            except Exception as exc:
+                logger.exception("报工 spool 入库失败，稍后重试")
+                with self._lock:
+                    self.last_error = str(exc) or exc.__class__.__name__
+                time.sleep(RETRY_SECONDS)
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """等待已确认的记录全部入库（测试 / 停机前使用），超时返回 False。"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._applied >= self._synced:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        now = datetime.now()
+        with self._lock:
+            oldest = self._pending_times[0][1] if self._pending_times else None
+            return {
+                "enabled": True,
+                "directory": os.path.abspath(self.directory),
+                "appended_seq": self._synced,
+                "applied_seq": self._applied,
+                "depth": self._synced - self._applied,
+                "oldest_pending_at": oldest.isoformat() if oldest else None,
+                "apply_lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+                "applied": self.applied_count,
+                "rejected": self.rejected_count,
+                "replayed": self.replayed_count,
+                "last_applied_at": self.last_applied_at.isoformat() if self.last_applied_at else None,
+                "last_error": self.last_error,
+                "segments": len(self._segments),
+                "spool_bytes": sum(os.path.getsize(p) for _, p in self._segments if os.path.exists(p)),
+            }
+
+
+_spool: Optional[ReportSpool] = None
+_spool_lock = threading.Lock()
+
+
+def get_spool() -> ReportSpool:
+    """进程内的报工 spool（首次调用时打开并恢复）。"""
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            from app.database import SessionLocal
+            spool = ReportSpool(
+                settings.work_report_spool_dir, SessionLocal,
+                batch_size=settings.work_report_spool_batch,
+                segment_bytes=settings.work_report_spool_segment_mb * 2 ** 20,
+            )
+            spool.open()
+            _spool = spool
+        return _spool
+
+
+def close_spool() -> None:
+    global _spool
+    with _spool_lock:
+        if _spool is not None:
+            _spool.close()
+            _spool = None
@@ -0,0 +1,506 @@
+"""
+多资源排程：设备 + 工装 + 操作人员
+
+工序（Operation）可要求占用 tooling_quantity 件工装（tooling_id）和一名技能等级不低于 skill_level 的操作人员。
+每台设备维护一条空闲时间轴（按时间排序、互不相交的空闲区间）；可互换的资源单元（同种工装的各件、
+同一班次且同一技能等级的人员）合为资源池，维护占用曲线（各时段已占用的单元数）。
+工序按队列顺序（优先级 / 工单 / 工序顺序）逐道插入最早可行的时间：
+- 从就绪时刻起按设备日历试算 [开工, 完工)，依次检查设备、工装池、合格人员，
+  任一资源冲突时跳到使其可行的最早时刻（冲突区间结束 / 工装池占用降到可用 / 人员上班）再试，直到全部满足
+- 时间轴与占用曲线都分块存放、二分定位，冲突时整块跳过放不下任务的时段；
+  资源池的检查与池中单元数、人员数无关
+- 同一时刻的占用不超过池容量即可排下；具体的工装件 / 人员在排程结束后按开工先后分配（区间图着色，必然分得到）
+- 人员须在开工时刻在班（按 shift_code 对应班次），任务期间（开工到完工）独占；同等可行时优先安排技能等级低的人员
+- 时间轴允许插空：后排的工序可以使用先排工序留下的空档
+工装数量不足或没有合格人员时该资源约束不生效，工序记入 unsatisfied。
+"""
+import heapq
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.master import Operation, Personnel, Tooling
+from app.services.scheduler import PlanSnapshot, ScheduledTask, build_calendars, operation_hours
+from app.services.work_calendar import BaseCalendar, shift_calendars_by_code
+
+# 技能等级由低到高；不在列表中的等级只与同名等级匹配
+SKILL_LEVELS = ("初级", "中级", "高级")
+
+# 不参与排程的工装状态
+UNAVAILABLE_TOOLING = ("maintenance",)
+
+
+@dataclass
+class ResourceRequirement:
+    """工序的辅助资源需求"""
+    tooling_id: Optional[int]
+    tooling_quantity: int
+    skill_level: Optional[str]
+
+
+@dataclass
+class OperatorInfo:
+    """操作人员（排程所需字段）"""
+    id: int
+    code: Optional[str]
+    skill_level: Optional[str]
+    calendar: Optional[BaseCalendar]  # 所在班次日历，未设置班次时不限上班时间
+
+
+@dataclass
+class ResourceSnapshot:
+    """多资源排程的辅助资源数据"""
+    requirements: Dict[int, ResourceRequirement] = field(default_factory=dict)  # 工序 id -> 需求
+    tooling: Dict[int, Tuple[Optional[str], int]] = field(default_factory=dict)  # 工装 id -> (编码, 可用数量)
+    operators: List[OperatorInfo] = field(default_factory=list)
+
+
+@dataclass
+class ResourceAssignment:
+    """任务占用的辅助资源"""
+    tooling_id: Optional[int] = None
+    tooling_units: List[int] = field(default_factory=list)  # 工装池中的单元序号
+    personnel_id: Optional[int] = None
+    personnel_code: Optional[str] = None
+    wait_hours: float = 0.0  # 因辅助资源推迟开工的时长
+
+
+class Timeline:
+    """
+    单台设备的空闲时间轴：按时间排序、互不相交的空闲区间，初始为整条时间线。
+    区间分块存放（每块至多 2 * CHUNK 个），每块记录最长的空闲区间；
+    向后查找时整块跳过放不下任务的块，时间轴再长，单次查找也只需 O(块数 + CHUNK)。
+    """
+    CHUNK = 64
+    __slots__ = ("firsts", "starts", "ends", "longest")
+
+    def __init__(self):
+        self.firsts: List[datetime] = [datetime.min]  # 每块首个空闲区间的开始
+        self.starts: List[List[datetime]] = [[datetime.min]]
+        self.ends: List[List[datetime]] = [[datetime.max]]
+        self.longest: List[timedelta] = [datetime.max - datetime.min]
+
+    def _locate(self, t: datetime) -> Tuple[int, int]:
+        """开始时刻不晚于 t 的最后一个空闲区间 (块, 块内下标)。"""
+        c = bisect_right(self.firsts, t) - 1
+        return c, bisect_right(self.starts[c], t) - 1
+
+    def wait(self, start: datetime, end: datetime, min_length: timedelta) -> Optional[datetime]:
+        """
+        [start, end) 落在某个空闲区间内时返回 None；否则返回其后第一个长度不短于 min_length 的空闲区间的开始，
+        即该资源可能容下任务的最早时刻（同一区间内更晚开工只会更晚完工，不必再试）。
+        """
+        starts, ends, longest = self.starts, self.ends, self.longest
+        c, i = self._locate(start)
+        if end <= ends[c][i]:
+            return None
+        i += 1
+        while True:
+            chunk_starts, chunk_ends = starts[c], ends[c]
+            while i < len(chunk_starts):
+                if chunk_ends[i] - chunk_starts[i] >= min_length:
+                    return chunk_starts[i]
+                i += 1
+            c += 1
+            while longest[c] < min_length:  # 最后一块以无限长的空闲区间结尾，循环必然结束
+                c += 1
+            i = 0
+
+    def reserve(self, start: datetime, end: datetime) -> None:
+        """占用 [start, end)，调用方已确认它落在一个空闲区间内。"""
+        if end <= start:
+            return
+        c, i = self._locate(start)
+        chunk_starts, chunk_ends = self.starts[c], self.ends[c]
+        gap_start, gap_end = chunk_starts[i], chunk_ends[i]
+        pieces = [(s, e) for s, e in ((gap_start, start), (end, gap_end)) if e > s]
+        chunk_starts[i:i + 1] = [s for s, _ in pieces]
+        chunk_ends[i:i + 1] = [e for _, e in pieces]
+        if not chunk_starts:
+            del self.firsts[c], self.starts[c], self.ends[c], self.longest[c]
+            return
+        stale = gap_end - gap_start >= self.longest[c]  # 拆分的正是最长区间（拆出的区间只会更短）
+        if len(chunk_starts) > 2 * self.CHUNK:
+            half = len(chunk_starts) // 2
+            self.starts[c + 1:c + 1] = [chunk_starts[half:]]
+            self.ends[c + 1:c + 1] = [chunk_ends[half:]]
+            del chunk_starts[half:], chunk_ends[half:]
+            self.firsts.insert(c + 1, self.starts[c + 1][0])
+            self.longest.insert(c + 1, self._longest(c + 1))
+            stale = True
+        self.firsts[c] = chunk_starts[0]
+        if stale:
+            self.longest[c] = self._longest(c)
+
+    def _longest(self, c: int) -> timedelta:
+        return max(e - s for s, e in zip(self.starts[c], self.ends[c]))
+
+
+class Pool:
+    """
+    可互换资源池的占用曲线：断点 times 与各段 [times[x], 下一断点) 的占用单元数 used，最后一段延伸到 datetime.max。
+    断点分块存放（同 Timeline）；每块按可用上限（容量 − 需求件数）缓存
+    (首个超限段的开始, 块内最长的可用连续时长, 末尾可用连续段的开始)，向后查找时整块跳过放不下任务的块。
+    """
+    CHUNK = 32
+    __slots__ = ("capacity", "firsts", "times", "used", "summaries")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.firsts: List[datetime] = [datetime.min]  # 每块首个断点
+        self.times: List[List[datetime]] = [[datetime.min]]
+        self.used: List[List[int]] = [[0]]
+        self.summaries: List[Dict[int, Tuple[Optional[datetime], timedelta, Optional[datetime]]]] = [{}]
+
+    def _locate(self, t: datetime) -> Tuple[int, int]:
+        """t 所在的段 (块, 块内下标)。"""
+        c = bisect_right(self.firsts, t) - 1
+        return c, bisect_right(self.times[c], t) - 1
+
+    def _chunk_end(self, c: int) -> datetime:
+        return self.firsts[c + 1] if c + 1 < len(self.firsts) else datetime.max
+
+    def _summary(self, c: int, limit: int) -> Tuple[Optional[datetime], timedelta, Optional[datetime]]:
+        summary = self.summaries[c].get(limit)
+        if summary is None:
+            times, used = self.times[c], self.used[c]
+            first_over: Optional[datetime] = None
+            longest = timedelta(0)
+            run: Optional[datetime] = None
+            for t, u in zip(times, used):
+                if u > limit:
+                    if first_over is None:
+                        first_over = t
+                    if run is not None:
+                        longest = max(longest, t - run)
+                        run = None
+                elif run is None:
+                    run = t
+            if run is not None:
+                longest = max(longest, self._chunk_end(c) - run)
+            summary = self.summaries[c][limit] = (first_over, longest, run)
+        return summary
+
+    def wait(self, start: datetime, end: datetime, k: int, min_length: timedelta) -> Optional[datetime]:
+        """
+        [start, end) 内各段占用都不超过 capacity − k 时返回 None；否则返回最后一个超限段之后
+        第一个长度不短于 min_length 的可用连续段的开始（更早开工的任务必然与超限段重叠）。
+        """
+        limit = self.capacity - k
+        times, used = self.times, self.used
+        c, i = self._locate(start)
+        over: Optional[Tuple[int, int]] = None
+        while True:
+            if used[c][i] > limit:
+                over = (c, i)
+            i += 1
+            if i == len(times[c]):
+                c, i = c + 1, 0
+                if c == len(times):
+                    break
+            if times[c][i] >= end:
+                break
+        if over is None:
+            return None
+
+        c, i = over
+        i += 1
+        run: Optional[datetime] = None
+        if self._summary(c, limit)[1] < min_length:
+            # 块内没有放得下的可用段，只有末尾可用段可能延续到后面的块
+            run, i = self._summary(c, limit)[2], len(times[c])
+        while True:
+            if i == len(times[c]):
+                c, i = c + 1, 0
+                # 整块判断：块内没有可用段延续 / 容纳任务时跳到块末尾的可用段
+                while True:
+                    first_over, longest, suffix = self._summary(c, limit)
+                    if first_over is None:
+                        if run is None:
+                            run = times[c][0]
+                        if self._chunk_end(c) - run >= min_length:
+                            return run
+                    elif run is not None and first_over - run >= min_length:
+                        return run
+                    elif longest >= min_length:
+                        run = None
+                        break
+                    else:
+                        run = suffix
+                    c += 1
+            if used[c][i] > limit:
+                run = None
+            else:
+                if run is None:
+                    run = times[c][i]
+                seg_end = times[c][i + 1] if i + 1 < len(times[c]) else self._chunk_end(c)
+                if seg_end - run >= min_length:
+                    return run
+            i += 1
+
+    def _split(self, t: datetime) -> None:
+        """保证 t 是断点。"""
+        c, i = self._locate(t)
+        times, used = self.times[c], self.used[c]
+        if times[i] == t:
+            return
+        times.insert(i + 1, t)
+        used.insert(i + 1, used[i])
+        self.summaries[c] = {}
+        if len(times) > 2 * self.CHUNK:
+            half = len(times) // 2
+            self.times.insert(c + 1, times[half:])
+            self.used.insert(c + 1, used[half:])
+            self.firsts.insert(c + 1, times[half])
+            self.summaries.insert(c + 1, {})
+            del times[half:], used[half:]
+        if c > 0:
+            self.summaries[c - 1] = {}  # 前一块的末尾可用段延伸到本块首个断点
+
+    def reserve(self, start: datetime, end: datetime, k: int) -> None:
+        """占用 k 个单元 [start, end)，调用方已确认各段占用不超过 capacity − k。"""
+        if end <= start:
+            return
+        self._split(start)
+        self._split(end)
+        c, i = self._locate(start)
+        times, used = self.times, self.used
+        while times[c][i] < end:
+            used[c][i] += k
+            self.summaries[c] = {}
+            i += 1
+            if i == len(times[c]):
+                c, i = c + 1, 0
+        if c > 0:
+            self.summaries[c - 1] = {}
+
+
+def assign_units(reservations: List[Tuple[datetime, datetime, int, int]], capacity: int) -> Dict[int, List[int]]:
+    """
+    资源池内的具体单元分配：reservations 为 (开工, 完工, 件数, 任务下标)，按开工先后领取编号最小的空闲单元。
+    各时刻占用不超过容量，按开工顺序领取必然领得到；不占用时间的任务优先领取当时空闲的单元。
+    """
+    free = list(range(capacity))
+    busy: List[Tuple[datetime, int]] = []  # (完工, 单元)
+    result: Dict[int, List[int]] = {}
+    for start, end, k, index in sorted(reservations, key=lambda r: (r[0], r[1] > r[0], r[3])):
+        while busy and busy[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        units = [heapq.heappop(free) for _ in range(min(k, len(free)))]
+        result[index] = units
+        if end > start:
+            for u in units:
+                heapq.heappush(busy, (end, u))
+        else:
+            for u in units:
+                heapq.heappush(free, u)
+            # 不占用时间，后插入的任务可能占满了该时刻，不足的件数取编号最小的单元
+            units += [u for u in range(capacity) if u not in units][:k - len(units)]
+    return result
+
+
+@dataclass
+class OperatorGroup:
+    """同一班次日历、同一技能等级的人员：可互换，合为一个资源池。"""
+    skill_level: Optional[str]
+    calendar: Optional[BaseCalendar]
+    members: List[OperatorInfo]  # 按 id 排序
+    pool: Pool
+
+
+def skill_rank(level: Optional[str]) -> Optional[int]:
+    return SKILL_LEVELS.index(level) if level in SKILL_LEVELS else None
+
+
+def qualifies(operator_level: Optional[str], required: str) -> bool:
+    rank, need = skill_rank(operator_level), skill_rank(required)
+    if rank is None or need is None:
+        return operator_level == required
+    return rank >= need
+
+
+def load_resources(db: Session, snapshot: PlanSnapshot) -> ResourceSnapshot:
+    """加载快照中工序的辅助资源需求、被引用的工装和在岗人员（各一次查询）。"""
+    resources = ResourceSnapshot()
+    operation_ids = list(snapshot.operations)
+    if operation_ids:
+        for op_id, tooling_id, tooling_quantity, skill_level in (
+            db.query(Operation.id, Operation.tooling_id, Operation.tooling_quantity, Operation.skill_level)
+            .filter(Operation.id.in_(operation_ids))
+            .all()
+        ):
+            if tooling_id is not None or skill_level:
+                resources.requirements[op_id] = ResourceRequirement(
+                    tooling_id, max(int(tooling_quantity or 1), 1), skill_level or None
+                )
+    tooling_ids = {r.tooling_id for r in resources.requirements.values() if r.tooling_id is not None}
+    if tooling_ids:
+        for tooling_id, code, quantity, status in (
+            db.query(Tooling.id, Tooling.code, Tooling.quantity, Tooling.status)
+            .filter(Tooling.id.in_(tooling_ids))
+            .all()
+        ):
+            units = 0 if status in UNAVAILABLE_TOOLING else int(quantity or 0)
+            resources.tooling[tooling_id] = (code, units)
+    if any(r.skill_level for r in resources.requirements.values()):
+        calendars = shift_calendars_by_code(db)
+        for personnel_id, code, skill_level, shift_code in (
+            db.query(Personnel.id, Personnel.code, Personnel.skill_level, Personnel.shift_code)
+            .filter(Personnel.status == "active")
+            .order_by(Personnel.id.asc())
+            .all()
+        ):
+            resources.operators.append(OperatorInfo(personnel_id, code, skill_level, calendars.get(shift_code)))
+    return resources
+
+
+def operator_groups(operators: List[OperatorInfo]) -> List[OperatorGroup]:
+    """按 (班次日历, 技能等级) 把人员分组，组内按 id 排序。"""
+    groups: Dict[Tuple[int, Optional[str]], OperatorGroup] = {}
+    for operator in sorted(operators, key=lambda o: o.id):
+        key = (id(operator.calendar), operator.skill_level)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = OperatorGroup(operator.skill_level, operator.calendar, [], Pool(0))
+        group.members.append(operator)
+        group.pool.capacity += 1
+    return list(groups.values())
+
+
+def _operator_fit(groups: List[OperatorGroup], start: datetime, end: datetime,
+                  min_length: timedelta) -> Tuple[Optional[OperatorGroup], datetime]:
+    """合格人员组中第一个开工时刻在班且有空闲人员的组（组已按技能等级由低到高排序）；都不满足时返回最早可能满足的时刻。"""
+    earliest: Optional[datetime] = None
+    for group in groups:
+        wait = None
+        if group.calendar is not None:
+            available = group.calendar.next_available(start)
+            if available > start:
+                wait = available
+        if wait is None:
+            wait = group.pool.wait(start, end, 1, min_length)
+            if wait is None:
+                return group, start
+            if group.calendar is not None:
+                wait = group.calendar.next_available(wait)  # 空闲段开始时不在班的，等到上班
+        if earliest is None or wait < earliest:
+            earliest = wait
+    return None, earliest
+
+
+def compute_resource_schedule(snapshot: PlanSnapshot, now: datetime, resources: ResourceSnapshot,
+                              calendars: Optional[Dict[int, BaseCalendar]] = None
+                              ) -> Tuple[List[ScheduledTask], List[ResourceAssignment], Dict[str, Any]]:
+    """
+    多资源排程，返回与 snapshot.ops 对齐的任务、辅助资源分配，以及统计信息。
+    snapshot.ops 须按 queue_key 排序（同一工单的工序连续且按 sequence 升序）。
+    """
+    calendars = calendars if calendars is not None else build_calendars(snapshot)
+    equipment: Dict[int, Timeline] = {}
+    tooling = {t: Pool(units) for t, (_, units) in resources.tooling.items()}
+    qualified: Dict[str, List[OperatorGroup]] = {}
+    groups = operator_groups(resources.operators)
+    for level in {r.skill_level for r in resources.requirements.values() if r.skill_level}:
+        matches = [g for g in groups if qualifies(g.skill_level, level)]
+        # 技能等级低的优先安排，高等级人员留给高要求工序；同等级按组内最小人员 id
+        matches.sort(key=lambda g: (skill_rank(g.skill_level) is None, skill_rank(g.skill_level) or 0, g.members[0].id))
+        qualified[level] = matches
+    tooling_reservations: Dict[int, List[Tuple[datetime, datetime, int, int]]] = {}
+    group_reservations: Dict[int, List[Tuple[datetime, datetime, int, int]]] = {}
+
+    tasks: List[ScheduledTask] = []
+    assignments: List[ResourceAssignment] = []
+    unsatisfied: List[int] = []
+    prev = None
+    stage_ready: Optional[datetime] = None
+    stage_end: Optional[datetime] = None
+    for op in snapshot.ops:
+        if prev is None or prev.work_order_id != op.work_order_id:
+            stage_ready, stage_end = None, None
+        elif prev.sequence != op.sequence:
+            stage_ready, stage_end = stage_end, None
+        base = op.planned_start_date or now
+        ready = stage_ready if stage_ready is not None and stage_ready > base else base
+        hours = operation_hours(snapshot, op)
+        slots = calendars[op.equipment_id].slots
+        machine = equipment.get(op.equipment_id)
+        if machine is None:
+            machine = equipment[op.equipment_id] = Timeline()
+
+        requirement = resources.requirements.get(op.operation_id)
+        pool: Optional[Pool] = None
+        operators: Optional[List[OperatorGroup]] = None
+        k = 0
+        if requirement is not None:
+            if requirement.tooling_id is not None:
+                k = requirement.tooling_quantity
+                pool = tooling.get(requirement.tooling_id)
+                if pool is None or pool.capacity < k:
+                    pool = None
+            if requirement.skill_level:
+                operators = qualified.get(requirement.skill_level) or None
+            if (requirement.tooling_id is not None and pool is None) or (requirement.skill_level and operators is None):
+                unsatisfied.append(op.id)
+
+        # 日历时长不短于工作时长：短于 min_length 的空闲区间一定放不下
+        min_length = timedelta(hours=hours)
+        t = ready
+        equipment_start: Optional[datetime] = None
+        while True:
+            start, end = slots(t, hours)
+            wait = machine.wait(start, end, min_length)
+            if wait is not None:
+                t = wait
+                continue
+            if equipment_start is None:
+                equipment_start = start
+            if pool is not None:
+                wait = pool.wait(start, end, k, min_length)
+                if wait is not None:
+                    t = wait
+                    continue
+            chosen_operator = None
+            if operators is not None:
+                chosen_operator, wait = _operator_fit(operators, start, end, min_length)
+                if chosen_operator is None:
+                    t = wait
+                    continue
+            break
+
+        machine.reserve(start, end)
+        assignment = ResourceAssignment(wait_hours=(start - equipment_start).total_seconds() / 3600)
+        if pool is not None:
+            pool.reserve(start, end, k)
+            assignment.tooling_id = requirement.tooling_id
+            tooling_reservations.setdefault(requirement.tooling_id, []).append((start, end, k, len(tasks)))
+        if chosen_operator is not None:
+            chosen_operator.pool.reserve(start, end, 1)
+            group_reservations.setdefault(id(chosen_operator), []).append((start, end, 1, len(tasks)))
+        tasks.append(ScheduledTask(op, start, end, hours, ready))
+        assignments.append(assignment)
+        if stage_end is None or end > stage_end:
+            stage_end = end
+        prev = op
+
+    # 具体的工装件与人员按开工先后分配
+    for tooling_id, reservations in tooling_reservations.items():
+        for index, units in assign_units(reservations, tooling[tooling_id].capacity).items():
+            assignments[index].tooling_units = units
+    for group in groups:
+        reservations = group_reservations.get(id(group))
+        if reservations:
+            for index, (member,) in assign_units(reservations, len(group.members)).items():
+                operator = group.members[member]
+                assignments[index].personnel_id = operator.id
+                assignments[index].personnel_code = operator.code
+
+    summary = {
+        "tooling_tasks": sum(1 for a in assignments if a.tooling_id is not None),
+        "operator_tasks": sum(1 for a in assignments if a.personnel_id is not None),
+        "resource_wait_hours": round(sum(a.wait_hours for a in assignments), 4),
+        "unsatisfied": unsatisfied,
+    }
+    return tasks, assignments, summary
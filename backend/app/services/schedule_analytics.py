@@ -0,0 +1,177 @@
+"""
+排程结果分析（NumPy 向量化）
+
+排程完成后把任务转成列式数组（开工 / 完工 datetime64、工时、设备、工单），每个排程只构建一次，
+挂在 PlanState 上随排程缓存失效；设备负荷、每日利用率、工单延误、瓶颈排序都是数组上的分组聚合：
+- 设备负荷：按设备分组累计加工工时（np.bincount）
+- 每日利用率：任务按自然日切段（np.repeat 展开），加工工时按各段占用时长比例分摊到各日，
+  再除以设备每日可用工时（工作日历 / 班次日历）
+- 工单延误：工单最晚完工（np.maximum.at）与计划完工比较
+- 瓶颈排序：设备在排程周期内的利用率从高到低，附延误任务数
+利用率按自然日计可用工时（未扣除休息日），分摊是近似值，单日可能略高于 1。
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from app.services.scheduler import PlanState
+
+DAY_SECONDS = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NAT = np.iinfo(np.int64).min  # datetime64 的 NaT
+
+
+@dataclass
+class TaskColumns:
+    """任务列式数组，与 PlanState.tasks 对齐；时间为本地时间 datetime64[s]。"""
+    start: np.ndarray  # datetime64[s]
+    end: np.ndarray  # datetime64[s]
+    hours: np.ndarray  # float64 加工工时（含换型准备）
+    equipment: np.ndarray  # int64 设备 id
+    work_order: np.ndarray  # int64 工单 id
+
+
+def _seconds(values: Iterable[Optional[datetime]], count: int) -> np.ndarray:
+    """本地时间 -> 1970-01-01 起的秒数（None 记为 NaT）；按日序号换算，避免逐个构造 datetime64。"""
+    return np.fromiter(
+        (NAT if t is None else (t.toordinal() - EPOCH_ORDINAL) * DAY_SECONDS + t.hour * 3600 + t.minute * 60 + t.second
+         for t in values),
+        np.int64, count,
+    ).view("datetime64[s]")
+
+
+def _datetime(seconds: int) -> str:
+    return np.datetime64(int(seconds), "s").astype(datetime).isoformat()
+
+
+def task_columns(state: PlanState) -> TaskColumns:
+    if state.columns is None:
+        tasks = state.tasks
+        n = len(tasks)
+        state.columns = TaskColumns(
+            start=_seconds((t.start for t in tasks), n),
+            end=_seconds((t.end for t in tasks), n),
+            hours=np.fromiter((t.hours + t.setup_hours for t in tasks), np.float64, n),
+            equipment=np.fromiter((t.op.equipment_id for t in tasks), np.int64, n),
+            work_order=np.fromiter((t.op.work_order_id for t in tasks), np.int64, n),
+        )
+    return state.columns
+
+
+def _daily_capacity(state: PlanState, equipment_ids: np.ndarray) -> np.ndarray:
+    """设备每日可用工时（未知日历按 24 小时）。"""
+    return np.array(
+        [getattr(state.calendars.get(int(e)), "day_hours", 24.0) or 24.0 for e in equipment_ids],
+        dtype=np.float64,
+    )
+
+
+def _daily_processing(cols: TaskColumns, eq_idx: np.ndarray, n_equipment: int,
+                      first_day: int, n_days: int) -> np.ndarray:
+    """(设备, 日) 加工工时矩阵：任务按自然日切段，加工工时按各段占用时长比例分摊。"""
+    matrix = np.zeros((n_equipment, n_days), dtype=np.float64)
+    start, end = cols.start.view(np.int64), cols.end.view(np.int64)
+    elapsed = end - start
+    mask = elapsed > 0
+    if not mask.any():
+        return matrix
+    task = np.flatnonzero(mask)
+    d0 = start[task] // DAY_SECONDS
+    d1 = (end[task] - 1) // DAY_SECONDS
+    spans = d1 - d0 + 1
+    seg_task = np.repeat(task, spans)
+    offsets = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    day = np.repeat(d0, spans) + offsets
+    seg_start = np.maximum(start[seg_task], day * DAY_SECONDS)
+    seg_end = np.minimum(end[seg_task], (day + 1) * DAY_SECONDS)
+    share = cols.hours[seg_task] * (seg_end - seg_start) / elapsed[seg_task]
+    column = day - first_day
+    keep = (column >= 0) & (column < n_days)
+    np.add.at(matrix, (eq_idx[seg_task[keep]], column[keep]), share[keep])
+    return matrix
+
+
+def schedule_analytics(state: PlanState, start: Optional[datetime] = None, days: int = 14,
+                       top: int = 10) -> Dict[str, Any]:
+    """
+    排程分析：
+    - equipment：各设备加工工时、占用时长、排程周期内利用率、延误任务数，按利用率从高到低（瓶颈排序）
+    - daily_utilisation：从 start（默认排程基准日）起 days 天，各设备每日利用率
+    - late_work_orders：延误最多的 top 个工单
+    """
+    cols = task_columns(state)
+    snapshot = state.snapshot
+    start_s, end_s = cols.start.view(np.int64), cols.end.view(np.int64)
+    now_s = int(_seconds([state.now], 1).view(np.int64)[0])
+    window_day = (now_s if start is None else int(_seconds([start], 1).view(np.int64)[0])) // DAY_SECONDS
+
+    eq_ids, eq_idx = np.unique(cols.equipment, return_inverse=True)
+    wo_ids, wo_idx = np.unique(cols.work_order, return_inverse=True)
+    n_eq = len(eq_ids)
+    processing = np.bincount(eq_idx, weights=cols.hours, minlength=n_eq)
+    occupied = np.bincount(eq_idx, weights=(end_s - start_s) / 3600.0, minlength=n_eq)
+    capacity = _daily_capacity(state, eq_ids)
+
+    # 工单完工与延误
+    completion = np.full(len(wo_ids), NAT, dtype=np.int64)
+    np.maximum.at(completion, wo_idx, end_s)
+    work_orders = [snapshot.work_orders.get(int(w)) for w in wo_ids]
+    due = _seconds((wo.planned_end_date if wo else None for wo in work_orders), len(wo_ids))
+    has_due = ~np.isnat(due)
+    due_s = np.where(has_due, due.view(np.int64), np.iinfo(np.int64).max)
+    lateness = np.where(has_due, (completion - due_s) / 3600.0, 0.0)
+    late = has_due & (lateness > 0)
+    late_tasks = np.bincount(eq_idx, weights=(end_s > due_s[wo_idx]).astype(np.float64), minlength=n_eq)
+
+    # 排程周期：最早开工（在制工序可能早于基准时刻）~ 最晚完工
+    makespan = int(end_s.max()) if len(end_s) else now_s
+    first = min(int(start_s.min()), now_s) if len(start_s) else now_s
+    horizon_days = max((makespan - first) / DAY_SECONDS, 1.0)
+    utilisation = processing / (capacity * horizon_days)
+    ranking = np.argsort(-utilisation, kind="stable")
+
+    daily = _daily_processing(cols, eq_idx, n_eq, window_day, days) / capacity[:, None]
+
+    late_order = np.flatnonzero(late)
+    late_order = late_order[np.argsort(-lateness[late_order], kind="stable")][:top]
+
+    def code(e: int) -> Optional[str]:
+        info = snapshot.equipment.get(e)
+        return info.code if info else None
+
+    return {
+        "summary": {
+            "tasks": int(len(end_s)),
+            "makespan": _datetime(makespan),
+            "late_work_orders": int(late.sum()),
+            "total_delay_hours": round(float(lateness[late].sum()), 4),
+        },
+        "equipment": [
+            {
+                "equipment_id": int(eq_ids[i]),
+                "equipment_code": code(int(eq_ids[i])),
+                "processing_hours": round(float(processing[i]), 4),
+                "occupied_hours": round(float(occupied[i]), 4),
+                "daily_capacity_hours": float(capacity[i]),
+                "utilisation": round(float(utilisation[i]), 4),
+                "late_tasks": int(late_tasks[i]),
+            }
+            for i in ranking
+        ],
+        "daily_utilisation": {
+            "days": [date.fromordinal(EPOCH_ORDINAL + int(window_day) + d).isoformat() for d in range(days)],
+            "equipment": {int(eq_ids[i]): [round(float(v), 4) for v in daily[i]] for i in range(n_eq)},
+        },
+        "late_work_orders": [
+            {
+                "work_order_id": int(wo_ids[i]),
+                "code": work_orders[i].code if work_orders[i] else None,
+                "planned_end_date": _datetime(due_s[i]),
+                "completion": _datetime(completion[i]),
+                "lateness_hours": round(float(lateness[i]), 4),
+            }
+            for i in late_order
+        ],
+    }
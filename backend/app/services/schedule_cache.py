@@ -0,0 +1,126 @@
+"""
+排程结果缓存
+
+排程输入（工单、工单工序、报工、工序 / 设备 / 班次主数据）发生变化的接口调用
+bump_data_version()；缓存键 = 数据版本号 + 排程基准时刻（整点），
+键不变时 GET /schedule 直接返回缓存的 JSON，不再重新排程。
+每次变更同时记录涉及的工单 id（主数据变更记为全量），供增量排程判断需要重排的范围，
+并通知 add_listener 注册的监听者（如设备派工队列）。
+版本号保存在进程内，多进程部署时各进程分别缓存。
+"""
+import json
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.services.scheduler import PlanState
+
+# 变更日志上限，超出后折叠为一次全量变更
+MAX_CHANGES = 10000
+
+_lock = threading.Lock()
+_compute_lock = threading.Lock()
+_version = 0
+# 变更日志：(版本号, 涉及的工单 id；None 表示需要全量重排)
+_changes: List[Tuple[int, Optional[FrozenSet[int]]]] = []
+_entry: Optional["CachedSchedule"] = None
+# 变更监听者：参数为涉及的工单 id，None 表示全局变更
+_listeners: List[Callable[[Optional[FrozenSet[int]]], None]] = []
+
+
+@dataclass
+class CachedSchedule:
+    key: str
+    result: Dict[str, Any]
+    body: bytes
+    state: Optional[PlanState] = None
+
+
+def bump_data_version(work_order_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    排程输入变化后调用，使已缓存的排程失效。
+    work_order_ids 为本次变更涉及的工单；不传表示主数据等全局变更。
+    """
+    global _version
+    ids = frozenset(work_order_ids) if work_order_ids is not None else None
+    with _lock:
+        _version += 1
+        _changes.append((_version, ids))
+        if len(_changes) > MAX_CHANGES:
+            _changes[:] = [(_version, None)]
+    for listener in _listeners:
+        listener(ids)
+
+
+def add_listener(listener: Callable[[Optional[FrozenSet[int]]], None]) -> None:
+    """注册变更监听者；监听者在发起变更的请求线程中同步调用，应只做标记、不访问数据库。"""
+    _listeners.append(listener)
+
+
+def current_version() -> int:
+    with _lock:
+        return _version
+
+
+def schedule_key(now: datetime, version: Optional[int] = None) -> str:
+    """数据版本与排程基准时刻对应的缓存键。"""
+    if version is None:
+        version = current_version()
+    return f"{version}-{now.strftime('%Y%m%d%H')}"
+
+
+def changed_work_orders(since: int, until: int) -> Optional[Set[int]]:
+    """(since, until] 版本区间内变更过的工单；期间有全局变更时返回 None。"""
+    changed: Set[int] = set()
+    with _lock:
+        for version, ids in _changes:
+            if since < version <= until:
+                if ids is None:
+                    return None
+                changed |= ids
+    return changed
+
+
+def get_cached(key: str) -> Optional[CachedSchedule]:
+    entry = _entry
+    if entry is not None and entry.key == key:
+        return entry
+    return None
+
+
+def last_state() -> Optional[PlanState]:
+    """最近一次排程的时间轴状态（不论数据版本是否已变化）。"""
+    entry = _entry
+    return entry.state if entry is not None else None
+
+
+def store(key: str, result: Dict[str, Any], state: Optional[PlanState] = None) -> CachedSchedule:
+    """缓存排程结果；键应在加载排程数据之前取得，计算期间数据变化时该键自然过期。"""
+    global _entry
+    body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+    entry = CachedSchedule(key, result, body, state)
+    with _lock:
+        _entry = entry
+        if state is not None:
+            # 早于该状态的变更日志已不再需要
+            _changes[:] = [change for change in _changes if change[0] > state.version]
+    return entry
+
+
+def computing() -> threading.Lock:
+    """排程计算互斥锁：同一时刻只有一个请求计算 / 更新排程状态。"""
+    return _compute_lock
+
+
+def get_or_compute(key: str, compute: Callable[[], Tuple[Dict[str, Any], Optional[PlanState]]]) -> CachedSchedule:
+    """命中则直接返回；未命中时只有一个请求执行排程，其余请求等待其结果。"""
+    entry = get_cached(key)
+    if entry is not None:
+        return entry
+    with _compute_lock:
+        entry = get_cached(key)
+        if entry is not None:
+            return entry
+        result, state = compute()
+        return store(key, result, state)
@@ -0,0 +1,122 @@
+"""
+排程后台任务
+
+提交排程后立即返回任务 id，排程在后台线程池中执行，客户端轮询状态并在完成后取结果。
+- 线程池大小由配置 schedule_job_workers 控制，超出的任务排队等待
+- 去重：相同 key（排程模式 + 数据版本 + 排程基准时刻）的任务未失败时直接复用，
+  多人同时点击 “排程” 只触发一次计算
+- 只保留最近 schedule_job_history 个任务（未结束的任务不清理）
+使用线程而非进程：排程结果需写入进程内的排程缓存（schedule_cache）。
+"""
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, ScheduleJob]" = OrderedDict()
+_by_key: Dict[str, str] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+@dataclass
+class ScheduleJob:
+    id: str
+    key: str
+    status: str = QUEUED
+    submitted_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def summary(self) -> Dict[str, Any]:
+        """任务状态（不含排程结果）。"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(settings.schedule_job_workers, 1), thread_name_prefix="schedule-job"
+            )
+        return _executor
+
+
+def _trim() -> None:
+    """超出保留数量时按提交顺序清理已结束的任务；调用方持有 _lock。"""
+    excess = len(_jobs) - settings.schedule_job_history
+    if excess <= 0:
+        return
+    for job_id in [j.id for j in _jobs.values() if j.finished][:excess]:
+        job = _jobs.pop(job_id)
+        if _by_key.get(job.key) == job_id:
+            del _by_key[job.key]
+
+
+def _run(job: ScheduleJob, compute: Callable[[], Dict[str, Any]]) -> None:
+    with _lock:
+        job.status = RUNNING
+        job.started_at = datetime.now()
+    try:
+        result = compute()
+    except Exception as exc:
+        logger.exception(f"排程任务失败: {job.id}")
+        with _lock:
+            job.status = FAILED
+            job.error = str(exc) or exc.__class__.__name__
+            job.finished_at = datetime.now()
+    else:
+        with _lock:
+            job.result = result
+            job.status = SUCCEEDED
+            job.finished_at = datetime.now()
+
+
+def submit(key: str, compute: Callable[[], Dict[str, Any]]) -> Tuple[ScheduleJob, bool]:
+    """
+    提交排程任务，返回 (任务, 是否新建)。
+    相同 key 的任务排队中 / 执行中 / 已成功时直接返回该任务，不重复计算；失败的任务允许重新提交。
+    """
+    executor = _get_executor()
+    with _lock:
+        existing = _jobs.get(_by_key.get(key, ""))
+        if existing is not None and existing.status != FAILED:
+            return existing, False
+        job = ScheduleJob(id=uuid.uuid4().hex, key=key)
+        _jobs[job.id] = job
+        _by_key[key] = job.id
+        _trim()
+    executor.submit(_run, job, compute)
+    return job, True
+
+
+def get_job(job_id: str) -> Optional[ScheduleJob]:
+    with _lock:
+        return _jobs.get(job_id)
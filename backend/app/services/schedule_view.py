@@ -0,0 +1,97 @@
+"""
+排程结果查询视图
+
+在缓存的排程状态（PlanState）上按时间窗口 / 设备 / 车间筛选任务，供甘特图分页读取与 NDJSON 导出：
+- 每台设备同一时刻只加工一道工序，设备时间轴上的任务按开工排序后完工也有序，
+  时间窗口查询在每台设备上二分查找，O(设备数 * log n + 命中数)
+- 设备时间轴索引在第一次查询时构建并挂在 PlanState 上，随排程缓存一起失效
+"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.scheduler import PlanState, ScheduledTask, task_row, task_warning
+
+# 设备 -> (开工时间列表, 完工时间列表, 任务列表)，均按开工时间排序
+Timelines = Dict[int, Tuple[List[datetime], List[datetime], List[ScheduledTask]]]
+
+# NDJSON 导出时每次输出的行数
+NDJSON_CHUNK = 1000
+
+
+def equipment_timelines(state: PlanState) -> Timelines:
+    if state.timelines is None:
+        grouped: Dict[int, List[ScheduledTask]] = {}
+        for t in state.tasks:
+            grouped.setdefault(t.op.equipment_id, []).append(t)
+        timelines: Timelines = {}
+        for equipment_id, tasks in grouped.items():
+            tasks.sort(key=lambda t: (t.start, t.end))
+            timelines[equipment_id] = ([t.start for t in tasks], [t.end for t in tasks], tasks)
+        state.timelines = timelines
+    return state.timelines
+
+
+def select_tasks(state: PlanState, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 equipment_ids: Optional[Iterable[int]] = None,
+                 workshop_id: Optional[int] = None) -> List[ScheduledTask]:
+    """
+    与 [start, end) 有重叠的任务（未给出的一端不限），可按设备 / 车间过滤。
+    结果按开工时间、设备排序，便于分页。
+    """
+    timelines = equipment_timelines(state)
+    equipment = set(timelines) if equipment_ids is None else set(equipment_ids) & set(timelines)
+    if workshop_id is not None:
+        info = state.snapshot.equipment
+        equipment = {e for e in equipment if e in info and info[e].workshop_id == workshop_id}
+    selected: List[ScheduledTask] = []
+    for equipment_id in equipment:
+        starts, ends, tasks = timelines[equipment_id]
+        # 开工早于 end 且完工晚于 start；零工时任务（开工 == 完工）落在窗口内也算重叠
+        hi = len(tasks) if end is None else bisect_left(starts, end)
+        lo = 0 if start is None else bisect_right(ends, start)
+        while lo > 0 and ends[lo - 1] == start and starts[lo - 1] == start:
+            lo -= 1
+        selected.extend(tasks[lo:hi])
+    selected.sort(key=lambda t: (t.start, t.op.equipment_id, t.op.id))
+    return selected
+
+
+def task_rows(state: PlanState, tasks: List[ScheduledTask]) -> Iterator[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """任务对应的接口行与交期预警，优先复用 PlanState.rows 中已生成的行。"""
+    rows = state.rows
+    for t in tasks:
+        cached = rows.get(t.op.id)
+        if cached is not None and cached[0] is t:
+            yield cached[1], cached[3]
+        else:
+            yield task_row(state.snapshot, t), task_warning(state.snapshot, t)
+
+
+def build_page(state: PlanState, tasks: List[ScheduledTask], skip: int = 0,
+               limit: Optional[int] = None) -> Dict[str, Any]:
+    """筛选结果的一页（结构同排程接口，另附 total / skip / limit）；负荷与预警按本页任务统计。"""
+    page = tasks[skip:] if limit is None else tasks[skip:skip + limit]
+    task_list: List[Dict[str, Any]] = []
+    loads: Dict[int, float] = {}
+    warnings: List[Dict[str, Any]] = []
+    for t, (row, warning) in zip(page, task_rows(state, page)):
+        task_list.append(row)
+        loads[t.op.equipment_id] = loads.get(t.op.equipment_id, 0.0) + (t.end - t.start).total_seconds() / 3600
+        if warning is not None:
+            warnings.append(warning)
+    return {"tasks": task_list, "loads": loads, "warnings": warnings,
+            "total": len(tasks), "skip": skip, "limit": limit}
+
+
+def iter_ndjson(state: PlanState, tasks: List[ScheduledTask]) -> Iterator[bytes]:
+    """逐行输出任务（NDJSON），每 NDJSON_CHUNK 行一块，不在内存中拼出完整结果。"""
+    lines: List[str] = []
+    for row, _ in task_rows(state, tasks):
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= NDJSON_CHUNK:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,662 @@
+"""
+排程引擎
+
+- load_snapshot: 一次联表查询批量加载排程所需的工单工序 / 工单 / 工序 / 设备数据
+- compute_schedule: 纯内存排程核心（事件堆，兼顾设备能力与工单内工序顺序），不访问数据库
+- compute_setup_schedule: 换型感知排程，计入工序切换的准备时间，并在优先级窗口内合并同工序任务
+- build_response: 生成接口返回结构（任务、设备负荷、交期预警）
+- write_planned_dates: 把排程结果批量回写到工单工序的计划开始 / 完成时间
+"""
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.workorder import WorkOrder, WorkOrderOperation
+from app.models.master import Operation, Equipment, RoutingItem
+from app.services.work_calendar import BaseCalendar, ShiftCalendar, calendar_for_capacity
+
+# 参与排程的工单状态
+SCHEDULABLE_STATUSES = ("released", "in_progress")
+# 未分配设备的工序统一归到 -1
+UNASSIGNED_EQUIPMENT = -1
+# 设备未设置产能时的每日可用工时
+DEFAULT_DAY_HOURS = 8.0
+
+
+@dataclass
+class OperationInfo:
+    """工序主数据（排程所需字段）"""
+    id: int
+    code: Optional[str]
+    name: Optional[str]
+    standard_time: float  # 标准工时(分钟)
+
+
+@dataclass
+class EquipmentInfo:
+    """设备主数据（排程所需字段）"""
+    id: int
+    code: Optional[str]
+    capacity: float  # 每日可用工时(小时)，0 表示未设置
+    workshop_id: Optional[int]
+
+
+@dataclass
+class WorkOrderInfo:
+    """工单（排程所需字段）"""
+    id: int
+    code: Optional[str]
+    priority: Optional[int]
+    planned_end_date: Optional[datetime]
+    routing_id: Optional[int] = None
+
+
+@dataclass
+class OpRecord:
+    """待排程的工单工序"""
+    id: int
+    work_order_id: int
+    operation_id: int
+    sequence: int
+    equipment_id: int
+    planned_quantity: float
+    completed_quantity: float
+    planned_start_date: Optional[datetime]
+
+    @property
+    def remaining_quantity(self) -> float:
+        return max(self.planned_quantity - self.completed_quantity, 0)
+
+
+@dataclass
+class PlanSnapshot:
+    """一次排程的全部输入，按 id 建立字典索引"""
+    ops: List[OpRecord]
+    operations: Dict[int, OperationInfo]
+    equipment: Dict[int, EquipmentInfo]
+    work_orders: Dict[int, WorkOrderInfo]
+    # (工艺路线, 工序) -> 准备时间(分钟)，仅换型感知排程加载
+    setup_times: Dict[Tuple[int, int], float] = field(default_factory=dict)
+
+
+@dataclass
+class ScheduledTask:
+    """排程结果中的一条任务"""
+    op: OpRecord
+    start: datetime
+    end: datetime
+    hours: float
+    dispatch: Optional[datetime] = None  # 派工决策时刻（设备空闲且工序就绪的时刻）
+    setup_hours: float = 0.0  # 开工前的换型准备时间（小时），计入 start~end
+
+
+def snapshot_query(db: Session):
+    """排程数据联表查询：工单工序 + 工单 + 工序 + 设备，每行一道工单工序。"""
+    return (
+        db.query(
+            WorkOrderOperation.id,
+            WorkOrderOperation.work_order_id,
+            WorkOrderOperation.operation_id,
+            WorkOrderOperation.sequence,
+            WorkOrderOperation.equipment_id,
+            WorkOrderOperation.planned_quantity,
+            WorkOrderOperation.completed_quantity,
+            WorkOrderOperation.planned_start_date,
+            WorkOrder.code,
+            WorkOrder.priority,
+            WorkOrder.planned_end_date,
+            WorkOrder.routing_id,
+            Operation.id,
+            Operation.code,
+            Operation.name,
+            Operation.standard_time,
+            Equipment.id,
+            Equipment.code,
+            Equipment.capacity,
+            Equipment.workshop_id,
+        )
+        .join(WorkOrder, WorkOrderOperation.work_order_id == WorkOrder.id)
+        .outerjoin(Operation, WorkOrderOperation.operation_id == Operation.id)
+        .outerjoin(Equipment, WorkOrderOperation.equipment_id == Equipment.id)
+        .filter(WorkOrder.status.in_(SCHEDULABLE_STATUSES))
+    )
+
+
+def add_snapshot_rows(snapshot: PlanSnapshot, rows) -> List[OpRecord]:
+    """把 snapshot_query 的结果行并入快照，返回新加入的工单工序；快照中已有的工单 / 主数据不覆盖。"""
+    added: List[OpRecord] = []
+    for (
+        woo_id, wo_id, op_id, sequence, equip_id, planned_qty, completed_qty, planned_start,
+        wo_code, wo_priority, wo_planned_end, wo_routing,
+        operation_id, op_code, op_name, op_std,
+        equipment_id, eq_code, eq_capacity, eq_workshop,
+    ) in rows:
+        op = OpRecord(
+            id=woo_id,
+            work_order_id=wo_id,
+            operation_id=op_id,
+            sequence=sequence,
+            equipment_id=equip_id or UNASSIGNED_EQUIPMENT,
+            planned_quantity=planned_qty or 0.0,
+            completed_quantity=completed_qty or 0.0,
+            planned_start_date=planned_start,
+        )
+        snapshot.ops.append(op)
+        added.append(op)
+        if wo_id not in snapshot.work_orders:
+            snapshot.work_orders[wo_id] = WorkOrderInfo(wo_id, wo_code, wo_priority, wo_planned_end, wo_routing)
+        if operation_id is not None and operation_id not in snapshot.operations:
+            snapshot.operations[operation_id] = OperationInfo(operation_id, op_code, op_name, float(op_std or 0))
+        if equipment_id is not None and equipment_id not in snapshot.equipment:
+            snapshot.equipment[equipment_id] = EquipmentInfo(
+                equipment_id, eq_code, float(eq_capacity or 0), eq_workshop
+            )
+    return added
+
+
+def load_snapshot(db: Session) -> PlanSnapshot:
+    """一次联表查询加载 released/in_progress 工单的全部工序及其关联主数据。"""
+    rows = (
+        snapshot_query(db)
+        .order_by(
+            WorkOrder.priority.asc(), WorkOrder.id.asc(),
+            WorkOrderOperation.sequence.asc(), WorkOrderOperation.id.asc(),
+        )
+        .all()
+    )
+    snapshot = PlanSnapshot(ops=[], operations={}, equipment={}, work_orders={})
+    add_snapshot_rows(snapshot, rows)
+    return snapshot
+
+
+def load_setup_times(db: Session, snapshot: PlanSnapshot) -> None:
+    """加载待排程工单所用工艺路线的工序准备时间（RoutingItem.setup_time）；同一路线重复出现的工序取最大值。"""
+    routing_ids = select(WorkOrder.routing_id).where(WorkOrder.status.in_(SCHEDULABLE_STATUSES))
+    rows = (
+        db.query(RoutingItem.routing_id, RoutingItem.operation_id, func.max(RoutingItem.setup_time))
+        .filter(RoutingItem.routing_id.in_(routing_ids), RoutingItem.setup_time > 0)
+        .group_by(RoutingItem.routing_id, RoutingItem.operation_id)
+        .all()
+    )
+    snapshot.setup_times = {(routing_id, op_id): float(minutes) for routing_id, op_id, minutes in rows}
+
+
+def write_planned_dates(db: Session, tasks: List[ScheduledTask]) -> Tuple[int, Set[int]]:
+    """
+    把任务的开工 / 完工时间写回 WorkOrderOperation.planned_start_date / planned_end_date。
+    先一次查询取出现值，只更新有变化的行（按主键批量 UPDATE，executemany），整体一次提交。
+    返回 (更新行数, 涉及的工单 id)。
+    注意：计划开始时间同时是排程的最早开工约束，回写后再次排程时这些工序不会早于回写的时间开工。
+    """
+    current = {
+        woo_id: (start, end)
+        for woo_id, start, end in (
+            db.query(WorkOrderOperation.id, WorkOrderOperation.planned_start_date, WorkOrderOperation.planned_end_date)
+            .join(WorkOrder, WorkOrderOperation.work_order_id == WorkOrder.id)
+            .filter(WorkOrder.status.in_(SCHEDULABLE_STATUSES))
+        )
+    }
+    now = datetime.now()
+    changed = []
+    work_order_ids: Set[int] = set()
+    for t in tasks:
+        if current.get(t.op.id) != (t.start, t.end):
+            changed.append({"id": t.op.id, "planned_start_date": t.start, "planned_end_date": t.end, "updated_at": now})
+            work_order_ids.add(t.op.work_order_id)
+    if changed:
+        try:
+            db.execute(update(WorkOrderOperation), changed)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return len(changed), work_order_ids
+
+
+def queue_key(snapshot: PlanSnapshot, op: OpRecord) -> Tuple:
+    """设备队列排序键，与 load_snapshot 的 ORDER BY 一致（优先级为空的排在最前）。"""
+    wo = snapshot.work_orders.get(op.work_order_id)
+    priority = wo.priority if wo else None
+    return (priority is not None, priority or 0, op.work_order_id, op.sequence, op.id)
+
+
+def operation_hours(snapshot: PlanSnapshot, op: OpRecord) -> float:
+    """总工时 = 剩余数量 * 标准时间/60；未设置标准时间时回退到 1件/小时。"""
+    qty = op.remaining_quantity
+    std = snapshot.operations.get(op.operation_id)
+    std_min = std.standard_time if std else 0.0
+    return qty * (std_min / 60.0) if std_min > 0 else qty
+
+
+def setup_hours(snapshot: PlanSnapshot, op: OpRecord) -> float:
+    """工序在设备上换型的准备时间（小时），取自工单工艺路线中该工序的 setup_time。"""
+    wo = snapshot.work_orders.get(op.work_order_id)
+    if wo is None or wo.routing_id is None:
+        return 0.0
+    return snapshot.setup_times.get((wo.routing_id, op.operation_id), 0.0) / 60.0
+
+
+def day_hours_for(snapshot: PlanSnapshot, equipment_id: int) -> float:
+    """设备设置了每日产能（capacity，单位可近似为小时）时用它作为每日可用工时。"""
+    eq = snapshot.equipment.get(equipment_id)
+    if eq and eq.capacity > 0:
+        return eq.capacity
+    return DEFAULT_DAY_HOURS
+
+
+def calendar_for_equipment(snapshot: PlanSnapshot, equipment_id: int,
+                           shift_calendars: Dict[Optional[int], ShiftCalendar],
+                           by_hours: Dict[float, BaseCalendar]) -> BaseCalendar:
+    """
+    选择设备的工作日历：
+    - 设备所在车间（Equipment.workshop_id）有启用班次时用车间班次日历，否则用全厂班次日历
+    - 都没有班次时按设备日产能（capacity）构建日历，相同日产能的设备共用 by_hours 中的日历
+    """
+    eq = snapshot.equipment.get(equipment_id)
+    workshop_id = eq.workshop_id if eq else None
+    calendar = shift_calendars.get(workshop_id) or shift_calendars.get(None)
+    if calendar is None:
+        day_hours = day_hours_for(snapshot, equipment_id)
+        if day_hours not in by_hours:
+            by_hours[day_hours] = calendar_for_capacity(day_hours)
+        calendar = by_hours[day_hours]
+    return calendar
+
+
+def build_calendars(snapshot: PlanSnapshot,
+                    shift_calendars: Optional[Dict[Optional[int], ShiftCalendar]] = None) -> Dict[int, BaseCalendar]:
+    """为快照中出现的每台设备选择工作日历。"""
+    shift_calendars = shift_calendars or {}
+    by_hours: Dict[float, BaseCalendar] = {}
+    calendars: Dict[int, BaseCalendar] = {}
+    for op in snapshot.ops:
+        if op.equipment_id not in calendars:
+            calendars[op.equipment_id] = calendar_for_equipment(snapshot, op.equipment_id, shift_calendars, by_hours)
+    return calendars
+
+
+class DispatchSimulation:
+    """
+    事件堆排程核心（非延迟派工）：
+    - 事件堆按时间处理两类事件：工序就绪（到达计划开工时刻且前道工序全部完工）、设备空闲；
+      同一时刻就绪的工序合并为一个事件（计划开工多为整点，可大幅缩小事件堆）
+    - 每台设备维护已就绪工序的小顶堆，设备空闲时取全局队列顺序（优先级 / 工单 / 工序顺序）最靠前者开工
+    - 同一工单内按 sequence 分段，前一段全部完工后后一段才就绪（sequence 相同的工序可并行）
+    每道工序只入堆 / 出堆常数次，总复杂度 O(n log n)。
+    snapshot.ops 必须按 queue_key 排序（load_snapshot 的顺序），同一工单的工序因此连续且按 sequence 升序。
+
+    setup=True 时计入换型：设备上一道工序与本道工序不同时，开工前先占用本道工序的准备时间。
+    setup_window 不为 None 时，若队首工序需要换型，而就绪队列中有与设备当前工序相同、
+    且优先级不比队首差 setup_window 档以上的工序，则先做该工序以省去换型。
+    """
+
+    RELEASE = 0
+    DISPATCH = 1  # 同一时刻先处理全部就绪事件，再做派工决策
+
+    def __init__(self, snapshot: PlanSnapshot, now: datetime,
+                 calendars: Optional[Dict[int, BaseCalendar]] = None,
+                 setup: bool = False, setup_window: Optional[int] = None):
+        self.snapshot = snapshot
+        self.ops = ops = snapshot.ops
+        self.calendars = calendars if calendars is not None else build_calendars(snapshot)
+        n = len(ops)
+        self.hours = [operation_hours(snapshot, op) for op in ops]
+        self.equipment = [op.equipment_id for op in ops]
+        self.base = [op.planned_start_date or now for op in ops]
+        # head[i]: 工序 i 所在分段的首个下标；size / next_head / remaining / stage_end 按分段首下标存放
+        head = [0] * n
+        size = [0] * n
+        next_head = [-1] * n
+        prev = None
+        for i, op in enumerate(ops):
+            if prev is not None and prev.work_order_id == op.work_order_id:
+                h = head[i - 1]
+                if prev.sequence != op.sequence:
+                    next_head[h] = h = i
+            else:
+                h = i
+            head[i] = h
+            size[h] += 1
+            prev = op
+        self.head = head
+        self.size = size
+        self.next_head = next_head
+        self.remaining = list(size)
+        self.stage_end: List[Optional[datetime]] = [None] * n
+        self.tasks: List[Optional[ScheduledTask]] = [None] * n
+        self.events: List[Tuple[datetime, int, int]] = []
+        self.arrivals: Dict[datetime, List[int]] = {}  # 就绪时刻 -> 该时刻就绪的工序
+        self.ready: Dict[int, List[int]] = {}
+        self.busy: Set[int] = set()  # 已有待处理派工事件的设备
+        self.decision: Dict[int, datetime] = {}  # 忙碌设备下一次派工决策的时刻
+        self.setup = setup
+        if setup:
+            self.setup_window = setup_window
+            self.setups = [setup_hours(snapshot, op) for op in ops]
+            self.operation = [op.operation_id for op in ops]
+            self.level = [queue_key(snapshot, op)[1] for op in ops]
+            self.taken = [False] * n  # 换型模式下工序同时在两个堆中，出堆采用惰性删除
+            self.by_operation: Dict[int, Dict[int, List[int]]] = {}  # 设备 -> 工序 -> 就绪小顶堆
+            self.last_operation: Dict[int, int] = {}  # 设备当前装夹的工序
+
+    def _is_first_stage(self, h: int) -> bool:
+        return h == 0 or self.ops[h - 1].work_order_id != self.ops[h].work_order_id
+
+    def _release_at(self, t: datetime, i: int) -> None:
+        batch = self.arrivals.get(t)
+        if batch is None:
+            self.arrivals[t] = [i]
+            self.events.append((t, self.RELEASE, 0))
+        else:
+            batch.append(i)
+
+    def _push_ready(self, e: int, i: int) -> None:
+        """换型模式：工序同时进入设备就绪队列与按工序分组的就绪队列。"""
+        heapq.heappush(self.ready[e], i)
+        queues = self.by_operation.setdefault(e, {})
+        queue = queues.get(self.operation[i])
+        if queue is None:
+            queues[self.operation[i]] = [i]
+        else:
+            heapq.heappush(queue, i)
+
+    def _take(self, e: int) -> int:
+        """换型模式：取设备 e 下一道开工的工序，没有就绪工序时返回 -1。"""
+        queue, taken = self.ready[e], self.taken
+        while queue and taken[queue[0]]:
+            heapq.heappop(queue)
+        if not queue:
+            return -1
+        i = queue[0]
+        current = self.last_operation.get(e)
+        if (self.setup_window is not None and current is not None
+                and self.operation[i] != current and self.setups[i] > 0):
+            same = self.by_operation[e].get(current)
+            while same and taken[same[0]]:
+                heapq.heappop(same)
+            if same and self.level[same[0]] <= self.level[i] + self.setup_window:
+                i = same[0]
+        taken[i] = True
+        return i
+
+    def start(self) -> None:
+        """从头排程：各工单首段工序在计划开工时刻（未设置时为排程基准时刻）就绪。"""
+        for h in range(len(self.ops)):
+            if self.head[h] == h and self._is_first_stage(h):
+                for j in range(h, h + self.size[h]):
+                    self._release_at(self.base[j], j)
+        heapq.heapify(self.events)
+
+    def resume(self, fixed: Dict[int, ScheduledTask], t0: datetime) -> None:
+        """
+        从 t0 继续排程：fixed 为派工时刻早于 t0、保持不变的任务（下标 -> 任务），
+        据此恢复 t0 时刻的设备占用、分段完工进度与就绪队列，其余工序重新排程。
+        """
+        tasks, head, remaining, stage_end = self.tasks, self.head, self.remaining, self.stage_end
+        free_at: Dict[int, datetime] = {}
+        for i, task in fixed.items():
+            tasks[i] = task
+            h = head[i]
+            remaining[h] -= 1
+            if stage_end[h] is None or task.end > stage_end[h]:
+                stage_end[h] = task.end
+            e = task.op.equipment_id
+            if e not in free_at or task.end > free_at[e]:
+                free_at[e] = task.end
+                if self.setup:
+                    self.last_operation[e] = task.op.operation_id
+            if self.setup:
+                self.taken[i] = True
+        for e, end in free_at.items():
+            if end >= t0:
+                self.busy.add(e)
+                self.decision[e] = end
+                self.ready.setdefault(e, [])
+                self.events.append((end, self.DISPATCH, e))
+        for h in range(len(self.ops)):
+            if self.head[h] != h:
+                continue
+            if self._is_first_stage(h):
+                previous_end = None
+            else:
+                ph = head[h - 1]
+                if remaining[ph]:
+                    continue  # 前一段尚未全部派工，由排程过程释放
+                previous_end = stage_end[ph]
+            for j in range(h, h + self.size[h]):
+                if tasks[j] is not None:
+                    continue
+                r = self.base[j] if previous_end is None or previous_end < self.base[j] else previous_end
+                if r < t0:
+                    self.ready.setdefault(self.ops[j].equipment_id, []).append(j)
+                else:
+                    self._release_at(r, j)
+        for e, queue in self.ready.items():
+            heapq.heapify(queue)
+            if self.setup:
+                queues = self.by_operation[e] = {}
+                for j in queue:
+                    queues.setdefault(self.operation[j], []).append(j)
+                for grouped in queues.values():
+                    heapq.heapify(grouped)
+            if queue and e not in self.busy:
+                self.busy.add(e)
+                self.decision[e] = t0
+                self.events.append((t0, self.DISPATCH, e))
+        heapq.heapify(self.events)
+
+    def run(self) -> List[ScheduledTask]:
+        """处理事件直到全部工序排完，返回与 snapshot.ops 对齐的任务列表。"""
+        ops, equipment, hours, base, tasks = self.ops, self.equipment, self.hours, self.base, self.tasks
+        head, size, next_head, remaining, stage_end = self.head, self.size, self.next_head, self.remaining, self.stage_end
+        events, arrivals, ready, busy = self.events, self.arrivals, self.ready, self.busy
+        slots = {e: calendar.slots for e, calendar in self.calendars.items()}
+        decision = self.decision
+        heappush, heappop = heapq.heappush, heapq.heappop
+        release, dispatch = self.RELEASE, self.DISPATCH
+        setup = self.setup
+        if setup:
+            push_ready, take = self._push_ready, self._take
+            setups, operation, last_operation = self.setups, self.operation, self.last_operation
+        while events:
+            t, kind, x = heappop(events)
+            if kind == release:
+                for j in arrivals.pop(t):
+                    e = equipment[j]
+                    queue = ready.get(e)
+                    if queue is None:
+                        queue = ready[e] = []
+                    if setup:
+                        push_ready(e, j)
+                    else:
+                        heappush(queue, j)
+                    if e not in busy:
+                        busy.add(e)
+                        decision[e] = t
+                        heappush(events, (t, dispatch, e))
+                continue
+            # 设备 x 空闲：开工就绪队列中最靠前的工序
+            if setup:
+                i = take(x)
+                if i < 0:
+                    busy.discard(x)
+                    continue
+                changeover = setups[i] if last_operation.get(x) != operation[i] else 0.0
+                last_operation[x] = operation[i]
+                start, end = slots[x](t, changeover + hours[i])
+                tasks[i] = ScheduledTask(ops[i], start, end, hours[i], t, changeover)
+            else:
+                queue = ready.get(x)
+                if not queue:
+                    busy.discard(x)
+                    continue
+                i = heappop(queue)
+                start, end = slots[x](t, hours[i])
+                tasks[i] = ScheduledTask(ops[i], start, end, hours[i], t)
+            decision[x] = end
+            heappush(events, (end, dispatch, x))
+            # 本段全部派工后，后一段在本段最晚完工时刻就绪
+            h = head[i]
+            if stage_end[h] is None or end > stage_end[h]:
+                stage_end[h] = end
+            remaining[h] -= 1
+            if not remaining[h]:
+                nh = next_head[h]
+                if nh >= 0:
+                    done = stage_end[h]
+                    for j in range(nh, nh + size[nh]):
+                        r = done if done > base[j] else base[j]
+                        e = equipment[j]
+                        if e in busy and decision[e] >= r:
+                            # 设备下一次决策不早于就绪时刻：直接进入就绪队列，省去一次事件
+                            if setup:
+                                push_ready(e, j)
+                            else:
+                                heappush(ready[e], j)
+                        else:
+                            batch = arrivals.get(r)
+                            if batch is None:
+                                arrivals[r] = [j]
+                                heappush(events, (r, release, 0))
+                            else:
+                                batch.append(j)
+        return tasks
+
+
+def compute_schedule(snapshot: PlanSnapshot, now: datetime,
+                     calendars: Optional[Dict[int, BaseCalendar]] = None) -> List[ScheduledTask]:
+    """
+    纯内存排程：同时满足设备能力（每台设备同一时刻只加工一道工序）与工单内工序顺序约束。
+    返回与 snapshot.ops 对齐的任务列表。
+    """
+    simulation = DispatchSimulation(snapshot, now, calendars)
+    simulation.start()
+    return simulation.run()
+
+
+def compute_setup_schedule(snapshot: PlanSnapshot, now: datetime,
+                           calendars: Optional[Dict[int, BaseCalendar]] = None,
+                           window: int = 0) -> Tuple[List[ScheduledTask], Dict[str, Any]]:
+    """
+    换型感知排程：工序切换时计入准备时间，并在 window 档优先级内优先做与设备当前工序相同的任务。
+    同时按原队列顺序（只计准备时间、不调整顺序）排一次作为基准，返回任务列表与换型统计。
+    snapshot.setup_times 需先由 load_setup_times 加载。
+    """
+    calendars = calendars if calendars is not None else build_calendars(snapshot)
+    baseline = DispatchSimulation(snapshot, now, calendars, setup=True)
+    baseline.start()
+    baseline_tasks = baseline.run()
+    simulation = DispatchSimulation(snapshot, now, calendars, setup=True, setup_window=window)
+    simulation.start()
+    tasks = simulation.run()
+    baseline_hours = sum(t.setup_hours for t in baseline_tasks)
+    total_hours = sum(t.setup_hours for t in tasks)
+    summary = {
+        "window": window,
+        "changeovers": sum(1 for t in tasks if t.setup_hours > 0),
+        "setup_hours": round(total_hours, 4),
+        "baseline_setup_hours": round(baseline_hours, 4),
+        "setup_hours_saved": round(baseline_hours - total_hours, 4),
+    }
+    return tasks, summary
+
+
+# build_response 的缓存项：(任务, 接口行, 占用工时, 交期预警)
+CachedRow = Tuple[ScheduledTask, Dict[str, Any], float, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class PlanState:
+    """一次排程的完整结果，供增量重排复用"""
+    version: int  # 对应的数据版本号
+    now: datetime
+    snapshot: PlanSnapshot
+    calendars: Dict[int, BaseCalendar]
+    tasks: List[ScheduledTask]  # 与 snapshot.ops 对齐
+    by_work_order: Dict[int, List[ScheduledTask]]
+    # 工单工序 id -> 已生成的接口数据，任务未变时直接复用
+    rows: Dict[int, CachedRow] = field(default_factory=dict)
+    # 设备时间轴索引（schedule_view 首次查询时构建）
+    timelines: Optional[Dict[int, Any]] = None
+    # 任务列式数组（schedule_analytics 首次分析时构建）
+    columns: Optional[Any] = None
+    # 设备空闲区间索引（promise 首次报价时构建）
+    free_time: Optional[Dict[int, Any]] = None
+
+
+def build_state(version: int, now: datetime, snapshot: PlanSnapshot,
+                calendars: Dict[int, BaseCalendar], tasks: List[ScheduledTask]) -> PlanState:
+    state = PlanState(version, now, snapshot, calendars, tasks, {})
+    for t in tasks:
+        state.by_work_order.setdefault(t.op.work_order_id, []).append(t)
+    return state
+
+
+def task_row(snapshot: PlanSnapshot, t: ScheduledTask) -> Dict[str, Any]:
+    """排程接口中的一条任务。"""
+    op = t.op
+    wo = snapshot.work_orders.get(op.work_order_id)
+    op_obj = snapshot.operations.get(op.operation_id)
+    eq_obj = snapshot.equipment.get(op.equipment_id)
+    return {
+        "work_order_id": op.work_order_id,
+        "work_order_code": wo.code if wo else None,
+        "operation_id": op.operation_id,
+        "operation_code": op_obj.code if op_obj else None,
+        "operation_name": op_obj.name if op_obj else None,
+        "work_order_operation_id": op.id,
+        "equipment_id": op.equipment_id,
+        "equipment_code": eq_obj.code if eq_obj else None,
+        "sequence": op.sequence,
+        "start": t.start.isoformat(),
+        "end": t.end.isoformat(),
+        "duration_hours": t.hours,
+        "setup_hours": t.setup_hours,
+        "planned_quantity": op.planned_quantity,
+        "remaining_quantity": op.remaining_quantity,
+    }
+
+
+def task_warning(snapshot: PlanSnapshot, t: ScheduledTask) -> Optional[Dict[str, Any]]:
+    """交期预警：任务结束时间晚于工单计划完工时间。"""
+    wo = snapshot.work_orders.get(t.op.work_order_id)
+    if wo and wo.planned_end_date and t.end > wo.planned_end_date:
+        return {
+            "work_order_id": wo.id,
+            "code": wo.code,
+            "planned_end_date": wo.planned_end_date.isoformat(),
+            "task_end": t.end.isoformat(),
+            "delay_hours": (t.end - wo.planned_end_date).total_seconds() / 3600
+        }
+    return None
+
+
+def build_response(snapshot: PlanSnapshot, tasks: List[ScheduledTask],
+                   rows: Optional[Dict[int, CachedRow]] = None) -> Dict[str, Any]:
+    """
+    生成排程接口的返回结构：tasks / loads / warnings。
+    传入 rows（PlanState.rows）时复用未变化任务已生成的接口行，并写入新生成的行。
+    """
+    task_rows: List[Dict[str, Any]] = []
+    loads: Dict[int, float] = {}
+    warnings: List[Dict[str, Any]] = []
+
+    for t in tasks:
+        cached = rows.get(t.op.id) if rows is not None else None
+        if cached is None or cached[0] is not t:
+            cached = (t, task_row(snapshot, t), (t.end - t.start).total_seconds() / 3600, task_warning(snapshot, t))
+            if rows is not None:
+                rows[t.op.id] = cached
+        _, row, hours, warning = cached
+        task_rows.append(row)
+        # 简单的负荷统计（每设备累计工时）
+        equip_id = t.op.equipment_id
+        loads[equip_id] = loads.get(equip_id, 0.0) + hours
+        if warning is not None:
+            warnings.append(warning)
+
+    return {"tasks": task_rows, "loads": loads, "warnings": warnings}
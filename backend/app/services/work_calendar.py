@@ -0,0 +1,390 @@
+"""
+工作日历运算
+
+- WorkdayIndex: 预计算的工作日序列（排除周末 / 节假日），二分查找第 N 个工作日
+- WorkCalendar: 每个工作日从 day_start 起提供 day_hours 工时，
+  按 “首段 + 整日块 + 余数” 直接算出完工时间，不再逐日循环
+- ShiftCalendar: 由班次主数据编译的可用时间区间数组，二分查找可用时刻 / 累加工时
+- DowntimeCalendar: 在已有日历上叠加设备停机时段（what-if 场景），任务不跨停机时段
+"""
+import logging
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.master import Shift
+
+logger = logging.getLogger(__name__)
+
+# 浮点误差容忍（小时），避免 0.1 + 0.2 一类的尾差多顺延一天
+HOURS_EPSILON = 1e-9
+
+
+class WorkdayIndex:
+    """工作日索引：按需向后扩展的工作日序号（date.toordinal）升序数组。"""
+
+    HORIZON_DAYS = 366
+
+    def __init__(self, workdays: Optional[Iterable[int]] = None, holidays: Iterable[date] = ()):
+        # workdays 使用 date.weekday() 编号：0=周一 ... 6=周日
+        self.workdays = frozenset(range(7) if workdays is None else workdays)
+        if not self.workdays:
+            raise ValueError("workdays must not be empty")
+        self.holidays = frozenset(d.toordinal() for d in holidays)
+        self.every_day = len(self.workdays) == 7 and not self.holidays
+        self._ordinals: List[int] = []
+        self._first = 0
+        self._last = -1  # 已覆盖的最后一天（含）
+
+    def is_workday(self, day: date) -> bool:
+        if self.every_day:
+            return True
+        return day.weekday() in self.workdays and day.toordinal() not in self.holidays
+
+    def _build(self, first: int) -> None:
+        self._ordinals = []
+        self._first = first
+        self._last = first - 1
+        self._extend()
+
+    def _extend(self) -> None:
+        # 生成新列表后整体替换，并发读取方持有的旧列表保持不变
+        start = self._last + 1
+        end = start + self.HORIZON_DAYS
+        added = [
+            ordinal for ordinal in range(start, end)
+            if (ordinal - 1) % 7 in self.workdays and ordinal not in self.holidays
+        ]
+        self._ordinals = self._ordinals + added
+        self._last = end - 1
+
+    def nth_after(self, day: date, n: int) -> date:
+        """返回 day 之后（不含 day）的第 n 个工作日，n >= 1。"""
+        if self.every_day:
+            return day + timedelta(days=n)
+        ordinal = day.toordinal()
+        if not self._ordinals or ordinal < self._first or ordinal - self._last > self.HORIZON_DAYS:
+            self._build(ordinal)
+        while ordinal >= self._last:
+            self._extend()
+        idx = bisect_right(self._ordinals, ordinal) + n - 1
+        while idx >= len(self._ordinals):
+            self._extend()
+        return date.fromordinal(self._ordinals[idx])
+
+
+class BaseCalendar:
+    """日历公共接口：next_available / add_hours。"""
+
+    def next_available(self, t: datetime) -> datetime:
+        raise NotImplementedError
+
+    def add_hours(self, start: datetime, hours: float) -> datetime:
+        raise NotImplementedError
+
+    def slots(self, start: datetime, hours: float) -> Tuple[datetime, datetime]:
+        """返回 (实际开工, 完工)。"""
+        start = self.next_available(start)
+        return start, self.add_hours(start, hours)
+
+
+class WorkCalendar(BaseCalendar):
+    """
+    有限能力日历：每个工作日从 day_start 起提供 day_hours 工时，跨日顺延。
+
+    与原逐日算法保持一致：首段从起点直接累加（不截到当日班次内），
+    之后每个整块从工作日的 day_start 开始；整块结束若跨过零点，下一块再顺延一天。
+    """
+
+    def __init__(self, day_hours: float = 8.0, day_start: time = time(8, 0),
+                 days: Optional[WorkdayIndex] = None):
+        if day_hours <= 0:
+            raise ValueError("day_hours must be positive")
+        self.day_hours = day_hours
+        self.day_start = day_start
+        self.days = days or WorkdayIndex()
+        start_hours = day_start.hour + day_start.minute / 60.0
+        # 一个整块工时占用的日历跨度（天）
+        self._stride = 1 + int((start_hours + day_hours) // 24)
+        self._day = timedelta(hours=day_hours)
+
+    def next_available(self, t: datetime) -> datetime:
+        """非工作日顺延到下一个工作日的 day_start；工作日内原样返回。"""
+        if self.days.every_day or self.days.is_workday(t.date()):
+            return t
+        return datetime.combine(self.days.nth_after(t.date(), 1), self.day_start)
+
+    def slots(self, start: datetime, hours: float) -> Tuple[datetime, datetime]:
+        # 排程热点路径：内联 next_available
+        if not self.days.every_day and not self.days.is_workday(start.date()):
+            start = datetime.combine(self.days.nth_after(start.date(), 1), self.day_start)
+        return start, self.add_hours(start, hours)
+
+    def add_hours(self, start: datetime, hours: float) -> datetime:
+        """从 start 起累计 hours 个工时后的完工时间，O(1)（节假日日历为 O(log n)）。"""
+        if hours <= 0:
+            return start
+        if hours <= self.day_hours:
+            # timedelta(0, 秒) 比 timedelta(hours=...) 快得多，排程时每道工序都会调用
+            return start + timedelta(0, hours * 3600)
+        end = start + self._day
+        remaining = hours - self.day_hours
+        if remaining <= HOURS_EPSILON:
+            return end
+        blocks = math.ceil(remaining / self.day_hours - HOURS_EPSILON)
+        last = remaining - (blocks - 1) * self.day_hours
+        if self.days.every_day:
+            return datetime.combine(end.date(), self.day_start) + timedelta(1 + (blocks - 1) * self._stride, last * 3600)
+        day = self.days.nth_after(end.date(), 1 + (blocks - 1) * self._stride)
+        return datetime.combine(day, self.day_start) + timedelta(0, last * 3600)
+
+
+def _hours(delta: timedelta) -> float:
+    return delta.total_seconds() / 3600
+
+
+class ShiftCalendar(BaseCalendar):
+    """
+    班次日历：把每日班次模板（结束时间 <= 开始时间视为跨夜班）展开成按时间排序、
+    互不重叠的可用区间数组 starts / ends，并维护区间前累计工时 cum，
+    “下一个可用时刻” 与 “累加 N 工时” 都是一次二分查找。
+    区间数组按需向后扩展，扩展时整体替换，读取无需加锁。
+    """
+
+    HORIZON_DAYS = 120
+    # 向前 / 向后补齐的最大跨度，超出则重新编译
+    MAX_SPAN = timedelta(days=3 * 366)
+
+    def __init__(self, shifts: Iterable[Tuple[time, time]], days: Optional[WorkdayIndex] = None):
+        pattern = []
+        for start, end in shifts:
+            s = start.hour + start.minute / 60.0
+            e = end.hour + end.minute / 60.0
+            if e <= s:
+                e += 24  # 跨夜班
+            pattern.append((s, e))
+        if not pattern:
+            raise ValueError("shift calendar needs at least one shift")
+        self._pattern = sorted(pattern)
+        self.days = days or WorkdayIndex()
+        # 每个工作日的可用工时（班次重叠部分只计一次）
+        covered, reach = 0.0, 0.0
+        for s, e in self._pattern:
+            if e > reach:
+                covered += e - max(s, reach)
+                reach = e
+        self.day_hours = covered
+        self._lock = threading.Lock()
+        # (starts, ends, cum, 首日, 末日)；cum 比区间多一项，cum[-1] 为总工时
+        self._arrays: Tuple[List[datetime], List[datetime], List[float], date, date] = (
+            [], [], [0.0], date.max, date.min
+        )
+
+    def __getstate__(self):
+        # 锁不可序列化（按车间并行排程时日历需传给子进程）
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _intervals(self, first: date, last: date) -> List[Tuple[datetime, datetime]]:
+        """展开 [first, last] 内各工作日的班次区间（未合并）。"""
+        result = []
+        day = first
+        while day <= last:
+            if self.days.is_workday(day):
+                midnight = datetime.combine(day, time(0, 0))
+                for s, e in self._pattern:
+                    result.append((midnight + timedelta(hours=s), midnight + timedelta(hours=e)))
+            day += timedelta(days=1)
+        return result
+
+    def _compile(self, first: date, last: date, base=None):
+        """把 [first, last] 的区间合并进 base（为 None 时重新编译）。"""
+        if base is None:
+            starts, ends, cum = [], [], [0.0]
+        else:
+            starts, ends, cum = list(base[0]), list(base[1]), list(base[2])
+        for s, e in sorted(self._intervals(first, last)):
+            if ends and s <= ends[-1]:
+                # 与上一区间重叠或相接：合并
+                if e > ends[-1]:
+                    cum[-1] += _hours(e - ends[-1])
+                    ends[-1] = e
+                continue
+            starts.append(s)
+            ends.append(e)
+            cum.append(cum[-1] + _hours(e - s))
+        return starts, ends, cum, first if base is None else base[3], last
+
+    def _ensure(self, t: datetime, hours: float = 0.0):
+        """保证区间数组覆盖 t 之后至少 hours 工时，返回 (starts, ends, cum, i)，i 为第一个结束晚于 t 的区间。"""
+        arrays = self._arrays
+        day = t.date()
+        while True:
+            starts, ends, cum, first, last = arrays
+            if first < day:
+                i = bisect_right(ends, t)
+                if i < len(ends) and cum[i] + max(_hours(t - starts[i]), 0.0) + hours <= cum[-1]:
+                    return starts, ends, cum, i
+            with self._lock:
+                if self._arrays is arrays:
+                    horizon = timedelta(days=self.HORIZON_DAYS)
+                    # 前一天的跨夜班可能覆盖 t，覆盖范围总是从 t 的前一天开始
+                    if first >= day:
+                        last = last if first - day <= self.MAX_SPAN else day + horizon
+                        arrays = self._compile(day - timedelta(days=1), last)
+                    elif day - last > self.MAX_SPAN:
+                        arrays = self._compile(day - timedelta(days=1), day + horizon)
+                    else:
+                        arrays = self._compile(last + timedelta(days=1), max(last, day) + horizon, arrays)
+                    self._arrays = arrays
+                else:
+                    arrays = self._arrays
+
+    def next_available(self, t: datetime) -> datetime:
+        starts, _, _, i = self._ensure(t)
+        return max(t, starts[i])
+
+    def add_hours(self, start: datetime, hours: float) -> datetime:
+        if hours <= 0:
+            return start
+        starts, _, cum, i = self._ensure(start, hours)
+        t = max(start, starts[i])
+        target = cum[i] + _hours(t - starts[i]) + hours
+        # 最后一个 cum[j] < target 的区间即完工所在区间
+        j = bisect_left(cum, target, i + 1) - 1
+        return starts[j] + timedelta(0, (target - cum[j]) * 3600)
+
+
+class DowntimeCalendar(BaseCalendar):
+    """
+    停机日历：在 base 日历上排除停机时段 [start, end)。
+    任务不可中断：开工后若会与停机时段重叠，则整体顺延到该停机时段结束后再开工。
+    """
+
+    def __init__(self, base: BaseCalendar, windows: Iterable[Tuple[datetime, datetime]]):
+        self.base = base
+        merged: List[Tuple[datetime, datetime]] = []
+        for s, e in sorted(w for w in windows if w[1] > w[0]):
+            if merged and s <= merged[-1][1]:
+                if e > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], e)
+            else:
+                merged.append((s, e))
+        self._starts = [s for s, _ in merged]
+        self._ends = [e for _, e in merged]
+
+    @property
+    def day_hours(self) -> Optional[float]:
+        return getattr(self.base, "day_hours", None)
+
+    def next_available(self, t: datetime) -> datetime:
+        while True:
+            t = self.base.next_available(t)
+            i = bisect_right(self._starts, t) - 1
+            if i < 0 or t >= self._ends[i]:
+                return t
+            t = self._ends[i]
+
+    def add_hours(self, start: datetime, hours: float) -> datetime:
+        return self.slots(start, hours)[1]
+
+    def slots(self, start: datetime, hours: float) -> Tuple[datetime, datetime]:
+        while True:
+            start = self.next_available(start)
+            end = self.base.add_hours(start, hours)
+            # 第一个开始于 start 之后的停机时段早于完工：顺延到该时段结束
+            i = bisect_right(self._starts, start)
+            if i >= len(self._starts) or self._starts[i] >= end:
+                return start, end
+            start = self._ends[i]
+
+
+_default_days: Optional[WorkdayIndex] = None
+
+
+def default_workdays() -> WorkdayIndex:
+    """按配置（schedule_workdays / schedule_holidays）构建的全厂工作日索引。"""
+    global _default_days
+    if _default_days is None:
+        _default_days = WorkdayIndex(settings.schedule_workday_list, settings.schedule_holiday_list)
+    return _default_days
+
+
+def calendar_for_capacity(day_hours: float) -> WorkCalendar:
+    """按配置的每日开工时间和全厂工作日构建日历。"""
+    return WorkCalendar(day_hours, settings.schedule_day_start_time, default_workdays())
+
+
+def parse_hhmm(value: str) -> time:
+    """解析班次时间 "HH:MM"（可带秒）；24:00 视为 00:00。"""
+    hour, minute = value.strip().split(":")[:2]
+    return time(int(hour) % 24, int(minute))
+
+
+def compile_shift_calendars(db: Session) -> Dict[Optional[int], ShiftCalendar]:
+    """按车间编译启用班次的日历；workshop_id 为空的班次作为全厂日历（键 None）。"""
+    grouped: Dict[Optional[int], List[Tuple[time, time]]] = {}
+    for code, start_time, end_time, workshop_id in (
+        db.query(Shift.code, Shift.start_time, Shift.end_time, Shift.workshop_id)
+        .filter(Shift.active == 1)
+        .all()
+    ):
+        try:
+            grouped.setdefault(workshop_id, []).append((parse_hhmm(start_time), parse_hhmm(end_time)))
+        except (AttributeError, ValueError):
+            logger.warning(f"班次时间格式无效，已忽略: {code} {start_time}-{end_time}")
+    days = default_workdays()
+    return {workshop_id: ShiftCalendar(shifts, days) for workshop_id, shifts in grouped.items()}
+
+
+def shift_calendars_by_code(db: Session) -> Dict[str, ShiftCalendar]:
+    """按班次编码编译单个班次的日历（人员按 shift_code 上班）。"""
+    calendars: Dict[str, ShiftCalendar] = {}
+    days = default_workdays()
+    for code, start_time, end_time in (
+        db.query(Shift.code, Shift.start_time, Shift.end_time).filter(Shift.active == 1).all()
+    ):
+        try:
+            calendars[code] = ShiftCalendar([(parse_hhmm(start_time), parse_hhmm(end_time))], days)
+        except (AttributeError, ValueError):
+            logger.warning(f"班次时间格式无效，已忽略: {code} {start_time}-{end_time}")
+    return calendars
+
+
+# 班次日历缓存：编译一次，班次增删改时失效
+_shift_calendars: Optional[Dict[Optional[int], ShiftCalendar]] = None
+_shift_generation = 0
+_shift_lock = threading.Lock()
+
+
+def get_shift_calendars(db: Session) -> Dict[Optional[int], ShiftCalendar]:
+    """返回缓存的班次日历，缓存失效时重新编译。"""
+    global _shift_calendars
+    with _shift_lock:
+        if _shift_calendars is not None:
+            return _shift_calendars
+        generation = _shift_generation
+    compiled = compile_shift_calendars(db)
+    with _shift_lock:
+        # 编译期间若班次又被修改，本次结果只用于当前排程，不写入缓存
+        if generation == _shift_generation:
+            _shift_calendars = compiled
+    return compiled
+
+
+def invalidate_shift_calendars() -> None:
+    """班次创建 / 更新 / 删除后调用。"""
+    global _shift_calendars, _shift_generation
+    with _shift_lock:
+        _shift_calendars = None
+        _shift_generation += 1
@@ -0,0 +1,481 @@
+"""
+报工写入
+
+报工累加的数量与状态流转全部用服务端原子更新完成（UPDATE ... SET x = x + :q），
+完工判断写在同一条语句里（SET 中的列引用的是更新前的值），不先读出再写回：
+多台扫码枪同时对同一工单报工时不会丢失数量，也省去了读取工单 / 工单工序的查询。
+
+批量报工（apply_work_reports）一次查询加载涉及的工单 / 工单工序 / 在制品，在内存中按顺序推演，
+再用 executemany 一次写回，结果与逐条报工相同；数量仍以增量原子累加。
+
+幂等键：报工可带客户端生成的 idempotency_key（唯一索引），重复提交返回原报工、不再累加数量；
+最近提交的键在进程内 LRU 中记下报工 id，重放时按主键取回，不必查键索引。
+
+扫码报工的在制品定位走 (工单, 工序, 条码) 复合索引；活跃条码另有可选的进程内 LRU
+（(工单, 工单工序, 条码) -> (工序, 在制品 id)），命中时省去工序与在制品两次查询。
+本进程写在制品时按条码失效；其他进程删除或改动了缓存的行时，按 id + 条码的更新匹配不到行，丢弃缓存后重新查询。
+
+完工 / 报废报工同时累加到产量汇总表（production_rollups，见 production_rollups 模块），同一事务提交。
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, case, func, insert, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.workorder import WorkOrder, WorkOrderOperation, WorkReport, WIPTracking
+from app.schemas.workorder import WorkReportCreate
+from app.services.oee import KIND_CODES as OEE_REPORT_TYPES, close_cutoff, invalidate_periods
+from app.services.production_rollups import ROLLUP_REPORT_TYPES, add_to_bucket, apply_rollups, bucket_key
+
+# 报工类型 -> 工单状态流转 (原状态, 新状态)
+WORK_ORDER_TRANSITIONS = {
+    "start": ("released", "in_progress"),
+    "pause": ("in_progress", "paused"),
+    "resume": ("paused", "in_progress"),
+}
+# 报工类型 -> 工单工序状态流转 (原状态, 新状态)；原状态为 None 表示无条件
+OPERATION_TRANSITIONS = {
+    "start": (None, "in_progress"),
+    "pause": ("in_progress", "paused"),
+    "resume": ("paused", "in_progress"),
+}
+
+
+_recent_lock = threading.Lock()
+_recent_keys: "OrderedDict[str, int]" = OrderedDict()  # 幂等键 -> 报工 id
+
+
+def remember_keys(reports: Iterable[Optional[WorkReport]]) -> None:
+    """
+    记下报工的幂等键（报工已写入、id 已分配）。
+    查找时会核对取回的报工的键，事务最终回滚留下的条目只会退回到索引查询。
+    """
+    with _recent_lock:
+        for report in reports:
+            if report is not None and report.idempotency_key:
+                _recent_keys[report.idempotency_key] = report.id
+                _recent_keys.move_to_end(report.idempotency_key)
+        while len(_recent_keys) > settings.work_report_idempotency_cache:
+            _recent_keys.popitem(last=False)
+
+
+def find_reports_by_key(db: Session, keys: Iterable[str]) -> Dict[str, WorkReport]:
+    """已存在的幂等键 -> 报工：LRU 命中的按主键取回，其余按唯一索引一次查询。"""
+    keys = set(keys)
+    if not keys:
+        return {}
+    with _recent_lock:
+        cached = {key: _recent_keys[key] for key in keys if key in _recent_keys}
+        for key in cached:
+            _recent_keys.move_to_end(key)
+    found: Dict[str, WorkReport] = {}
+    for key, report_id in cached.items():
+        report = db.get(WorkReport, report_id)
+        if report is not None and report.idempotency_key == key:
+            found[key] = report
+    missing = keys - found.keys()
+    if missing:
+        for report in db.query(WorkReport).filter(WorkReport.idempotency_key.in_(missing)):
+            found[report.idempotency_key] = report
+    return found
+
+
+WipKey = Tuple[int, int, str]  # (工单, 工单工序, 条码)
+
+_wip_lock = threading.Lock()
+_wip_ids: "OrderedDict[WipKey, Tuple[int, int]]" = OrderedDict()  # -> (工序, 在制品 id)
+_wip_keys_by_barcode: Dict[str, Set[WipKey]] = {}
+
+
+def _cached_wip(key: WipKey) -> Optional[Tuple[int, int]]:
+    with _wip_lock:
+        value = _wip_ids.get(key)
+        if value is not None:
+            _wip_ids.move_to_end(key)
+        return value
+
+
+def _cache_wip(key: WipKey, operation_id: int, wip_id: int) -> None:
+    if settings.wip_barcode_cache <= 0:
+        return
+    with _wip_lock:
+        _wip_ids[key] = (operation_id, wip_id)
+        _wip_ids.move_to_end(key)
+        _wip_keys_by_barcode.setdefault(key[2], set()).add(key)
+        while len(_wip_ids) > settings.wip_barcode_cache:
+            old, _ = _wip_ids.popitem(last=False)
+            keys = _wip_keys_by_barcode.get(old[2])
+            if keys is not None:
+                keys.discard(old)
+                if not keys:
+                    del _wip_keys_by_barcode[old[2]]
+
+
+def invalidate_wip_barcodes(barcodes: Iterable[Optional[str]]) -> None:
+    """在制品新增 / 修改 / 删除后，去掉这些条码（批次号）的缓存。"""
+    with _wip_lock:
+        for barcode in barcodes:
+            for key in _wip_keys_by_barcode.pop(barcode, ()):
+                _wip_ids.pop(key, None)
+
+
+def _transition(column, transition):
+    source, target = transition
+    if source is None:
+        return target
+    return case((column == source, target), else_=column)
+
+
+def _execute(db: Session, stmt) -> int:
+    """执行批量更新（不同步会话中已加载的对象），返回匹配行数。"""
+    return db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def _update_work_order(db: Session, report: WorkReportCreate, qty: float, now: datetime) -> bool:
+    """累加工单数量并按报工类型流转状态；工单不存在时返回 False。"""
+    values = {}
+    if report.report_type == "complete":
+        values["completed_quantity"] = func.coalesce(WorkOrder.completed_quantity, 0) + qty
+    elif report.report_type == "scrap":
+        values["scrapped_quantity"] = func.coalesce(WorkOrder.scrapped_quantity, 0) + qty
+    transition = WORK_ORDER_TRANSITIONS.get(report.report_type)
+    if transition:
+        values["status"] = _transition(WorkOrder.status, transition)
+    if report.report_type == "start":
+        values["actual_start_date"] = case(
+            (WorkOrder.status == "released", func.coalesce(WorkOrder.actual_start_date, now)),
+            else_=WorkOrder.actual_start_date,
+        )
+    if not values:
+        return db.query(WorkOrder.id).filter(WorkOrder.id == report.work_order_id).first() is not None
+    return _execute(db, update(WorkOrder).where(WorkOrder.id == report.work_order_id).values(values)) > 0
+
+
+def _update_operation(db: Session, report: WorkReportCreate, qty: float, now: datetime) -> bool:
+    """累加工单工序数量并流转状态，完工判断与累加在同一条语句中；工单工序不存在时返回 False。"""
+    values = {}
+    if report.report_type == "complete":
+        completed = func.coalesce(WorkOrderOperation.completed_quantity, 0) + qty
+        done = completed >= WorkOrderOperation.planned_quantity
+        values["completed_quantity"] = completed
+        values["status"] = case((done, "completed"), else_=WorkOrderOperation.status)
+        values["actual_end_date"] = case((done, now), else_=WorkOrderOperation.actual_end_date)
+    elif report.report_type == "scrap":
+        values["scrapped_quantity"] = func.coalesce(WorkOrderOperation.scrapped_quantity, 0) + qty
+    transition = OPERATION_TRANSITIONS.get(report.report_type)
+    if transition:
+        values["status"] = _transition(WorkOrderOperation.status, transition)
+    if report.report_type == "start":
+        values["actual_start_date"] = func.coalesce(WorkOrderOperation.actual_start_date, now)
+    op_filter = WorkOrderOperation.id == report.work_order_operation_id
+    if not values:
+        return db.query(WorkOrderOperation.id).filter(op_filter).first() is not None
+    return _execute(db, update(WorkOrderOperation).where(op_filter).values(values)) > 0
+
+
+def _find_wip(db: Session, report: WorkReportCreate) -> Tuple[Optional[int], Optional[int]]:
+    """(工序 id, 该工单工序下条码对应的第一条在制品 id)。"""
+    operation_id = (
+        db.query(WorkOrderOperation.operation_id)
+        .filter(WorkOrderOperation.id == report.work_order_operation_id)
+        .scalar()
+    )
+    wip_id = (
+        db.query(WIPTracking.id)
+        .filter(
+            WIPTracking.work_order_id == report.work_order_id,
+            WIPTracking.operation_id == operation_id,
+            WIPTracking.batch_number == report.barcode,
+        )
+        .order_by(WIPTracking.id.asc())
+        .limit(1)
+        .scalar()
+    )
+    return operation_id, wip_id
+
+
+def _update_wip(db: Session, report: WorkReportCreate, qty: float, use_cache: bool = True) -> None:
+    """按条码同步在制品：开工累加在制数量，完工 / 报废扣减，扣完删除。"""
+    key = (report.work_order_id, report.work_order_operation_id, report.barcode)
+    cached = _cached_wip(key) if use_cache else None
+    if cached is not None:
+        operation_id, wip_id = cached
+    else:
+        operation_id, wip_id = _find_wip(db, report)
+        if wip_id is not None:
+            _cache_wip(key, operation_id, wip_id)
+    # 带上条码条件：缓存的行已被删除或改了条码时匹配不到，重新查询
+    row_filter = (
+        WIPTracking.id == wip_id,
+        WIPTracking.work_order_id == report.work_order_id,
+        WIPTracking.operation_id == operation_id,
+        WIPTracking.batch_number == report.barcode,
+    )
+    if report.report_type == "start":
+        # 开工：将条码视为一批在制品，累加数量
+        if wip_id is not None:
+            updated = _execute(db, update(WIPTracking).where(*row_filter)
+                               .values(quantity=func.coalesce(WIPTracking.quantity, 0) + qty, status="wip"))
+            if not updated and cached is not None:
+                invalidate_wip_barcodes([report.barcode])
+                _update_wip(db, report, qty, use_cache=False)
+        else:
+            product_id = db.query(WorkOrder.product_id).filter(WorkOrder.id == report.work_order_id).scalar()
+            db.add(WIPTracking(
+                work_order_id=report.work_order_id,
+                operation_id=operation_id,
+                material_id=product_id,
+                batch_number=report.barcode,
+                # 为了演示方便，序列号也填同一个条码，便于两种方式追溯
+                serial_number=report.barcode,
+                quantity=qty,
+                status="wip",
+                operator_id=report.operator_id,
+                equipment_id=report.equipment_id,
+            ))
+            invalidate_wip_barcodes([report.barcode])
+    elif report.report_type in ("complete", "scrap") and wip_id is not None:
+        # 完工 / 报废：从在制数量中扣减，没有剩余则删掉 WIP 记录
+        updated = _execute(db, update(WIPTracking).where(*row_filter)
+                           .values(quantity=func.coalesce(WIPTracking.quantity, 0) - qty, status="wip"))
+        if not updated:
+            if cached is not None:
+                invalidate_wip_barcodes([report.barcode])
+                _update_wip(db, report, qty, use_cache=False)
+            return
+        deleted = db.query(WIPTracking).filter(WIPTracking.id == wip_id, WIPTracking.quantity <= 0) \
+            .delete(synchronize_session=False)
+        if deleted:
+            invalidate_wip_barcodes([report.barcode])
+
+
+def apply_work_report(db: Session, report: WorkReportCreate) -> Optional[WorkReport]:
+    """
+    在当前事务中写入一条报工并更新工单 / 工单工序 / 在制品（不提交）。
+    先更新工单（同时校验存在），写事务从第一条语句起持有写锁；工单不存在时返回 None。
+    """
+    now = datetime.now()
+    qty = report.quantity or 0
+    if not _update_work_order(db, report, qty, now):
+        return None
+    op_found = bool(report.work_order_operation_id) and _update_operation(db, report, qty, now)
+    # 同步 WIP 跟踪（按条码），仅在有工单工序且有条码时生效
+    if report.barcode and op_found and qty > 0:
+        _update_wip(db, report, qty)
+
+    report_data = report.model_dump()
+    if not report_data.get("report_time"):
+        report_data["report_time"] = now
+    if report.report_type in ROLLUP_REPORT_TYPES:
+        operation = (
+            db.query(WorkOrderOperation.operation_id, WorkOrderOperation.equipment_id)
+            .filter(WorkOrderOperation.id == report.work_order_operation_id)
+            .first()
+        ) if op_found else None
+        key = bucket_key(report_data["report_time"], report.equipment_id or (operation and operation.equipment_id),
+                         report.shift_id, operation and operation.operation_id, report.work_order_id)
+        deltas = {}
+        add_to_bucket(deltas, key, report.report_type, qty)
+        apply_rollups(db, deltas)
+    if report.report_type in OEE_REPORT_TYPES and report_data["report_time"] < close_cutoff(now):
+        # 迟到的报工：已关闭时段的 OEE 缓存作废（实时报工不多一次查询）
+        equipment_id = report.equipment_id or (op_found and db.query(WorkOrderOperation.equipment_id).filter(
+            WorkOrderOperation.id == report.work_order_operation_id).scalar())
+        invalidate_periods(db, {equipment_id: report_data["report_time"]})
+    db_report = WorkReport(**report_data)
+    db.add(db_report)
+    return db_report
+
+
+def _next_status(status: Optional[str], transition: Tuple[Optional[str], str]) -> Optional[str]:
+    source, target = transition
+    return target if source is None or status == source else status
+
+
+def _bulk_update(db: Session, table, rows: List[Dict[str, Any]], values: Dict[str, Any]) -> None:
+    """按主键 b_id 批量更新（一次 executemany）。"""
+    if rows:
+        db.execute(update(table).where(table.c.id == bindparam("b_id")).values(values), rows)
+
+
+def apply_work_reports(db: Session, reports: Sequence[WorkReportCreate]) -> Tuple[List[Optional[WorkReport]], Set[int]]:
+    """
+    在当前事务中按顺序写入一批报工（不提交），结果与逐条报工相同。
+    涉及的工单 / 工单工序 / 在制品各一次查询加载（支持的数据库上加行锁），内存中按顺序推演后：
+    工单与工单工序各一次 executemany 写回，数量写成增量（x = x + :delta），与同时进行的单条报工不冲突；
+    在制品批量更新 / 删除 / 新增，报工记录批量插入。
+    幂等键已存在（或在本批中先出现过）的报工不再写入，返回原报工。
+    返回 (与 reports 对齐的报工列表，工单不存在的为 None；重放的下标集合)。
+    """
+    now = datetime.now()
+    existing = find_reports_by_key(db, (r.idempotency_key for r in reports if r.idempotency_key))
+    first_index: Dict[str, int] = {}  # 本批中首次写入的幂等键 -> 下标
+    replayed: Set[int] = set()
+    wo_ids = {r.work_order_id for r in reports}
+    op_ids = {r.work_order_operation_id for r in reports if r.work_order_operation_id}
+    orders = {
+        row.id: {"status": row.status, "actual_start_date": row.actual_start_date, "product_id": row.product_id,
+                 "completed": 0.0, "scrapped": 0.0, "dirty": False}
+        for row in db.query(WorkOrder.id, WorkOrder.status, WorkOrder.actual_start_date, WorkOrder.product_id)
+        .filter(WorkOrder.id.in_(wo_ids)).with_for_update()
+    }
+    ops = {
+        row.id: {"status": row.status, "operation_id": row.operation_id, "equipment_id": row.equipment_id,
+                 "planned": row.planned_quantity,
+                 "base": row.completed_quantity or 0, "completed": 0.0, "scrapped": 0.0,
+                 "actual_start_date": row.actual_start_date, "actual_end_date": row.actual_end_date,
+                 "dirty": False}
+        for row in db.query(
+            WorkOrderOperation.id, WorkOrderOperation.status, WorkOrderOperation.operation_id,
+            WorkOrderOperation.equipment_id, WorkOrderOperation.planned_quantity, WorkOrderOperation.completed_quantity,
+            WorkOrderOperation.actual_start_date, WorkOrderOperation.actual_end_date,
+        ).filter(WorkOrderOperation.id.in_(op_ids)).with_for_update()
+    } if op_ids else {}
+
+    # 在制品：(工单, 工序, 条码) -> 按 id 排序的行，逐条报工时取其中第一条未删除的行
+    barcodes = {r.barcode for r in reports if r.barcode}
+    wips: Dict[Tuple[int, int, str], List[Dict[str, Any]]] = {}
+    if barcodes and ops:
+        for row in (
+            db.query(WIPTracking.id, WIPTracking.work_order_id, WIPTracking.operation_id,
+                     WIPTracking.batch_number, WIPTracking.quantity)
+            .filter(WIPTracking.work_order_id.in_(wo_ids), WIPTracking.batch_number.in_(barcodes))
+            .order_by(WIPTracking.id.asc()).with_for_update()
+        ):
+            wips.setdefault((row.work_order_id, row.operation_id, row.batch_number), []).append(
+                {"id": row.id, "quantity": row.quantity, "base": row.quantity or 0, "deleted": False, "dirty": False})
+
+    results: List[Any] = []  # 新报工为待插入的行，重放为已有报工或本批中的下标，失败为 None
+    rollups: Dict[Any, List[float]] = {}
+    late: Dict[int, datetime] = {}  # 迟到报工的设备 -> 最早报工时间
+    cutoff = close_cutoff(now)
+    for index, report in enumerate(reports):
+        key = report.idempotency_key
+        if key in existing:
+            results.append(existing[key])
+            replayed.add(index)
+            continue
+        if key in first_index:
+            results.append(first_index[key])
+            replayed.add(index)
+            continue
+        wo = orders.get(report.work_order_id)
+        if wo is None:
+            results.append(None)
+            continue
+        qty = report.quantity or 0
+        kind = report.report_type
+        if kind == "complete":
+            wo["completed"] += qty
+        elif kind == "scrap":
+            wo["scrapped"] += qty
+        if kind in WORK_ORDER_TRANSITIONS:
+            if kind == "start" and wo["status"] == "released" and wo["actual_start_date"] is None:
+                wo["actual_start_date"] = now
+            wo["status"] = _next_status(wo["status"], WORK_ORDER_TRANSITIONS[kind])
+        if kind in ("complete", "scrap") or kind in WORK_ORDER_TRANSITIONS:
+            wo["dirty"] = True
+
+        op = ops.get(report.work_order_operation_id) if report.work_order_operation_id else None
+        if op is not None:
+            if kind == "complete":
+                op["completed"] += qty
+                planned = op["planned"]
+                if planned is not None and op["base"] + op["completed"] >= planned:
+                    op["status"], op["actual_end_date"] = "completed", now
+            elif kind == "scrap":
+                op["scrapped"] += qty
+            if kind in OPERATION_TRANSITIONS:
+                op["status"] = _next_status(op["status"], OPERATION_TRANSITIONS[kind])
+            if kind == "start" and op["actual_start_date"] is None:
+                op["actual_start_date"] = now
+            if kind in ("complete", "scrap") or kind in OPERATION_TRANSITIONS:
+                op["dirty"] = True
+
+            if report.barcode and qty > 0 and kind in ("start", "complete", "scrap"):
+                rows = wips.setdefault((report.work_order_id, op["operation_id"], report.barcode), [])
+                first = next((w for w in rows if not w["deleted"]), None)
+                if kind == "start" and first is None:
+                    rows.append({"id": None, "quantity": qty, "deleted": False, "dirty": True, "new": {
+                        "work_order_id": report.work_order_id, "operation_id": op["operation_id"],
+                        "material_id": wo["product_id"], "batch_number": report.barcode,
+                        "serial_number": report.barcode, "quantity": qty, "status": "wip",
+                        "operator_id": report.operator_id, "equipment_id": report.equipment_id,
+                    }})
+                elif first is not None:
+                    first["quantity"] = (first["quantity"] or 0) + (qty if kind == "start" else -qty)
+                    first["dirty"] = True
+                    if kind != "start" and first["quantity"] <= 0:
+                        first["deleted"] = True
+
+        report_data = report.model_dump()
+        if not report_data.get("report_time"):
+            report_data["report_time"] = now
+        if kind in ROLLUP_REPORT_TYPES:
+            bucket = bucket_key(report_data["report_time"], report.equipment_id or (op and op["equipment_id"]),
+                                report.shift_id, op and op["operation_id"], report.work_order_id)
+            add_to_bucket(rollups, bucket, kind, qty)
+        if kind in OEE_REPORT_TYPES and report_data["report_time"] < cutoff:
+            equipment_id = report.equipment_id or (op and op["equipment_id"])
+            if equipment_id:
+                late[equipment_id] = min(late.get(equipment_id, report_data["report_time"]), report_data["report_time"])
+        if key:
+            first_index[key] = index
+        results.append(report_data)
+
+    wo_table, op_table, wip_table = WorkOrder.__table__, WorkOrderOperation.__table__, WIPTracking.__table__
+    _bulk_update(db, wo_table, [
+        {"b_id": wo_id, "b_completed": wo["completed"], "b_scrapped": wo["scrapped"],
+         "b_status": wo["status"], "b_actual_start_date": wo["actual_start_date"]}
+        for wo_id, wo in orders.items() if wo["dirty"]
+    ], {
+        "completed_quantity": func.coalesce(wo_table.c.completed_quantity, 0) + bindparam("b_completed"),
+        "scrapped_quantity": func.coalesce(wo_table.c.scrapped_quantity, 0) + bindparam("b_scrapped"),
+        "status": bindparam("b_status"),
+        "actual_start_date": bindparam("b_actual_start_date"),
+    })
+    _bulk_update(db, op_table, [
+        {"b_id": op_id, "b_completed": op["completed"], "b_scrapped": op["scrapped"], "b_status": op["status"],
+         "b_actual_start_date": op["actual_start_date"], "b_actual_end_date": op["actual_end_date"]}
+        for op_id, op in ops.items() if op["dirty"]
+    ], {
+        "completed_quantity": func.coalesce(op_table.c.completed_quantity, 0) + bindparam("b_completed"),
+        "scrapped_quantity": func.coalesce(op_table.c.scrapped_quantity, 0) + bindparam("b_scrapped"),
+        "status": bindparam("b_status"),
+        "actual_start_date": bindparam("b_actual_start_date"),
+        "actual_end_date": bindparam("b_actual_end_date"),
+    })
+
+    wip_rows = [w for rows in wips.values() for w in rows if w["dirty"]]
+    _bulk_update(db, wip_table, [
+        {"b_id": w["id"], "b_delta": w["quantity"] - w["base"]}
+        for w in wip_rows if w["id"] is not None and not w["deleted"]
+    ], {"quantity": func.coalesce(wip_table.c.quantity, 0) + bindparam("b_delta"), "status": "wip"})
+    deleted = [w["id"] for w in wip_rows if w["id"] is not None and w["deleted"]]
+    if deleted:
+        db.execute(wip_table.delete().where(wip_table.c.id.in_(deleted)))
+    created = [{**w["new"], "quantity": w["quantity"]} for w in wip_rows if w["id"] is None and not w["deleted"]]
+    if created:
+        db.execute(insert(WIPTracking).execution_options(render_nulls=True), created)
+    if deleted or created:
+        invalidate_wip_barcodes({barcode for (_, _, barcode), rows in wips.items()
+                                 if any(w["dirty"] and (w["deleted"] or w["id"] is None) for w in rows)})
+
+    apply_rollups(db, rollups)
+    invalidate_periods(db, late)
+
+    # 报工记录一次批量插入（render_nulls：含空值的行不按空值列拆分成多条语句）；
+    # 同一写事务中自增主键按插入顺序递增，排序后即与参数顺序对应（要求 RETURNING 按参数顺序返回时 SQLite 会逐条插入）
+    rows = [r for r in results if isinstance(r, dict)]
+    if rows:
+        stmt = insert(WorkReport).returning(WorkReport.id).execution_options(render_nulls=True)
+        ids = sorted(db.execute(stmt, rows).scalars())
+        by_id = {r.id: r for r in db.query(WorkReport).filter(WorkReport.id.in_(ids))}
+        created = iter(ids)
+        results = [by_id[next(created)] if isinstance(r, dict) else r for r in results]
+    # 本批中重复的幂等键指向首次出现时写入的报工
+    return [results[r] if isinstance(r, int) else r for r in results], replayed
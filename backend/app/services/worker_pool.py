@@ -0,0 +1,124 @@
+"""
+排程计算用的常驻进程池（What-if 场景、排程优化、按车间并行排程共用）
+
+- 以 spawn 方式启动：不从多线程的服务进程 fork，避免子进程继承其他线程持有的锁
+- 排程输入（快照、设备日历等）每个版本只序列化一次，写入共享内存（multiprocessing.shared_memory）；
+  子进程第一次用到某个版本时从共享内存反序列化并缓存，此后提交的任务只带版本引用与各自的参数
+- 输入可分为若干部分（如按车间的分区）分别序列化，子进程只加载自己用到的部分
+- 版本键由调用方给出（如排程缓存的数据版本）；没有版本键时每次调用单独发布
+"""
+import atexit
+import itertools
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple
+
+# 子进程中缓存的版本数（并发调用可能交替使用相邻两个版本）
+WORKER_CACHE_SIZE = 2
+
+
+class SharedInputs(NamedTuple):
+    """子进程读取排程输入用的引用：共享内存名与各部分的序列化结束位置。"""
+    name: str
+    ends: Tuple[int, ...]
+
+
+@dataclass
+class _Segment:
+    shm: shared_memory.SharedMemory
+    ends: Tuple[int, ...]
+    users: int = 0
+
+
+class WorkerPool:
+    """常驻 spawn 进程池，以及按版本键发布到共享内存的排程输入。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._workers = 0
+        self._segments: Dict[Hashable, _Segment] = {}
+        self._latest: Optional[Hashable] = None
+        self._tokens = itertools.count(1)
+        atexit.register(self.close)
+
+    def executor(self, workers: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+                self._workers = workers
+            return self._executor
+
+    @contextmanager
+    def shared(self, key: Optional[Hashable], build: Callable[[], List[Any]]) -> Iterator[SharedInputs]:
+        """
+        发布 key 对应的排程输入（build 返回各部分；同一 key 只调用 build 并序列化一次），返回子进程读取用的引用。
+        最新版本在调用结束后保留以供复用；被新版本取代且无人使用的共享内存随即释放。
+        """
+        if key is None:
+            key = ("call", next(self._tokens))
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is None:
+                parts = [pickle.dumps(part, pickle.HIGHEST_PROTOCOL) for part in build()]
+                ends = tuple(itertools.accumulate(len(data) for data in parts))
+                shm = shared_memory.SharedMemory(create=True, size=max(ends[-1] if ends else 0, 1))
+                for data, end in zip(parts, ends):
+                    shm.buf[end - len(data):end] = data
+                segment = self._segments[key] = _Segment(shm, ends)
+            segment.users += 1
+            self._latest = key
+        try:
+            yield SharedInputs(segment.shm.name, segment.ends)
+        finally:
+            with self._lock:
+                segment.users -= 1
+                for k in [k for k, s in self._segments.items() if k != self._latest and s.users == 0]:
+                    self._release(self._segments.pop(k))
+
+    @staticmethod
+    def _release(segment: _Segment) -> None:
+        segment.shm.close()
+        segment.shm.unlink()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            for segment in self._segments.values():
+                self._release(segment)
+            self._segments.clear()
+
+
+# 子进程内：共享内存名 -> {部分序号: 反序列化后的排程输入}
+_loaded: "OrderedDict[str, Dict[int, Any]]" = OrderedDict()
+
+
+def load_shared(ref: SharedInputs, part: int = 0) -> Any:
+    """子进程中执行：取出引用中第 part 部分的排程输入，每个进程每个版本的每个部分只反序列化一次。"""
+    parts = _loaded.get(ref.name)
+    if parts is None:
+        parts = _loaded[ref.name] = {}
+        while len(_loaded) > WORKER_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    else:
+        _loaded.move_to_end(ref.name)
+    if part not in parts:
+        shm = shared_memory.SharedMemory(name=ref.name)
+        try:
+            view = shm.buf[ref.ends[part - 1] if part else 0:ref.ends[part]]
+            try:
+                parts[part] = pickle.loads(view)
+            finally:
+                view.release()
+        finally:
+            shm.close()
+    return parts[part]
@@ -0,0 +1,70 @@
+"""
+工作日历微基准：对比原逐日循环 working_slots 与 WorkCalendar 的闭式计算
+
+运行：python benchmarks/bench_calendar.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.work_calendar import WorkCalendar, WorkdayIndex
+
+
+def legacy_working_slots(start: datetime, hours: float, day_hours: float = 8.0):
+    """原 app/api/schedule.py 中的逐日循环实现，仅用于对比。"""
+    end = start
+    remaining = hours
+    while remaining > 0:
+        take = min(day_hours, remaining)
+        end = end + timedelta(hours=take)
+        remaining -= take
+        if remaining > 0:
+            end = (end.replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1))
+    return start, end
+
+
+def check_equivalence() -> int:
+    """在一组典型输入上校验新旧算法结果一致，返回校验条数。"""
+    starts = [datetime(2025, 1, 6, h, m) for h in (0, 8, 13, 17, 23) for m in (0, 30)]
+    day_hours_list = [1, 2, 2.5, 4, 8, 10, 16, 20, 24]
+    hours_list = [0, 0.5, 1, 7.5, 8, 8.25, 16, 33, 100, 2000]
+    count = 0
+    for day_hours in day_hours_list:
+        calendar = WorkCalendar(day_hours)
+        for start in starts:
+            for hours in hours_list:
+                expected = legacy_working_slots(start, hours, day_hours)
+                actual = calendar.slots(start, hours)
+                assert actual == expected, (start, hours, day_hours, actual, expected)
+                count += 1
+    return count
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - t0
+    print(f"  {label:<32} {elapsed / repeat * 1e6:>10.2f} us/call")
+    return elapsed / repeat
+
+
+def main():
+    print(f"equivalence: {check_equivalence()} cases ok")
+    start = datetime(2025, 1, 6, 8)
+    weekday_calendar = WorkCalendar(2.0, days=WorkdayIndex(workdays=range(5), holidays=[datetime(2025, 1, 1).date()]))
+    for hours, day_hours in ((40, 8.0), (2000, 2.0), (20000, 2.0)):
+        print(f"job {hours} h @ {day_hours} h/day")
+        calendar = WorkCalendar(day_hours)
+        repeat = max(10, 20000 // max(int(hours / day_hours), 1))
+        old = bench("legacy day-by-day loop", lambda: legacy_working_slots(start, hours, day_hours), repeat)
+        new = bench("WorkCalendar.add_hours", lambda: calendar.add_hours(start, hours), 20000)
+        bench("WorkCalendar (weekdays+holiday)", lambda: weekday_calendar.add_hours(start, hours), 20000)
+        print(f"  speedup x{old / new:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+增量排程基准：5 万道工单工序的计划上，单个工单变更后增量重排 vs 全量重排
+
+运行：python benchmarks/bench_incremental.py [工单数] [每单工序数]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import temp_session, generate_plant
+
+from app.models.workorder import WorkOrder, WorkOrderOperation
+from app.services.scheduler import load_snapshot, build_calendars, compute_schedule, build_state, build_response
+from app.services.incremental import reschedule
+
+NOW = datetime(2025, 1, 6, 8)
+
+
+def full_rebuild(db, version):
+    snapshot = load_snapshot(db)
+    calendars = build_calendars(snapshot)
+    tasks = compute_schedule(snapshot, NOW, calendars)
+    state = build_state(version, NOW, snapshot, calendars, tasks)
+    return build_response(snapshot, tasks, state.rows), state
+
+
+def main():
+    work_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 12500
+    ops_per_order = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    db, path = temp_session()
+    try:
+        count = generate_plant(db, work_orders, ops_per_order)
+        print(f"plan: {count} work order operations, {work_orders} work orders")
+        rnd = random.Random(7)
+
+        t0 = time.perf_counter()
+        _, state = full_rebuild(db, 0)
+        print(f"  full rebuild (initial)          {(time.perf_counter() - t0) * 1e3:>9.1f} ms")
+
+        cases = []
+        for version in range(1, 11):
+            wo_id = rnd.choice(list(state.by_work_order))
+            if version % 2:
+                # 优先级变化
+                db.query(WorkOrder).filter(WorkOrder.id == wo_id).update({"priority": rnd.randint(1, 10)})
+                changed = ([wo_id], [])
+            else:
+                # 报工完成一道工序
+                op = state.by_work_order[wo_id][0].op
+                db.query(WorkOrderOperation).filter(WorkOrderOperation.id == op.id).update(
+                    {"completed_quantity": WorkOrderOperation.planned_quantity})
+                changed = ([], [op.id])
+            db.commit()
+
+            t0 = time.perf_counter()
+            new_state, stats = reschedule(db, state, version, *changed)
+            incremental = build_response(new_state.snapshot, new_state.tasks, new_state.rows)
+            inc_ms = (time.perf_counter() - t0) * 1e3
+
+            t0 = time.perf_counter()
+            expected, _ = full_rebuild(db, version)
+            full_ms = (time.perf_counter() - t0) * 1e3
+            assert incremental == expected, f"incremental result differs at version {version}"
+            cases.append((inc_ms, full_ms, stats))
+            state = new_state
+
+        inc_avg = sum(c[0] for c in cases) / len(cases)
+        full_avg = sum(c[1] for c in cases) / len(cases)
+        rescheduled = sum(c[2]["tasks_rescheduled"] for c in cases) / len(cases)
+        print(f"  incremental (avg of {len(cases)})          {inc_avg:>9.1f} ms  ({rescheduled:.0f} tasks rescheduled)")
+        print(f"  full rebuild (avg of {len(cases)})         {full_avg:>9.1f} ms")
+        print(f"  speedup x{full_avg / inc_avg:.1f}; results identical")
+    finally:
+        db.close()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
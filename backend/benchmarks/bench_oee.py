@@ -0,0 +1,98 @@
+"""
+OEE 基准：报工事件增长时，按生产日 / 按班次计算全部设备 OEE 的耗时
+- 首次：范围内全部时段向量化计算并写入缓存（oee_periods）
+- 缓存：再次查询同一范围，已关闭时段直接读取
+- 次日：时间前进一天后查询同一长度的范围，只计算新增的时段
+数据库为一次性 SQLite 文件（synthetic.temp_session），工厂配置白班 / 夜班。
+
+运行：python benchmarks/bench_oee.py [最大报工数] [天数]
+"""
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from synthetic import temp_session, generate_plant, BASE_TIME
+from app.models.workorder import OEEPeriod, WorkOrderOperation, WorkReport
+from app.services.oee import oee_report
+
+CHUNK = 50000
+
+
+def grow(db, ops, rnd: random.Random, count: int) -> None:
+    """追加报工：每道工单工序在自己的 8 小时加工窗口内依次开工、暂停 / 恢复、完工 / 报废。"""
+    rows = []
+    while count > 0:
+        woo_id, wo_id, equipment_id, window = rnd.choice(ops)
+        t = window
+        for kind in ["start"] + [rnd.choice(("complete", "complete", "scrap", "pause", "resume"))
+                                 for _ in range(min(count, 12) - 1)]:
+            t += timedelta(seconds=rnd.randint(60, 40 * 60))
+            rows.append({"work_order_id": wo_id, "work_order_operation_id": woo_id, "report_type": kind,
+                         "quantity": rnd.randint(1, 10) if kind in ("complete", "scrap") else 0,
+                         "equipment_id": equipment_id, "report_time": t})
+        count -= min(count, 12)
+        if len(rows) >= CHUNK:
+            db.execute(insert(WorkReport), rows)
+            rows = []
+    if rows:
+        db.execute(insert(WorkReport), rows)
+    db.commit()
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main():
+    max_reports = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    sizes = [n for n in (10_000, 100_000) if n < max_reports] + [max_reports]
+
+    db, path = temp_session()
+    generate_plant(db, 5000, 5, equipment=100, workshops=2, operations=20, shifts=True)
+    db.commit()
+    rnd = random.Random(25)
+    ops = [(woo_id, wo_id, equipment_id, BASE_TIME + timedelta(seconds=rnd.randint(0, days * 86400 - 8 * 3600)))
+           for woo_id, wo_id, equipment_id in db.query(WorkOrderOperation.id, WorkOrderOperation.work_order_id,
+                                                       WorkOrderOperation.equipment_id)]
+    now = BASE_TIME + timedelta(days=days, hours=2)  # 最后一个生产日已关闭
+    first_day, last_day = (now - timedelta(days=30)).date(), (now - timedelta(days=1)).date()
+
+    print(f"reports spread over {days} days; 100 equipment, OEE for the last 30 production days / shifts")
+    print(f"{'reports':>9} {'granularity':>11} {'periods':>8} {'cold ms':>9} {'cached ms':>10} {'next day ms':>12}")
+    rows = 0
+    for size in sizes:
+        grow(db, ops, rnd, size - rows)
+        rows = size
+        for granularity in ("day", "shift"):
+            db.query(OEEPeriod).delete()
+            db.commit()
+            result = {}
+
+            def query(shift_days: int = 0):
+                result.update(oee_report(db, granularity, first_day + timedelta(days=shift_days),
+                                         last_day + timedelta(days=shift_days), now=now + timedelta(days=shift_days)))
+                db.commit()
+
+            cold = timed(query)
+            periods = result["computed_periods"]
+            cached = timed(query)
+            assert result["computed_periods"] == 0, result["computed_periods"]
+            next_day = timed(lambda: query(1))
+            print(f"{size:>9} {granularity:>11} {periods:>8} {cold * 1e3:9.1f} {cached * 1e3:10.1f} "
+                  f"{next_day * 1e3:12.1f}")
+    db.close()
+    db.get_bind().dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
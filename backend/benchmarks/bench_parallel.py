@@ -0,0 +1,108 @@
+"""
+按车间并行排程基准：工单大多只在一个车间内加工，少量跨车间；
+对比 compute_schedule 与 compute_schedule_parallel 的耗时，并校验结果一致；
+另含一个跨三个车间的工序链 + 阻塞工序的小用例（分区结果不收敛，需从不一致时刻恢复），结果不一致时报错退出
+
+运行：python benchmarks/bench_parallel.py [工序数] [进程数] [跨车间工单比例]
+"""
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.scheduler import (
+    PlanSnapshot, OpRecord, OperationInfo, EquipmentInfo, WorkOrderInfo,
+    queue_key, build_calendars, compute_schedule,
+)
+from app.services.parallel_scheduler import compute_schedule_parallel
+from bench_scheduler import NOW, check
+
+
+def workshop_snapshot(n_ops: int, workshops: int = 8, equipment_per_workshop: int = 60,
+                      cross_ratio: float = 0.02, ops_per_order: int = 5, seed: int = 1) -> PlanSnapshot:
+    rnd = random.Random(seed)
+    snapshot = PlanSnapshot(ops=[], operations={}, equipment={}, work_orders={})
+    for i in range(1, 41):
+        snapshot.operations[i] = OperationInfo(i, f"OP{i:04d}", f"工序{i}", rnd.choice([0, 2, 5, 10, 30]))
+    by_workshop = {}
+    eq_id = 0
+    for ws in range(1, workshops + 1):
+        for _ in range(equipment_per_workshop):
+            eq_id += 1
+            snapshot.equipment[eq_id] = EquipmentInfo(eq_id, f"EQ{eq_id:05d}", rnd.choice([0, 8, 16, 20]), ws)
+            by_workshop.setdefault(ws, []).append(eq_id)
+    op_id = 0
+    for wo_id in range(1, n_ops // ops_per_order + 1):
+        quantity = rnd.randint(5, 200)
+        start = NOW + timedelta(hours=rnd.randint(0, 240)) if rnd.random() < 0.7 else None
+        snapshot.work_orders[wo_id] = WorkOrderInfo(
+            wo_id, f"WO{wo_id:08d}", rnd.randint(1, 10), NOW + timedelta(hours=rnd.randint(24, 2000))
+        )
+        home = rnd.randint(1, workshops)
+        cross = rnd.random() < cross_ratio
+        for seq in range(1, ops_per_order + 1):
+            op_id += 1
+            ws = rnd.randint(1, workshops) if cross else home
+            snapshot.ops.append(OpRecord(
+                op_id, wo_id, rnd.randint(1, 40), seq * 10, rnd.choice(by_workshop[ws]),
+                quantity, rnd.choice((0, 0, 0, quantity // 2)), start,
+            ))
+    snapshot.ops.sort(key=lambda op: queue_key(snapshot, op))
+    return snapshot
+
+
+def chain_blocker_snapshot() -> PlanSnapshot:
+    """
+    三台设备分属车间 1 / 2 / 3：工单 1 依次在三台设备上各加工 2 小时（A→B→C），
+    工单 2 在第三台设备上有一道 10 小时的工序。C 的就绪下限在第二轮仍早于真实就绪时刻，但派工晚于真实就绪时刻。
+    """
+    snapshot = PlanSnapshot(
+        ops=[OpRecord(1, 1, 1, 10, 1, 1, 0, None), OpRecord(2, 1, 1, 20, 2, 1, 0, None),
+             OpRecord(3, 1, 1, 30, 3, 1, 0, None), OpRecord(4, 2, 2, 10, 3, 1, 0, None)],
+        operations={1: OperationInfo(1, "OP0001", "工序1", 120), 2: OperationInfo(2, "OP0002", "工序2", 600)},
+        equipment={i: EquipmentInfo(i, f"EQ{i:05d}", 0, i) for i in (1, 2, 3)},
+        work_orders={1: WorkOrderInfo(1, "WO00000001", 1, NOW + timedelta(days=1)),
+                     2: WorkOrderInfo(2, "WO00000002", 1, NOW + timedelta(days=2))},
+    )
+    snapshot.ops.sort(key=lambda op: queue_key(snapshot, op))
+    return snapshot
+
+
+def identical(serial, parallel) -> bool:
+    return all(a.start == b.start and a.end == b.end for a, b in zip(serial, parallel))
+
+
+def main():
+    n_ops = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    cross_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    chain = chain_blocker_snapshot()
+    chain_parallel, chain_stats = compute_schedule_parallel(chain, NOW, workers=max(workers, 2))
+    assert identical(compute_schedule(chain, NOW), chain_parallel), "chain + blocker: parallel result differs"
+    print(f"chain + blocker: identical ({chain_stats['rounds']} rounds, resumed_from={chain_stats['resumed_from']})")
+
+    snapshot = workshop_snapshot(n_ops, cross_ratio=cross_ratio)
+    calendars = build_calendars(snapshot)
+
+    t0 = time.perf_counter()
+    serial = compute_schedule(snapshot, NOW, calendars)
+    serial_time = time.perf_counter() - t0
+    compute_schedule_parallel(snapshot, NOW, calendars, workers)  # 预热进程池
+    t0 = time.perf_counter()
+    parallel, stats = compute_schedule_parallel(snapshot, NOW, calendars, workers)
+    parallel_time = time.perf_counter() - t0
+
+    check(snapshot, parallel)
+    same = identical(serial, parallel)
+    print(f"{n_ops} operations, {stats['partitions']} partitions, {workers} workers, cross-workshop {cross_ratio:.0%}")
+    print(f"  serial    {serial_time * 1e3:>8.1f} ms")
+    print(f"  parallel  {parallel_time * 1e3:>8.1f} ms  ({stats['rounds']} rounds, resumed_from={stats['resumed_from']})")
+    print(f"  identical: {same}")
+    assert same, "parallel result differs from compute_schedule"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+产量汇总基准：报工表增长到百万行时，比较看板统计直接扫描 work_reports 与读产量汇总表（production_rollups）的耗时
+- 原始：按小时 GROUP BY 报工表（SQLite strftime），统计最近 7 天完工 / 报废数
+- 汇总：output_series 读汇总表，按天 / 按小时（按设备分组）
+同时给出 rebuild_rollups 全量重算的耗时，以及一条完工报工写入时汇总表带来的额外 SQL 数。
+数据库为一次性 SQLite 文件（synthetic.temp_session）。
+
+运行：python benchmarks/bench_production_rollups.py [最大报工数] [天数]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert, text
+
+from synthetic import temp_session, generate_plant, BASE_TIME
+from app.models.workorder import WorkOrderOperation, WorkReport
+from app.schemas.workorder import WorkReportCreate
+from app.services.production_rollups import output_series, rebuild_rollups
+from app.services.work_reports import apply_work_report
+
+CHUNK = 50000
+
+
+def grow(db, ops, rnd: random.Random, count: int) -> None:
+    """
+    追加完工 / 报废 / 开工报工：每道工单工序在自己的 8 小时加工窗口内、在所派设备上报工，
+    班次按报工时刻（8:00-20:00 白班，其余夜班）。
+    """
+    for lo in range(0, count, CHUNK):
+        rows = []
+        for _ in range(min(CHUNK, count - lo)):
+            woo_id, wo_id, equipment_id, window = rnd.choice(ops)
+            report_time = window + timedelta(seconds=rnd.randint(0, 8 * 3600 - 1))
+            rows.append({"work_order_id": wo_id, "work_order_operation_id": woo_id,
+                         "report_type": rnd.choice(("complete", "complete", "complete", "scrap", "start")),
+                         "quantity": rnd.randint(1, 10), "equipment_id": equipment_id,
+                         "shift_id": 1 if 8 <= report_time.hour < 20 else 2, "report_time": report_time})
+        db.execute(insert(WorkReport), rows)
+    db.commit()
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def raw_hourly(db, start: datetime, end: datetime):
+    return db.execute(text(
+        "SELECT strftime('%Y-%m-%d %H', report_time) AS h, "
+        "sum(CASE WHEN report_type = 'complete' THEN quantity ELSE 0 END), "
+        "sum(CASE WHEN report_type = 'scrap' THEN quantity ELSE 0 END), count(*) "
+        "FROM work_reports WHERE report_type IN ('complete', 'scrap') AND report_time >= :s AND report_time < :e "
+        "GROUP BY h"
+    ), {"s": start, "e": end}).all()
+
+
+def main():
+    max_reports = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    sizes = [n for n in (10_000, 100_000) if n < max_reports] + [max_reports]
+
+    db, path = temp_session()
+    generate_plant(db, 2000, 5, equipment=50, workshops=2, operations=20)
+    db.commit()
+    rnd = random.Random(24)
+    ops = [(woo_id, wo_id, equipment_id, BASE_TIME + timedelta(seconds=rnd.randint(0, days * 86400 - 8 * 3600)))
+           for woo_id, wo_id, equipment_id in db.query(WorkOrderOperation.id, WorkOrderOperation.work_order_id,
+                                                       WorkOrderOperation.equipment_id)]
+    end = BASE_TIME + timedelta(days=days)
+    start = end - timedelta(days=7)
+
+    print(f"reports spread over {days} days; dashboards cover the last 7 days")
+    print(f"{'reports':>9} {'rebuild s':>9} {'buckets':>8} {'raw ms':>8} {'daily ms':>9} {'hourly/eq ms':>13}")
+    rows = 0
+    for size in sizes:
+        grow(db, ops, rnd, size - rows)
+        rows = size
+        t0 = time.perf_counter()
+        buckets = rebuild_rollups(db)
+        db.commit()
+        rebuild = time.perf_counter() - t0
+
+        raw = timed(lambda: raw_hourly(db, start, end))
+        daily = timed(lambda: output_series(db, start, end, "day"))
+        hourly = timed(lambda: output_series(db, start, end, "hour", "equipment"))
+        check = output_series(db, start, end, "hour")["totals"]
+        raw_count = sum(r[3] for r in raw_hourly(db, start, end))
+        assert check["report_count"] == raw_count, (check, raw_count)
+        print(f"{size:>9} {rebuild:9.2f} {buckets:>8} {raw * 1e3:8.1f} {daily * 1e3:9.1f} {hourly * 1e3:13.1f}")
+
+    counter = [0]
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: counter.__setitem__(0, counter[0] + 1))
+    woo_id, wo_id = ops[0][:2]
+    for label, rollup in (("new bucket", "insert a new bucket"), ("existing bucket", "update the existing bucket")):
+        counter[0] = 0
+        apply_work_report(db, WorkReportCreate(work_order_id=wo_id, work_order_operation_id=woo_id,
+                                               report_type="complete", quantity=1, report_time=end))
+        db.commit()
+        print(f"complete report, {label}: {counter[0]} SQL statements "
+              f"(work order operation lookup + update, rollup: {rollup})")
+    db.close()
+    db.get_bind().dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
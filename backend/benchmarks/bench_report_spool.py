@@ -0,0 +1,199 @@
+"""
+报工 spool 基准与崩溃恢复校验（一次性 SQLite 数据库 + 临时 spool 目录）
+- 延迟：多个线程同时报工，比较直接写库（每条一次提交）与写入 spool 后确认的单条延迟（p50 / p99）与吞吐量，
+  并校验 spool 排空后每条报工都已入库
+- 崩溃恢复：子进程多线程写入 spool 并同时入库，随机时刻 SIGKILL（部分轮次再在日志末尾追加半条记录模拟写了一半），
+  重启后继续写入；最后全部入库，校验每条已确认的报工恰好入库一次、工单完成数与报工记录一致
+
+运行：python benchmarks/bench_report_spool.py [线程数] [每线程报工次数] [崩溃轮数]
+"""
+import logging
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from synthetic import temp_session, generate_plant
+import app.main  # noqa: F401  注册全部模型
+from app.models.workorder import WorkOrder, WorkOrderOperation, WorkReport
+from app.schemas.workorder import WorkReportCreate
+from app.services.report_spool import ReportSpool
+from app.services.work_reports import apply_work_report
+
+
+def make_sessions(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def load_operations(Session):
+    db = Session()
+    try:
+        return db.query(WorkOrderOperation.id, WorkOrderOperation.work_order_id).all()
+    finally:
+        db.close()
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def bench_latency(threads: int, reports: int) -> None:
+    print(f"latency: {threads} threads x {reports} reports")
+    for mode in ("direct", "spool"):
+        db, path = temp_session()
+        generate_plant(db, 200, 5, equipment=20, workshops=2, operations=10)
+        db.close()
+        engine, Session = make_sessions(path)
+        ops = load_operations(Session)
+        spool_dir = tempfile.mkdtemp(prefix="mes-spool-")
+        spool = ReportSpool(spool_dir, Session) if mode == "spool" else None
+        if spool:
+            spool.open()
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(seed: int):
+            rnd = random.Random(seed)
+            mine = []
+            for _ in range(reports):
+                woo_id, wo_id = rnd.choice(ops)
+                report = WorkReportCreate(work_order_id=wo_id, work_order_operation_id=woo_id,
+                                          report_type="complete", quantity=1)
+                t0 = time.perf_counter()
+                if spool:
+                    spool.append(report)
+                else:
+                    session = Session()
+                    apply_work_report(session, report)
+                    session.commit()
+                    session.close()
+                mine.append(time.perf_counter() - t0)
+            with lock:
+                latencies.extend(mine)
+
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        drained = ""
+        if spool:
+            assert spool.drain(120), "spool did not drain"
+            drained = f"  drained after {time.perf_counter() - t0:.2f} s"
+            spool.close()
+        session = Session()
+        count = session.query(WorkReport).count()
+        session.close()
+        assert count == len(latencies), (count, len(latencies))
+        print(f"  {mode:<7} p50 {percentile(latencies, 0.5) * 1e3:7.2f} ms  p99 {percentile(latencies, 0.99) * 1e3:7.2f} ms  "
+              f"{len(latencies) / elapsed:7.0f} reports/s  in database {count}{drained}")
+        engine.dispose()
+        shutil.rmtree(spool_dir)
+        os.remove(path)
+
+
+def _child(path: str, spool_dir: str, ack_path: str, round_no: int, threads: int) -> None:
+    """子进程：打开（恢复）spool，多线程不停报工，每条确认后记入 ack 文件，直到被杀。"""
+    engine, Session = make_sessions(path)
+    spool = ReportSpool(spool_dir, Session, batch_size=50, segment_bytes=64 * 1024)
+    spool.open()
+    ops = load_operations(Session)
+    ack_fd = os.open(ack_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+
+    def worker(t: int):
+        rnd = random.Random(round_no * 1000 + t)
+        for i in range(10 ** 9):
+            woo_id, wo_id = rnd.choice(ops)
+            token = f"r{round_no}-t{t}-{i}"
+            spool.append(WorkReportCreate(work_order_id=wo_id, work_order_operation_id=woo_id,
+                                          report_type="complete", quantity=1, notes=token))
+            os.write(ack_fd, f"{token}\n".encode())
+
+    for t in range(threads):
+        threading.Thread(target=worker, args=(t,), daemon=True).start()
+    while True:
+        time.sleep(1)
+
+
+def bench_crash(rounds: int, threads: int) -> None:
+    db, path = temp_session()
+    generate_plant(db, 200, 5, equipment=20, workshops=2, operations=10)
+    db.close()
+    db.get_bind().dispose()
+    spool_dir = tempfile.mkdtemp(prefix="mes-spool-")
+    ack_path = os.path.join(spool_dir, "acked.txt")
+    rnd = random.Random(7)
+    torn = 0
+    for round_no in range(rounds):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _child(path, spool_dir, ack_path + str(round_no), round_no, threads)
+            finally:
+                os._exit(1)
+        time.sleep(rnd.uniform(0.2, 1.0))
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        if rnd.random() < 0.3:
+            # 模拟写了一半的记录（未确认）
+            segments = sorted(n for n in os.listdir(spool_dir) if n.startswith("spool-"))
+            with open(os.path.join(spool_dir, segments[-1]), "ab") as f:
+                f.write(b"0badf00d {\"seq\":")
+            torn += 1
+
+    engine, Session = make_sessions(path)
+    spool = ReportSpool(spool_dir, Session, batch_size=50, segment_bytes=64 * 1024)
+    spool.open()
+    assert spool.drain(300), "spool did not drain"
+    status = spool.status()
+    spool.close()
+
+    acked = set()
+    for round_no in range(rounds):
+        with open(ack_path + str(round_no)) as f:
+            acked.update(line.strip() for line in f if line.endswith("\n"))
+    session = Session()
+    notes = Counter(n for (n,) in session.query(WorkReport.notes))
+    completed = session.query(func.sum(WorkOrder.completed_quantity)).scalar() or 0
+    session.close()
+    duplicates = [n for n, c in notes.items() if c > 1]
+    missing = acked - set(notes)
+    print(f"crash recovery: {rounds} kills ({torn} with a torn tail), {len(acked)} acknowledged, "
+          f"{sum(notes.values())} in database ({sum(notes.values()) - len(acked & set(notes))} applied but "
+          f"killed before acknowledgement), missing {len(missing)}, duplicated {len(duplicates)}, "
+          f"segments left {status['segments']}")
+    assert not missing, sorted(missing)[:5]
+    assert not duplicates, duplicates[:5]
+    assert completed == sum(notes.values()), (completed, sum(notes.values()))
+    assert status["depth"] == 0 and status["applied_seq"] == status["appended_seq"]
+    print("  every acknowledged report applied exactly once; work order quantities consistent")
+    engine.dispose()
+    shutil.rmtree(spool_dir)
+    os.remove(path)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    logging.disable(logging.INFO)  # 关闭请求 / spool 日志
+    bench_latency(threads, reports)
+    bench_crash(rounds, threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+排程基准套件：按给定规模生成合成工厂（一次性 SQLite 数据库），测量
+- 排程核心各阶段：load_snapshot / build_calendars / compute_schedule / build_response 的耗时与 SQL 次数
+- 端到端：POST /schedule/run（含 HTTP 与 JSON 序列化）的耗时、SQL 次数与响应大小，以及缓存命中的 GET /schedule
+- 峰值内存：tracemalloc 统计的排程核心与端到端请求的 Python 分配峰值（单独一轮，不计入耗时）
+结果以 JSON 输出（--output），可用 --compare 与历史结果对比，耗时超出容差或 SQL 次数增加时以退出码 1 结束；
+各规模的 SQL 次数不一致（排程读取随数据量逐行 / 逐批查询）时同样以退出码 1 结束。
+
+运行：python benchmarks/bench_suite.py --sizes 10000,100000 --output bench.json [--compare 上次结果.json]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+
+from synthetic import BASE_TIME, temp_session, generate_plant
+from app.database import get_db
+from app.main import app
+from app.services import schedule_cache
+from app.services.scheduler import load_snapshot, build_calendars, compute_schedule, build_response
+from app.services.work_calendar import get_shift_calendars, invalidate_shift_calendars
+
+SUITE_VERSION = 1
+# 对比时检查的耗时指标（秒）
+TIME_METRICS = ("load_snapshot_s", "build_calendars_s", "core_s", "build_response_s", "cached_get_s")
+
+
+class QueryCounter:
+    """统计引擎上执行的 SQL 次数。"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+
+def _timed(fn: Callable[[], Any], counter: QueryCounter, repeat: int = 1) -> Tuple[Any, float, int]:
+    """执行 repeat 次，返回 (最后一次结果, 最短耗时, 单次 SQL 次数)。"""
+    best, result, queries = None, None, 0
+    for _ in range(repeat):
+        gc.collect()
+        before = counter.count
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        queries = counter.count - before
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best, queries
+
+
+def _peak_mb(fn: Callable[[], Any]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_size(operations: int, args: argparse.Namespace) -> Dict[str, Any]:
+    work_orders = max(operations // args.ops_per_order, 1)
+    db, path = temp_session()
+    engine = db.get_bind()
+    counter = QueryCounter(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_db
+    client = TestClient(app)
+    try:
+        t0 = time.perf_counter()
+        count = generate_plant(
+            db, work_orders, args.ops_per_order, args.equipment, args.workshops, args.operations,
+            routings=args.routings, shifts=args.shifts,
+        )
+        result: Dict[str, Any] = {
+            "operations": count,
+            "work_orders": work_orders,
+            "generate_s": round(time.perf_counter() - t0, 4),
+            "db_mb": round(os.path.getsize(path) / 2 ** 20, 2),
+        }
+        invalidate_shift_calendars()
+        now = BASE_TIME
+
+        snapshot, elapsed, queries = _timed(lambda: load_snapshot(db), counter, args.repeat)
+        result.update(load_snapshot_s=round(elapsed, 4), load_snapshot_queries=queries,
+                      scheduled_operations=len(snapshot.ops))
+        invalidate_shift_calendars()
+        calendars, elapsed, queries = _timed(lambda: build_calendars(snapshot, get_shift_calendars(db)), counter)
+        result.update(build_calendars_s=round(elapsed, 4), build_calendars_queries=queries)
+        tasks, elapsed, _ = _timed(lambda: compute_schedule(snapshot, now, calendars), counter, args.repeat)
+        result.update(core_s=round(elapsed, 4), core_us_per_operation=round(elapsed / max(len(tasks), 1) * 1e6, 3))
+        _, elapsed, _ = _timed(lambda: build_response(snapshot, tasks), counter, args.repeat)
+        result["build_response_s"] = round(elapsed, 4)
+        if args.memory:
+            result["core_peak_mb"] = round(_peak_mb(lambda: compute_schedule(snapshot, now, calendars)), 2)
+        del snapshot, calendars, tasks
+
+        end_to_end: Dict[str, Dict[str, Any]] = {}
+        for mode in args.modes:
+            def run():
+                response = client.post("/api/v1/schedule/run", params={"mode": mode})
+                assert response.status_code == 200, response.text
+                return response
+
+            response, elapsed, queries = _timed(run, counter, args.repeat)
+            end_to_end[mode] = {"seconds": round(elapsed, 4), "queries": queries,
+                                "response_mb": round(len(response.content) / 2 ** 20, 2)}
+            del response
+            if args.memory:
+                end_to_end[mode]["peak_mb"] = round(_peak_mb(run), 2)
+        result["end_to_end"] = end_to_end
+
+        # 缓存命中：排程输入未变化时 GET /schedule 直接返回缓存的 JSON
+        client.get("/api/v1/schedule")
+        _, elapsed, queries = _timed(lambda: client.get("/api/v1/schedule"), counter, args.repeat)
+        result.update(cached_get_s=round(elapsed, 4), cached_get_queries=queries)
+        return result
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        schedule_cache.bump_data_version()
+        invalidate_shift_calendars()
+        db.close()
+        engine.dispose()
+        os.remove(path)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> List[str]:
+    """
+    与历史结果按相同规模对比：耗时增长超过 tolerance（比例）且超过 min_delta 秒（忽略毫秒级抖动），
+    或 SQL 次数增加，记为回归。
+    """
+    previous = {r["operations"]: r for r in baseline.get("results", ())}
+    regressions = []
+    for r in results["results"]:
+        old = previous.get(r["operations"])
+        if old is None:
+            continue
+        pairs = [(m, r.get(m), old.get(m)) for m in TIME_METRICS]
+        pairs += [(f"end_to_end.{mode}.seconds", e["seconds"], old.get("end_to_end", {}).get(mode, {}).get("seconds"))
+                  for mode, e in r["end_to_end"].items()]
+        for metric, new, before in pairs:
+            if new is not None and before and new > before * (1 + tolerance) and new - before > min_delta:
+                regressions.append(f"{r['operations']} ops {metric}: {before:.4f} s -> {new:.4f} s "
+                                   f"(+{(new / before - 1):.0%})")
+        query_pairs = [(m, r.get(m), old.get(m)) for m in r if m.endswith("_queries")]
+        query_pairs += [(f"end_to_end.{mode}.queries", e["queries"],
+                         old.get("end_to_end", {}).get(mode, {}).get("queries"))
+                        for mode, e in r["end_to_end"].items()]
+        for metric, new, before in query_pairs:
+            if before is not None and new > before:
+                regressions.append(f"{r['operations']} ops {metric}: {before} -> {new} queries")
+    return regressions
+
+
+def query_counts(r: Dict[str, Any]) -> Dict[str, int]:
+    counts = {m: v for m, v in r.items() if m.endswith("_queries")}
+    counts.update((f"end_to_end.{mode}.queries", e["queries"]) for mode, e in r["end_to_end"].items())
+    return counts
+
+
+def check_constant_queries(results: Dict[str, Any]) -> List[str]:
+    """排程读取、端到端请求与缓存命中的 SQL 次数应与数据规模无关：各规模与最小规模逐项比较。"""
+    runs = sorted(results["results"], key=lambda r: r["operations"])
+    if len(runs) < 2:
+        return []
+    smallest = query_counts(runs[0])
+    problems = []
+    for r in runs[1:]:
+        for metric, count in query_counts(r).items():
+            if metric in smallest and count != smallest[metric]:
+                problems.append(f"{metric}: {smallest[metric]} queries at {runs[0]['operations']} ops, "
+                                f"{count} at {r['operations']} ops")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排程基准套件")
+    parser.add_argument("--sizes", default="10000,100000", help="工单工序数，逗号分隔")
+    parser.add_argument("--ops-per-order", type=int, default=5)
+    parser.add_argument("--equipment", type=int, default=200)
+    parser.add_argument("--workshops", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=20, help="工序主数据数")
+    parser.add_argument("--routings", type=int, default=100, help="工艺路线数，0 表示工单工序随机生成")
+    parser.add_argument("--shifts", action="store_true", help="各车间配置白班 / 夜班")
+    parser.add_argument("--modes", default="priority", help="端到端测量的排程模式，逗号分隔（priority / setup / resources）")
+    parser.add_argument("--repeat", type=int, default=3, help="耗时取多次中的最短值")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不测量峰值内存")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="历史结果 JSON，用于回归检查")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="耗时回归容差（比例）")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="计为回归的最小耗时增量（秒）")
+    args = parser.parse_args()
+    args.modes = [m for m in args.modes.split(",") if m]
+    logging.disable(logging.INFO)  # 关闭请求日志
+
+    results = {
+        "suite": "scheduling",
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "tolerance", "min_delta")},
+        "results": [],
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        r = bench_size(size, args)
+        results["results"].append(r)
+        e2e = ", ".join(f"{mode} {e['seconds']:.3f} s / {e['queries']} queries" for mode, e in r["end_to_end"].items())
+        print(f"{r['operations']:>9} ops  load {r['load_snapshot_s']:.3f} s  core {r['core_s']:.3f} s  "
+              f"response {r['build_response_s']:.3f} s  end-to-end {e2e}  cached GET {r['cached_get_s'] * 1e3:.1f} ms"
+              + (f"  core peak {r['core_peak_mb']:.0f} MB" if "core_peak_mb" in r else ""), file=sys.stderr)
+    results["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    problems = check_constant_queries(results)
+    for line in problems:
+        print(f"QUERY COUNT {line}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+扫码报工在制品定位基准：在制品表逐步增长到百万行，比较每次扫码报工（apply_work_report + 提交）的延迟
+- 无索引：(工单, 工序, 条码) 定位在制品为全表扫描
+- 索引：ix_wip_tracking_wo_op_batch 复合索引（以及批次号 / 序列号单列索引）
+- 索引 + 条码 LRU：活跃条码命中时省去工序与在制品两次查询
+同时给出按批次号 / 序列号追溯的查询耗时与建索引耗时（即已有数据库执行 migrate_db.py 的代价）。
+数据库为一次性 SQLite 文件（synthetic.temp_session）。
+
+运行：python benchmarks/bench_wip_lookup.py [最大在制品行数] [每档扫码次数] [活跃条码数]
+"""
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert, text
+
+from synthetic import temp_session, generate_plant
+from app.config import settings
+from app.models.workorder import WorkOrderOperation, WIPTracking
+from app.schemas.workorder import WorkReportCreate
+from app.services.work_reports import apply_work_report, invalidate_wip_barcodes
+
+CHUNK = 50000
+INDEXES = [index for index in WIPTracking.__table__.indexes if index.name.startswith("ix_wip_tracking_")
+           and index.name != "ix_wip_tracking_id"]
+
+
+def percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def grow(db, ops, rnd: random.Random, start: int, stop: int, active) -> None:
+    """追加在制品行，条码 B0000000 起连续编号；最新的若干行为活跃条码（扫码对象，按 id 顺序扫表时排在最后）。"""
+    for lo in range(start, stop, CHUNK):
+        rows = []
+        for n in range(lo, min(lo + CHUNK, stop)):
+            woo_id, wo_id, operation_id = rnd.choice(ops)
+            barcode = f"B{n:07d}"
+            rows.append({"work_order_id": wo_id, "operation_id": operation_id, "material_id": None,
+                         "batch_number": barcode, "serial_number": barcode, "quantity": 1000, "status": "wip"})
+            active.append((wo_id, woo_id, barcode))
+        db.execute(insert(WIPTracking), rows)
+    db.commit()
+
+
+def scan(db, active, scans: int, rnd: random.Random, counter, warm: bool = False) -> dict:
+    """对活跃条码随机扫码（开工，数量 1）：返回延迟分位数与每次扫码的 SQL 数；warm=True 时每个条码按顺序扫一次。"""
+    latencies = []
+    queries = counter[0]
+    for i in range(scans):
+        wo_id, woo_id, barcode = active[i] if warm else rnd.choice(active)
+        report = WorkReportCreate(work_order_id=wo_id, work_order_operation_id=woo_id,
+                                  report_type="start", quantity=1, barcode=barcode)
+        t0 = time.perf_counter()
+        apply_work_report(db, report)
+        db.commit()
+        latencies.append(time.perf_counter() - t0)
+    return {"p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99),
+            "queries": (counter[0] - queries) / scans}
+
+
+def trace(db, active, rnd: random.Random, repeat: int = 20) -> float:
+    """按批次号 + 按序列号追溯各一次的平均耗时。"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        _, _, barcode = rnd.choice(active)
+        db.query(WIPTracking).filter(WIPTracking.batch_number == barcode).all()
+        db.query(WIPTracking).filter(WIPTracking.serial_number == barcode).all()
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    active_count = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    sizes = [n for n in (10_000, 100_000, 1_000_000) if n < max_rows] + [max_rows]
+
+    db, path = temp_session()
+    generate_plant(db, 2000, 5, equipment=50, workshops=2, operations=20)
+    db.commit()
+    ops = db.query(WorkOrderOperation.id, WorkOrderOperation.work_order_id, WorkOrderOperation.operation_id).all()
+    engine = db.get_bind()
+    counter = [0]
+    event.listen(engine, "before_cursor_execute", lambda *args: counter.__setitem__(0, counter[0] + 1))
+
+    active = deque(maxlen=active_count)
+    rnd = random.Random(23)
+    cache_size = settings.wip_barcode_cache
+    for index in INDEXES:
+        index.drop(bind=engine)
+    print(f"{scans} scans per step over {active_count} active barcodes (start, quantity 1, committed)")
+    print(f"{'wip rows':>10}  {'mode':<14} {'p50 ms':>8} {'p99 ms':>8} {'SQL/scan':>8} {'trace ms':>9}")
+    rows = 0
+    for size in sizes:
+        grow(db, ops, rnd, rows, size, active)
+        rows = size
+        active_list = list(active)
+        barcodes = [a[2] for a in active_list]
+
+        # 无索引时每次扫码都是全表扫描，百万行时只扫少量几次
+        settings.wip_barcode_cache = 0
+        slow_scans = max(10, min(scans, 2_000_000 // size))
+        result = scan(db, active_list, slow_scans, rnd, counter)
+        traced = trace(db, active_list, rnd, repeat=3)
+        print(f"{size:>10}  {'no index':<14} {result['p50'] * 1e3:8.2f} {result['p99'] * 1e3:8.2f} "
+              f"{result['queries']:8.1f} {traced * 1e3:9.2f}")
+
+        t0 = time.perf_counter()
+        for index in INDEXES:
+            index.create(bind=engine)
+        build = time.perf_counter() - t0
+        result = scan(db, active_list, scans, rnd, counter)
+        traced = trace(db, active_list, rnd)
+        print(f"{size:>10}  {'index':<14} {result['p50'] * 1e3:8.2f} {result['p99'] * 1e3:8.2f} "
+              f"{result['queries']:8.1f} {traced * 1e3:9.2f}   (indexes built in {build:.2f} s)")
+
+        settings.wip_barcode_cache = max(cache_size, active_count)
+        invalidate_wip_barcodes(barcodes)
+        scan(db, active_list, len(active_list), rnd, counter, warm=True)  # 预热
+        result = scan(db, active_list, scans, rnd, counter)
+        print(f"{size:>10}  {'index + LRU':<14} {result['p50'] * 1e3:8.2f} {result['p99'] * 1e3:8.2f} "
+              f"{result['queries']:8.1f}")
+        invalidate_wip_barcodes(barcodes)
+
+        if size != sizes[-1]:
+            for index in INDEXES:
+                index.drop(bind=engine)
+    settings.wip_barcode_cache = cache_size
+    total = db.execute(text("SELECT count(*) FROM wip_tracking")).scalar()
+    print(f"wip rows at end: {total}")
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
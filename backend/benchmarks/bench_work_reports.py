@@ -0,0 +1,165 @@
+"""
+并发报工基准：多个线程（模拟多台扫码枪）同时对同一工单 / 工单工序报工，每个线程一个会话，
+比较原来的读-改-写报工（先读出工单再在 Python 中累加）与原子更新报工（apply_work_report）：
+- 丢失数量：各线程报工数量之和与工单 / 工单工序完成数的差
+- 吞吐量：每秒完成的报工数
+以及班末集中上传：同一批报工逐条提交与通过 apply_work_reports 按批提交的耗时与 SQL 次数。
+数据库为一次性 SQLite 文件（synthetic.temp_session）。
+
+运行：python benchmarks/bench_work_reports.py [线程数] [每线程报工次数] [集中上传报工数] [每批条数]
+"""
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from synthetic import temp_session, generate_plant
+from app.models.master import Material, Operation
+from app.models.workorder import WorkOrder, WorkOrderOperation, WorkReport
+from app.schemas.workorder import WorkReportCreate
+from app.services.work_reports import apply_work_report, apply_work_reports
+
+
+def legacy_report(db, report: WorkReportCreate) -> WorkReport:
+    """原来的报工写法（读出工单 / 工单工序，在 Python 中累加后写回），仅保留数量与完工判断。"""
+    db_wo = db.query(WorkOrder).filter(WorkOrder.id == report.work_order_id).first()
+    db_report = WorkReport(**{**report.model_dump(), "report_time": datetime.now()})
+    db.add(db_report)
+    db_wo.completed_quantity += report.quantity
+    db_op = db.query(WorkOrderOperation).filter(WorkOrderOperation.id == report.work_order_operation_id).first()
+    db_op.completed_quantity += report.quantity
+    if db_op.completed_quantity >= db_op.planned_quantity:
+        db_op.status = "completed"
+        db_op.actual_end_date = datetime.now()
+    return db_report
+
+
+def setup(threads: int, reports: int):
+    db, path = temp_session()
+    engine = db.get_bind()
+    db.add(Material(id=1, code="P001", name="产品"))
+    db.add(Operation(id=1, code="OP01", name="装配", standard_time=1))
+    db.add(WorkOrder(id=1, code="WO-BENCH", product_id=1, planned_quantity=threads * reports,
+                     completed_quantity=0, scrapped_quantity=0, status="in_progress"))
+    db.add(WorkOrderOperation(id=1, work_order_id=1, operation_id=1, sequence=10,
+                              planned_quantity=threads * reports, completed_quantity=0, scrapped_quantity=0))
+    db.commit()
+    db.close()
+    return engine, path
+
+
+def run(apply, threads: int, reports: int):
+    engine, path = setup(threads, reports)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    report = WorkReportCreate(work_order_id=1, work_order_operation_id=1, report_type="complete", quantity=1)
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker():
+        barrier.wait()
+        for _ in range(reports):
+            db = Session()
+            try:
+                apply(db, report)
+                db.commit()
+            except OperationalError as exc:  # 锁等待超时等
+                db.rollback()
+                errors.append(exc)
+            finally:
+                db.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    db = Session()
+    wo = db.get(WorkOrder, 1)
+    woo = db.get(WorkOrderOperation, 1)
+    result = {
+        "elapsed": elapsed,
+        "committed": db.query(WorkReport).count(),
+        "wo_completed": wo.completed_quantity,
+        "op_completed": woo.completed_quantity,
+        "op_status": woo.status,
+        "errors": len(errors),
+    }
+    db.close()
+    engine.dispose()
+    os.remove(path)
+    return result
+
+
+def burst(total: int, batch_size: int, seed: int = 1):
+    """班末集中上传 total 条报工：逐条提交与按 batch_size 条一批提交，返回 {方式: (耗时, SQL 次数)}。"""
+    results = {}
+    for name in ("one by one", f"batches of {batch_size}"):
+        db, path = temp_session()
+        engine = db.get_bind()
+        generate_plant(db, 2000, 5, equipment=50, workshops=2, operations=10)
+        rnd = random.Random(seed)
+        ops = db.query(WorkOrderOperation.id, WorkOrderOperation.work_order_id).all()
+        reports = []
+        for _ in range(total):
+            woo_id, wo_id = rnd.choice(ops)
+            reports.append(WorkReportCreate(
+                work_order_id=wo_id, work_order_operation_id=woo_id,
+                report_type=rnd.choice(("start", "complete", "complete", "scrap")),
+                quantity=rnd.randint(1, 5), barcode=f"LOT{rnd.randint(1, 200):04d}",
+            ))
+        db.close()
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        queries = [0]
+        event.listen(engine, "before_cursor_execute", lambda *a, **k: queries.__setitem__(0, queries[0] + 1))
+        t0 = time.perf_counter()
+        if name == "one by one":
+            for report in reports:
+                db = Session()
+                apply_work_report(db, report)
+                db.commit()
+                db.close()
+        else:
+            for i in range(0, total, batch_size):
+                db = Session()
+                apply_work_reports(db, reports[i:i + batch_size])
+                db.commit()
+                db.close()
+        results[name] = (time.perf_counter() - t0, queries[0])
+        engine.dispose()
+        os.remove(path)
+    return results
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    reports = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{threads} threads x {reports} reports (quantity 1) on one work order")
+    for name, apply in (("read-modify-write", legacy_report), ("atomic update", apply_work_report)):
+        r = run(apply, threads, reports)
+        lost = r["committed"] - r["wo_completed"]
+        print(f"  {name:<18} {r['committed'] / r['elapsed']:>8.0f} reports/s  committed {r['committed']}  "
+              f"work order completed {r['wo_completed']:.0f}  operation completed {r['op_completed']:.0f} "
+              f"({r['op_status']})  lost {lost:.0f}  errors {r['errors']}")
+        if apply is apply_work_report:
+            assert lost == 0 and r["op_completed"] == r["committed"], r
+
+    total = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    batch_size = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+    print(f"burst of {total} reports over 10000 work order operations")
+    for name, (elapsed, queries) in burst(total, batch_size).items():
+        print(f"  {name:<18} {elapsed:>7.2f} s  {total / elapsed:>8.0f} reports/s  {queries} queries")
+
+
+if __name__ == "__main__":
+    main()
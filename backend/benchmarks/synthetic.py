@@ -0,0 +1,120 @@
+"""
+合成工厂数据：在一次性的 SQLite 数据库中批量生成车间 / 设备 / 工序 / 工艺路线 / 班次 / 工单 / 工单工序，供基准测试使用。
+工单按块生成并写入，百万级工单工序也不必在内存中同时保存全部行。
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base
+import app.models  # noqa: F401  注册全部表
+import app.models.inventory  # noqa: F401
+from app.models.master import Material, Operation, Equipment, Routing, RoutingItem, Shift
+from app.models.workorder import WorkOrder, WorkOrderOperation
+from app.models.workshop import Workshop
+
+BASE_TIME = datetime(2025, 1, 6, 8)
+CHUNK = 5000
+
+
+def temp_session(path: str = None) -> Tuple[Session, str]:
+    """创建一次性 SQLite 数据库并建表，返回 (会话, 文件路径)。"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="mes-bench-", suffix=".db")
+        os.close(fd)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)(), path
+
+
+def _bulk(db: Session, model, rows) -> None:
+    for i in range(0, len(rows), CHUNK):
+        db.execute(insert(model), rows[i:i + CHUNK])
+
+
+def generate_plant(db: Session, work_orders: int = 10000, ops_per_order: int = 5,
+                   equipment: int = 200, workshops: int = 4, operations: int = 20, seed: int = 1,
+                   routings: int = 0, shifts: bool = False) -> int:
+    """
+    生成合成工厂数据，返回工单工序数。
+    routings > 0 时生成该数量的产品及工艺路线（含准备时间），工单按所选路线展开工序与设备；
+    routings = 0 时每道工单工序随机选择工序与设备（与以前生成的数据相同，便于对比历史结果）。
+    shifts=True 时各车间配置白班 / 夜班两个班次，否则按设备日产能排产。
+    """
+    rnd = random.Random(seed)
+    _bulk(db, Workshop, [{"id": i, "code": f"WS{i:03d}", "name": f"车间{i}"} for i in range(1, workshops + 1)])
+    _bulk(db, Operation, [
+        {"id": i, "code": f"OP{i:04d}", "name": f"工序{i}", "standard_time": rnd.choice([0, 2, 5, 10, 30]),
+         "workshop_id": rnd.randint(1, workshops)}
+        for i in range(1, operations + 1)
+    ])
+    _bulk(db, Equipment, [
+        {"id": i, "code": f"EQ{i:05d}", "name": f"设备{i}", "capacity": rnd.choice([0, 8, 16, 20]),
+         "workshop_id": (i - 1) % workshops + 1}
+        for i in range(1, equipment + 1)
+    ])
+    if shifts:
+        _bulk(db, Shift, [
+            {"code": f"{code}{ws}", "name": f"{name}{ws}", "start_time": start, "end_time": end, "workshop_id": ws}
+            for ws in range(1, workshops + 1)
+            for code, name, start, end in (("D", "白班", "08:00", "16:00"), ("N", "夜班", "16:00", "24:00"))
+        ])
+    steps = []  # 工艺路线 -> [(工序, 设备)]
+    if routings:
+        _bulk(db, Material, [
+            {"id": i, "code": f"P{i:06d}", "name": f"产品{i}", "material_type": "成品"} for i in range(1, routings + 1)
+        ])
+        _bulk(db, Routing, [
+            {"id": i, "code": f"RT{i:06d}", "name": f"工艺路线{i}", "product_id": i} for i in range(1, routings + 1)
+        ])
+        item_rows = []
+        for routing_id in range(1, routings + 1):
+            items = [(rnd.randint(1, operations), rnd.randint(1, equipment)) for _ in range(ops_per_order)]
+            steps.append(items)
+            item_rows.extend(
+                {"routing_id": routing_id, "operation_id": op_id, "sequence": (k + 1) * 10, "equipment_id": eq_id,
+                 "setup_time": rnd.choice((0, 0, 15, 30, 60))}
+                for k, (op_id, eq_id) in enumerate(items)
+            )
+        _bulk(db, RoutingItem, item_rows)
+
+    count = 0
+    wo_rows, op_rows = [], []
+    for wo_id in range(1, work_orders + 1):
+        quantity = rnd.randint(5, 200)
+        start = BASE_TIME + timedelta(hours=rnd.randint(0, 240)) if rnd.random() < 0.7 else None
+        routing_id = rnd.randint(1, routings) if routings else None
+        wo_rows.append({
+            "id": wo_id, "code": f"WO{wo_id:08d}", "planned_quantity": quantity,
+            "status": rnd.choice(("released", "released", "in_progress", "draft")),
+            "priority": rnd.randint(1, 10), "planned_start_date": start,
+            "planned_end_date": BASE_TIME + timedelta(hours=rnd.randint(24, 2000)),
+            "product_id": routing_id, "routing_id": routing_id,
+        })
+        for seq in range(1, ops_per_order + 1):
+            if routing_id:
+                op_id, eq_id = steps[routing_id - 1][seq - 1]
+            else:
+                op_id, eq_id = rnd.randint(1, operations), rnd.randint(1, equipment)
+            op_rows.append({
+                "work_order_id": wo_id, "operation_id": op_id, "sequence": seq * 10,
+                "equipment_id": eq_id, "planned_quantity": quantity,
+                "completed_quantity": rnd.choice((0, 0, 0, quantity // 2)), "planned_start_date": start,
+            })
+        if len(op_rows) >= CHUNK * 4:
+            _bulk(db, WorkOrder, wo_rows)
+            _bulk(db, WorkOrderOperation, op_rows)
+            count += len(op_rows)
+            wo_rows, op_rows = [], []
+    _bulk(db, WorkOrder, wo_rows)
+    _bulk(db, WorkOrderOperation, op_rows)
+    db.commit()
+    return count + len(op_rows)
@@ -0,0 +1,44 @@
+"""
+数据库结构升级脚本：为已有数据库补充新增的表、列与索引（可重复执行，已存在的跳过）
+新建数据库直接运行 init_db.py 即可。
+"""
+from sqlalchemy import inspect, text
+
+from app.database import Base, engine
+import app.models  # noqa: F401  注册全部表
+import app.models.inventory  # noqa: F401
+import app.models.workorder  # noqa: F401
+from rebuild_rollups import rebuild
+
+# 在已有表上新增的列：(表, 列, 列类型[ 默认值])，已有行按默认值补齐
+NEW_COLUMNS = [
+    ("operations", "tooling_id", "INTEGER REFERENCES tooling(id)"),
+    ("operations", "tooling_quantity", "INTEGER DEFAULT 1"),
+    ("operations", "skill_level", "VARCHAR(50)"),
+    ("work_reports", "idempotency_key", "VARCHAR(100)"),
+]
+
+
+def migrate() -> None:
+    """新增的表直接建表；已有表补列，模型上声明但数据库中没有的索引补建；新建的产量汇总表按已有报工回填。"""
+    rollups_missing = not inspect(engine).has_table("production_rollups")
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, column_type in NEW_COLUMNS:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                print(f"✓ 新增列 {table}.{column}")
+        for table in Base.metadata.sorted_tables:
+            existing = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    print(f"✓ 新建索引 {index.name}")
+    if rollups_missing:
+        rebuild()
+    print("数据库结构已是最新")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,35 @@
+"""
+按原始报工重算产量汇总表（production_rollups）：已有报工回填，或汇总与报工不一致时修复。
+不带参数重算全部；带日期时重算 [起始日期, 结束日期) 的整点桶，其余汇总不动。
+
+运行：python rebuild_rollups.py [起始日期 YYYY-MM-DD] [结束日期 YYYY-MM-DD]
+"""
+import sys
+import time
+from datetime import datetime
+
+from app.database import SessionLocal
+import app.models  # noqa: F401  注册全部表
+import app.models.inventory  # noqa: F401
+from app.services.production_rollups import rebuild_rollups
+
+
+def rebuild(since: datetime = None, until: datetime = None) -> int:
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        count = rebuild_rollups(db, since, until)
+        db.commit()
+        print(f"✓ 产量汇总已重算: {count} 个桶, 用时 {time.perf_counter() - t0:.2f} s")
+        return count
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    until = datetime.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+    rebuild(since, until)
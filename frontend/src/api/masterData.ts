@@ -235,7 +235,10 @@ export const operationApi = {
       description: o.description || '',
       stdDurationMin: o.standard_time ?? 0,
       workshopId: o.workshop_id != null ? String(o.workshop_id) : '',
-      needTooling: !!o.need_tooling,
+      needTooling: !!o.need_tooling || o.tooling_id != null,
+      toolingId: o.tooling_id != null ? String(o.tooling_id) : '',
+      toolingQuantity: o.tooling_quantity ?? 1,
+      skillLevel: o.skill_level || '',
       qualityCheck: !!o.quality_check
     }
   },
@@ -250,6 +253,12 @@ export const operationApi = {
       if (!Number.isNaN(n)) payload.workshop_id = n
     }
     if (data.needTooling !== undefined) payload.need_tooling = data.needTooling ? 1 : 0
+    if (data.toolingId !== undefined || data.needTooling === false) {
+      const n = Number(data.toolingId)
+      payload.tooling_id = data.needTooling !== false && data.toolingId && !Number.isNaN(n) ? n : null
+    }
+    if (data.toolingQuantity !== undefined) payload.tooling_quantity = Number(data.toolingQuantity) || 1
+    if (data.skillLevel !== undefined) payload.skill_level = data.skillLevel || null
     if (data.qualityCheck !== undefined) payload.quality_check = data.qualityCheck ? 1 : 0
     return payload
   },
@@ -375,6 +384,7 @@ export const toolingApi = {
       type: t.tooling_type || '',
       description: t.description || '',
       workshopId: t.workshop_id != null ? String(t.workshop_id) : '',
+      quantity: t.quantity ?? 0,
       usable: t.status ? t.status === 'available' : true
     }
   },
@@ -388,6 +398,7 @@ export const toolingApi = {
       const n = Number(data.workshopId)
       if (!Number.isNaN(n)) payload.workshop_id = n
     }
+    if (data.quantity !== undefined) payload.quantity = Number(data.quantity) || 0
     if (data.usable !== undefined) payload.status = data.usable ? 'available' : 'maintenance'
     return payload
   },
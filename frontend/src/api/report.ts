@@ -14,14 +14,39 @@ export interface WorkReport {
   barcode?: string
   notes?: string
   report_time?: string
+  idempotency_key?: string
   created_at?: string
 }
 
+// 报工幂等键：同一次报工重试时沿用，服务端不会重复累加数量
+export function newIdempotencyKey(): string {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`
+}
+
+export interface WorkReportBatchItem {
+  index: number
+  status: 'created' | 'replayed' | 'error'
+  report?: WorkReport
+  detail?: string
+}
+
+export interface WorkReportBatchResult {
+  total: number
+  created: number
+  replayed: number
+  failed: number
+  results: WorkReportBatchItem[]
+}
+
 export const reportApi = {
   async create(payload: WorkReport): Promise<WorkReport> {
     const resp = await http.post('/work-reports', payload)
     return resp.data
   },
+  async createBatch(payload: WorkReport[]): Promise<WorkReportBatchResult> {
+    const resp = await http.post('/work-reports/batch', payload)
+    return resp.data
+  },
   async list(params?: { work_order_id?: number }): Promise<WorkReport[]> {
     const resp = await http.get('/work-reports', { params })
     return resp.data
@@ -29,6 +29,22 @@ export interface ScheduleResult {
   }>
 }
 
+// 排程查询条件：时间窗口（与窗口有重叠的任务）、设备 / 车间过滤、分页
+export interface ScheduleQuery {
+  start?: string
+  end?: string
+  equipment_id?: number[]
+  workshop_id?: number
+  skip?: number
+  limit?: number
+}
+
+export interface SchedulePage extends ScheduleResult {
+  total: number
+  skip: number
+  limit: number | null
+}
+
 export const scheduleApi = {
   async run(): Promise<ScheduleResult> {
     const resp = await http.post('/schedule/run')
@@ -37,5 +53,19 @@ export const scheduleApi = {
   async get(): Promise<ScheduleResult> {
     const resp = await http.get('/schedule')
     return resp.data
+  },
+  async query(params: ScheduleQuery): Promise<SchedulePage> {
+    // equipment_id 以重复参数传递（equipment_id=1&equipment_id=2）
+    const resp = await http.get('/schedule', { params, paramsSerializer: { indexes: null } })
+    return resp.data
+  },
+  // NDJSON 导出地址（每行一个任务），直接交给浏览器下载
+  exportUrl(params: ScheduleQuery = {}): string {
+    const search = new URLSearchParams({ format: 'ndjson' })
+    Object.entries(params).forEach(([k, v]) => {
+      if (v === undefined || v === null) return
+      ;(Array.isArray(v) ? v : [v]).forEach((item) => search.append(k, String(item)))
+    })
+    return `${http.defaults.baseURL}/schedule?${search.toString()}`
   }
 }
\ No newline at end of file
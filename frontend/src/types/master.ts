@@ -41,6 +41,9 @@ export interface Operation {
   workstationCode?: string // 关联缺省工位（旧字段，兼容）
   workshopId?: string // 关联车间ID
   needTooling?: boolean
+  toolingId?: string // 占用的工装ID（多资源排程）
+  toolingQuantity?: number // 占用工装件数
+  skillLevel?: string // 操作人员最低技能等级
   qualityCheck?: boolean
 }
 
@@ -80,6 +83,7 @@ export interface Tooling {
   type?: string
   description?: string
   workshopId?: string
+  quantity?: number // 件数（多资源排程按件占用）
   usable: boolean
 }
 